@@ -1,13 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.core.security import ALGORITHM, SECRET_KEY, create_access_token, verify_password, get_password_hash
+from app.core.security import ALGORITHM, SECRET_KEY, create_access_token, verify_password_async, get_password_hash_async, HashingQueueFull
 from app.schemas.user import UserSignUp, UserSignIn, User, UserUpdate
+from app.schemas.job import DeletionJob, DeletionTarget
 from app.db.models.user import User as UserModel
+from app.db.models.device import Device as DeviceModel, Status as DeviceStatus
 from app.db.database import get_db
+from app.db.types import new_id
+from app.core.cache import create_cache
+from app.core.http_cache import USER, DEVICES, bump_version, cache_validators, is_fresh
+from app.services.device_auth import invalidate_device_key
+from app.services.device_ownership import mark_device_deleting
+from app.services.deletion_jobs import deletion_jobs
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer
 from typing import Annotated
-import uuid
+import os
 from datetime import timedelta
 from jose import JWTError, jwt
 
@@ -15,9 +23,27 @@ security = HTTPBearer()
 
 router = APIRouter()
 
+# Authenticated users keyed by token subject, so hot tokens skip the users table
+user_cache = create_cache(
+    "users",
+    max_size=int(os.getenv("USER_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+)
+
+# Columns kept in the cache; the password hash never leaves the database
+CACHED_USER_FIELDS = ("id", "email", "name", "phone", "age")
+
+def cache_user(user: UserModel):
+    user_cache.set(user.id, {field: getattr(user, field) for field in CACHED_USER_FIELDS})
+
+def invalidate_cached_user(user_id: str):
+    """Must be called by every path that updates or deletes a user"""
+    user_cache.delete(user_id)
+
 def get_user_from_token(token: str, db: Session):
     """
-    Decodes JWT token and returns the user from database
+    Decodes JWT token and returns the user from cache or database.
+    Cached users are detached snapshots; re-query the user before modifying it.
     """
     try:
         # Decode JWT token
@@ -25,13 +51,39 @@ def get_user_from_token(token: str, db: Session):
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
+
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return UserModel(**cached)
             
         # Get user from database
         user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        if user is not None:
+            cache_user(user)
         return user
     except JWTError:
         return None
 
+def get_token_subject(token: str) -> str | None:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """
+    Validates the token without loading the user.
+    For endpoints that must keep working while or after the account is deleted.
+    """
+    user_id = get_token_subject(credentials.credentials)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
+
 # Dependency to get current user
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security), 
@@ -50,6 +102,24 @@ async def get_current_user(
         raise credentials_exception
     return user
 
+hashing_unavailable_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many authentication requests, please retry shortly",
+    headers={"Retry-After": "1"},
+)
+
+async def hash_password_or_503(password: str) -> str:
+    try:
+        return await get_password_hash_async(password)
+    except HashingQueueFull:
+        raise hashing_unavailable_exception
+
+async def verify_password_or_503(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await verify_password_async(plain_password, hashed_password)
+    except HashingQueueFull:
+        raise hashing_unavailable_exception
+
 @router.post("/users/sign-up", tags=["Access"], status_code=status.HTTP_201_CREATED, response_model=User)
 async def sign_up_user(user_data: UserSignUp, db: Session = Depends(get_db)):
     """Register new user"""
@@ -60,17 +130,18 @@ async def sign_up_user(user_data: UserSignUp, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    hashed_password = get_password_hash(user_data.password)
+    # Release the pooled connection while bcrypt runs
+    db.close()
+    hashed_password = await hash_password_or_503(user_data.password)
 
     # Create new user
     new_user = UserModel(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         email=user_data.email,
         hashed_password=hashed_password,
     )
     db.add(new_user)
     db.commit()
-    db.refresh(new_user)
 
     return new_user
 
@@ -86,8 +157,11 @@ async def sign_in_user(credentials: UserSignIn, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Release the pooled connection while bcrypt runs
+    db.close()
+
     # Verify password
-    if not verify_password(credentials.password, user.hashed_password):
+    if not await verify_password_or_503(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -104,8 +178,18 @@ async def sign_in_user(credentials: UserSignIn, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/get-information", tags=["Access"], response_model=User)
-async def get_user_information(current_user: Annotated[UserModel, Depends(get_current_user)]):
-    """Gets the information of the current user"""
+async def get_user_information(
+    request: Request,
+    response: Response,
+    current_user: Annotated[UserModel, Depends(get_current_user)]):
+    """
+    Gets the information of the current user.
+    Answers 304 when If-None-Match holds the current ETag.
+    """
+    headers = cache_validators(request, current_user.id, USER)
+    if is_fresh(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return current_user
 
 @router.put("/users/update-information", tags=["Access"], response_model=User)
@@ -114,7 +198,14 @@ async def update_user_information(
     current_user: Annotated[UserModel, Depends(get_current_user)],
     db: Session = Depends(get_db)):
     """Update user information"""
-    user = current_user
+    # current_user may be a cached snapshot, so load the persistent row
+    user = db.query(UserModel).filter(UserModel.id == current_user.id).first()
+    if not user:
+        invalidate_cached_user(current_user.id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     
     for key, value in user_data.dict(exclude_unset=True).items():
         if value is not None:
@@ -122,6 +213,34 @@ async def update_user_information(
     
     db.add(user)
     db.commit()
-    db.refresh(user)
+    invalidate_cached_user(user.id)
+    bump_version(user.id, USER)
+
+    return user
+
+@router.delete("/users/delete-account", tags=["Access"], status_code=status.HTTP_202_ACCEPTED, response_model=DeletionJob)
+async def delete_user_account(
+    response: Response,
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    db: Session = Depends(get_db)):
+    """
+    Delete the current user with their devices, records, alerts and contacts.
+    Devices are deactivated right away and the data is removed by a background job;
+    poll the job at the Location header for progress.
+    """
+    device_ids = [device_id for device_id, in db.query(DeviceModel.id).filter(DeviceModel.user_id == current_user.id)]
+    # Stop ingestion for the user's devices before their rows are removed
+    db.query(DeviceModel).filter(DeviceModel.user_id == current_user.id).update(
+        {DeviceModel.status: DeviceStatus.INACTIVE, DeviceModel.api_key_hash: None}, synchronize_session=False
+    )
+    db.commit()
+    db.close()
+    for device_id in device_ids:
+        invalidate_device_key(device_id)
+        mark_device_deleting(current_user.id, device_id)
+    bump_version(current_user.id, DEVICES)
 
-    return user
\ No newline at end of file
+    user_id = current_user.id
+    job = await deletion_jobs.submit(DeletionTarget.USER, user_id, user_id, on_complete=lambda: invalidate_cached_user(user_id))
+    response.headers["Location"] = f"/api/v1/jobs/{job['id']}"
+    return job
@@ -1,87 +1,113 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
-from app.schemas.alert import Alert, AlertCreate, AlertBase
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Response, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.schemas.alert import Alert, AlertCreate, AlertBase, AlertSettings, AlertSettingsUpdate
 from app.db.models.alert import Alert as AlertModel, AlertLevel
 from app.db.models.device import Device as DeviceModel
+from app.db.models.alert_settings import AlertSettings as AlertSettingsModel
 from app.db.models.user import User as UserModel
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
+from app.db.types import new_id
+from app.core.pagination import paginate, set_next_cursor
+from app.core.responses import schema_columns, rows_response, negotiate_list_format, LIST_RESPONSES
+from app.services.alert_rules import alert_engine, DEFAULT_SETTINGS
+from app.services.alert_stream import alert_broker, alert_event, KEEPALIVE_SECONDS
+from app.services.device_ownership import user_owns_device
+from app.services.write_behind import alert_writer, submit_or_503
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy import select
 from typing import List, Annotated, Optional
-import uuid
+import asyncio
 from datetime import datetime
 
-# Import the authentication dependency
-from app.api.v1.endpoints.access import get_current_user
+# Import the authentication dependencies
+from app.api.v1.endpoints.access import get_current_user, get_user_from_token
+from app.api.v1.endpoints.ingest import get_current_device
 
 router = APIRouter()
 
 @router.post("/alerts", tags=["Alerts"], status_code=status.HTTP_201_CREATED, response_model=Alert)
 async def create_alert(
     alert_data: AlertCreate,
-    db: Session = Depends(get_db)
+    response: Response,
+    device: dict = Depends(get_current_device),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new alert from a device reading.
-    This endpoint should be called by IoT devices when glucose levels are abnormal.
+    This endpoint should be called by IoT devices when glucose levels are abnormal,
+    with the device's API key in the X-Device-Key header.
     """
-    # Verify the device exists
-    device = db.query(DeviceModel).filter(DeviceModel.id == alert_data.device_id).first()
-    if not device:
+    # A key only allows alerts for its own device
+    if alert_data.device_id != device["device_id"]:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Device not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The device key does not belong to this device"
         )
     
     # Create new alert
     new_alert = AlertModel(
-        id=str(uuid.uuid4()),
-        message=alert_data.message if hasattr(alert_data, 'message') else "Abnormal glucose levels detected",
-        level=alert_data.level if hasattr(alert_data, 'level') else AlertLevel.CRITICAL,
+        id=new_id(),
+        message=alert_data.message if alert_data.message is not None else "Abnormal glucose levels detected",
+        level=AlertLevel[alert_data.level.name] if alert_data.level is not None else AlertLevel.CRITICAL,
         timestamp=datetime.now(),
         device_id=alert_data.device_id
     )
+
+    if alert_writer.active:
+        row = {column: getattr(new_alert, column) for column in ("id", "message", "level", "timestamp", "device_id")}
+        # Release the connection before waiting for the flush
+        await db.close()
+        await submit_or_503(alert_writer, row, device["user_id"])
+        if alert_writer.durability == "enqueue":
+            response.status_code = status.HTTP_202_ACCEPTED
+        return new_alert
     
     db.add(new_alert)
-    db.commit()
-    db.refresh(new_alert)
+    await db.commit()
+
+    # Push to the owner's live subscribers
+    alert_broker.publish(device["user_id"], alert_event(new_alert))
     
     return new_alert
 
-@router.get("/alerts", tags=["Alerts"], response_model=List[Alert])
+@router.get("/alerts", tags=["Alerts"], response_model=List[Alert], responses=LIST_RESPONSES)
 async def get_alerts(
+    request: Request,
     current_user: Annotated[UserModel, Depends(get_current_user)],
     device_id: Optional[str] = Query(None, description="Filter by device ID"),
     level: Optional[str] = Query(None, description="Filter by alert level"),
     limit: int = Query(100, description="Maximum number of alerts to return"),
     skip: int = Query(0, description="Number of alerts to skip"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all alerts for the current user's devices.
     Can be filtered by device ID and alert level.
+    Columnar JSON or MessagePack is returned when requested in the Accept header.
     """
-    # Get all devices associated with this user
-    user_devices = db.query(DeviceModel).filter(DeviceModel.user_id == current_user.id).all()
-    device_ids = [device.id for device in user_devices]
-    
-    if not device_ids:
-        return []
-    
-    # Base query - get alerts for any of the user's devices
-    query = db.query(AlertModel).filter(AlertModel.device_id.in_(device_ids))
-    
+    # Plain column tuples encoded with orjson; no ORM objects or per-row validation
+    columns = schema_columns(AlertModel, Alert)
+
     # Apply additional filters if provided
     if device_id:
-        if device_id not in device_ids:
+        if not await user_owns_device(db, current_user.id, device_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have access to this device"
             )
-        query = query.filter(AlertModel.device_id == device_id)
+        query = select(*columns).where(AlertModel.device_id == device_id)
+    else:
+        # Alerts of any of the user's devices, resolved by the database in one query
+        query = select(*columns)\
+            .join(DeviceModel, DeviceModel.id == AlertModel.device_id)\
+            .where(DeviceModel.user_id == current_user.id)
         
     if level:
         try:
             alert_level = AlertLevel[level.upper()]
-            query = query.filter(AlertModel.level == alert_level)
+            query = query.where(AlertModel.level == alert_level)
         except KeyError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -89,66 +115,175 @@ async def get_alerts(
             )
     
     # Order by most recent first and apply pagination
-    query = query.order_by(AlertModel.timestamp.desc()).offset(skip).limit(limit)
+    alerts = (await db.execute(paginate(query, AlertModel.timestamp, AlertModel.id, skip, limit, cursor))).all()
+    response = rows_response(alerts, Alert, negotiate_list_format(request))
+    set_next_cursor(response, alerts, limit)
     
-    return query.all()
+    return response
 
-@router.get("/alerts/{alert_id}", tags=["Alerts"], response_model=Alert)
-async def get_alert(
-    alert_id: str,
+async def iter_alert_events(user_id: str, last_event_id: int | None):
+    """Server-Sent Events for a user's new alerts, with keepalive comments while idle"""
+    subscription = alert_broker.subscribe(user_id, last_event_id)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event is None:
+                # Too slow to keep up; the client reconnects with Last-Event-ID
+                yield b"event: overflow\ndata: {}\n\n"
+                break
+            event_id, data = event
+            yield f"id: {event_id}\nevent: alert\ndata: {data}\n\n".encode()
+    finally:
+        alert_broker.unsubscribe(subscription)
+
+@router.get("/alerts/stream", tags=["Alerts"], response_class=StreamingResponse)
+async def stream_alerts(
+    request: Request,
     current_user: Annotated[UserModel, Depends(get_current_user)],
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id (the Last-Event-ID header also works)")
+):
+    """Subscribe to the current user's new alerts as Server-Sent Events"""
+    header = request.headers.get("last-event-id")
+    if last_event_id is None and header and header.isdigit():
+        last_event_id = int(header)
+
+    return StreamingResponse(
+        iter_alert_events(current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/alerts/ws")
+async def alerts_websocket(
+    websocket: WebSocket,
+    token: str = Query(..., description="Access token; browsers cannot set headers on WebSockets"),
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id"),
     db: Session = Depends(get_db)
 ):
-    """Get a specific alert by ID"""
-    # Get all devices associated with this user
-    user_devices = db.query(DeviceModel).filter(DeviceModel.user_id == current_user.id).all()
-    device_ids = [device.id for device in user_devices]
-    
-    # Get the alert and verify it belongs to one of the user's devices
-    alert = db.query(AlertModel).filter(AlertModel.id == alert_id).first()
-    
-    if not alert:
+    """Subscribe to the current user's new alerts over a WebSocket"""
+    user = get_user_from_token(token, db)
+    db.close()
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = alert_broker.subscribe(user.id, last_event_id)
+
+    async def wait_for_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    disconnected = asyncio.create_task(wait_for_disconnect())
+    try:
+        while True:
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_event.done():
+                next_event.cancel()
+                break
+            event = next_event.result()
+            if event is None:
+                # Too slow to keep up; the client reconnects with last_event_id
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                break
+            event_id, data = event
+            await websocket.send_text(f'{{"id": {event_id}, "alert": {data}}}')
+    finally:
+        disconnected.cancel()
+        alert_broker.unsubscribe(subscription)
+
+@router.get("/alerts/settings", tags=["Alerts"], response_model=AlertSettings)
+async def get_alert_settings(
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the thresholds used to generate alerts from the user's readings"""
+    settings = await db.get(AlertSettingsModel, current_user.id)
+    if not settings:
+        return AlertSettings(**DEFAULT_SETTINGS)
+    return settings
+
+@router.put("/alerts/settings", tags=["Alerts"], response_model=AlertSettings)
+async def update_alert_settings(
+    settings_data: AlertSettingsUpdate,
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update the thresholds used to generate alerts from the user's readings"""
+    settings = await db.get(AlertSettingsModel, current_user.id)
+    if not settings:
+        settings = AlertSettingsModel(user_id=current_user.id, **DEFAULT_SETTINGS)
+
+    for key, value in settings_data.model_dump(exclude_unset=True).items():
+        if value is not None:
+            setattr(settings, key, value)
+
+    if not settings.very_low <= settings.low < settings.high <= settings.very_high:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Thresholds must satisfy very_low <= low < high <= very_high"
+        )
+
+    db.add(settings)
+    await db.commit()
+    alert_engine.invalidate_settings(current_user.id)
+
+    return settings
+
+async def get_owned_alert(db: AsyncSession, alert_id: str, user_id: str) -> AlertModel:
+    """
+    Loads an alert together with the owner of its device in a single query
+    and verifies it belongs to the given user
+    """
+    row = (await db.execute(
+        select(AlertModel, DeviceModel.user_id)
+        .join(DeviceModel, DeviceModel.id == AlertModel.device_id)
+        .where(AlertModel.id == alert_id)
+    )).first()
+
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Alert not found"
         )
-        
-    if alert.device_id not in device_ids:
+
+    alert, owner_id = row
+    if owner_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this alert"
         )
-        
+
     return alert
 
+@router.get("/alerts/{alert_id}", tags=["Alerts"], response_model=Alert)
+async def get_alert(
+    alert_id: str,
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a specific alert by ID"""
+    return await get_owned_alert(db, alert_id, current_user.id)
+
 @router.delete("/alerts/{alert_id}", tags=["Alerts"], status_code=status.HTTP_204_NO_CONTENT)
 async def delete_alert(
     alert_id: str,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a specific alert"""
-    # Get all devices associated with this user
-    user_devices = db.query(DeviceModel).filter(DeviceModel.user_id == current_user.id).all()
-    device_ids = [device.id for device in user_devices]
-    
-    # Get the alert and verify it belongs to one of the user's devices
-    alert = db.query(AlertModel).filter(AlertModel.id == alert_id).first()
-    
-    if not alert:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Alert not found"
-        )
-        
-    if alert.device_id not in device_ids:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have access to this alert"
-        )
+    alert = await get_owned_alert(db, alert_id, current_user.id)
     
     # Delete the alert
-    db.delete(alert)
-    db.commit()
+    await db.delete(alert)
+    await db.commit()
     
     return None
\ No newline at end of file
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
-from app.schemas.device import Device, DeviceCreate, DeviceUpdate
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
+from app.schemas.device import Device, DeviceCreate, DeviceUpdate, DeviceApiKey
+from app.schemas.job import DeletionJob, DeletionTarget
 from app.db.models.device import Device as DeviceModel, Status
 from app.db.models.user import User as UserModel
-from app.db.database import get_db
-from sqlalchemy.orm import Session
+from app.db.database import get_async_db
+from app.db.types import new_id
+from app.core.http_cache import DEVICES, bump_version, cache_validators, is_fresh
+from app.services.device_ownership import invalidate_user_devices, mark_device_deleting
+from app.services.device_auth import generate_api_key, invalidate_device_key
+from app.services.deletion_jobs import deletion_jobs
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List, Annotated, Optional
-import uuid
 from datetime import datetime
 
 # Import the authentication dependency
@@ -17,40 +23,52 @@ router = APIRouter()
 async def create_device(
     device_data: DeviceCreate,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new device for the authenticated user"""
     
     # Create new device with association to current user
     new_device = DeviceModel(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         status=Status.ACTIVE,
         timestamp=device_data.timestamp if hasattr(device_data, 'timestamp') else datetime.now(),
         user_id=current_user.id
     )
     
     db.add(new_device)
-    db.commit()
-    db.refresh(new_device)
+    await db.commit()
+    invalidate_user_devices(current_user.id)
+    bump_version(current_user.id, DEVICES)
     
     return new_device
 
 @router.get("/devices", tags=["Devices"], response_model=List[Device])
 async def get_user_devices(
+    request: Request,
+    response: Response,
     current_user: Annotated[UserModel, Depends(get_current_user)],
     status: Optional[str] = Query(None, description="Filter by device status"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all devices for the authenticated user"""
+    """
+    Get all devices for the authenticated user.
+    Answers 304 without querying when If-None-Match holds the current ETag.
+    """
+    
+    headers = cache_validators(request, current_user.id, DEVICES)
+    if is_fresh(request, headers):
+        # `status` is the query parameter here, not fastapi.status
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     
     # Query all devices for the current user
-    query = db.query(DeviceModel).filter(DeviceModel.user_id == current_user.id)
+    query = select(DeviceModel).where(DeviceModel.user_id == current_user.id)
     
     # Apply status filter if provided
     if status:
         try:
             device_status = Status[status.upper()]
-            query = query.filter(DeviceModel.status == device_status)
+            query = query.where(DeviceModel.status == device_status)
         except KeyError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -60,21 +78,21 @@ async def get_user_devices(
     # Order by most recent first
     query = query.order_by(DeviceModel.timestamp.desc())
     
-    return query.all()
+    return (await db.scalars(query)).all()
 
 @router.get("/devices/{device_id}", tags=["Devices"], response_model=Device)
 async def get_device(
     device_id: str,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific device by ID"""
     
     # Get the device and verify it belongs to the current user
-    device = db.query(DeviceModel).filter(
+    device = await db.scalar(select(DeviceModel).where(
         DeviceModel.id == device_id,
         DeviceModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not device:
         raise HTTPException(
@@ -89,15 +107,15 @@ async def update_device(
     device_id: str,
     device_data: DeviceUpdate,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a device's status and information"""
     
     # Get the device and verify it belongs to the current user
-    device = db.query(DeviceModel).filter(
+    device = await db.scalar(select(DeviceModel).where(
         DeviceModel.id == device_id,
         DeviceModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not device:
         raise HTTPException(
@@ -107,34 +125,34 @@ async def update_device(
     
     # Update device fields
     if device_data.status is not None:
-        device.status = device_data.status
+        device.status = Status[device_data.status.name]
     
     # Always update timestamp when device is modified
     device.timestamp = device_data.timestamp if device_data.timestamp else datetime.now()
     
-    # Update record association if provided
-    if device_data.record_id is not None:
-        device.record_id = device_data.record_id
-    
     db.add(device)
-    db.commit()
-    db.refresh(device)
+    await db.commit()
+    invalidate_device_key(device.id)
+    bump_version(current_user.id, DEVICES)
     
     return device
 
-@router.delete("/devices/{device_id}", tags=["Devices"], status_code=status.HTTP_204_NO_CONTENT)
-async def delete_device(
+@router.post("/devices/{device_id}/api-key", tags=["Devices"], status_code=status.HTTP_201_CREATED, response_model=DeviceApiKey)
+async def issue_device_api_key(
     device_id: str,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Delete a device"""
+    """
+    Issue an ingestion API key for a device, replacing any previous key.
+    The key is only returned once; the server stores a hash of it.
+    """
     
     # Get the device and verify it belongs to the current user
-    device = db.query(DeviceModel).filter(
+    device = await db.scalar(select(DeviceModel).where(
         DeviceModel.id == device_id,
         DeviceModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not device:
         raise HTTPException(
@@ -142,8 +160,46 @@ async def delete_device(
             detail="Device not found or you don't have access to it"
         )
     
-    # Delete the device
-    db.delete(device)
-    db.commit()
+    api_key, device.api_key_hash = generate_api_key(device.id)
+    await db.commit()
+    invalidate_device_key(device.id)
+    
+    return DeviceApiKey(device_id=device.id, api_key=api_key)
+
+@router.delete("/devices/{device_id}", tags=["Devices"], status_code=status.HTTP_202_ACCEPTED, response_model=DeletionJob)
+async def delete_device(
+    device_id: str,
+    response: Response,
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Delete a device and its alerts; its records are kept without a device.
+    The device is deactivated right away and removed by a background job;
+    poll the job at the Location header for progress.
+    """
+    
+    # Get the device and verify it belongs to the current user
+    device = await db.scalar(select(DeviceModel).where(
+        DeviceModel.id == device_id,
+        DeviceModel.user_id == current_user.id
+    ))
+    
+    if not device:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found or you don't have access to it"
+        )
     
-    return None
\ No newline at end of file
+    # Stop ingestion for the device before its rows are removed
+    device.status = Status.INACTIVE
+    device.api_key_hash = None
+    await db.commit()
+    await db.close()
+    invalidate_device_key(device_id)
+    mark_device_deleting(current_user.id, device_id)
+    bump_version(current_user.id, DEVICES)
+    
+    job = await deletion_jobs.submit(DeletionTarget.DEVICE, device_id, current_user.id)
+    response.headers["Location"] = f"/api/v1/jobs/{job['id']}"
+    return job
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
 from app.schemas.contact import Contact, ContactCreate, ContactUpdate
 from app.db.models.contact import Contact as ContactModel
 from app.db.models.user import User as UserModel
 from app.db.database import get_db
+from app.db.types import new_id
+from app.core.http_cache import CONTACTS, bump_version, cache_validators, is_fresh
 from sqlalchemy.orm import Session
 from typing import List, Annotated
-import uuid
 
 # Import the authentication dependency
 from app.api.v1.endpoints.access import get_current_user
@@ -14,10 +15,20 @@ router = APIRouter()
 
 @router.get("/contacts", tags=["Emergencies"], response_model=List[Contact])
 async def get_user_contacts(
+    request: Request,
+    response: Response,
     current_user: Annotated[UserModel, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
-    """Get all contacts for the authenticated user"""
+    """
+    Get all contacts for the authenticated user.
+    Answers 304 without querying when If-None-Match holds the current ETag.
+    """
+    headers = cache_validators(request, current_user.id, CONTACTS)
+    if is_fresh(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
     contacts = db.query(ContactModel).filter(ContactModel.user_id == current_user.id).all()
     return contacts
 
@@ -30,7 +41,7 @@ async def create_contact(
     """Create a new emergency contact for the authenticated user"""
     # Create new contact associated with the current user
     new_contact = ContactModel(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         email=contact_data.email,
         name=contact_data.name if hasattr(contact_data, 'name') else None,
         phone=contact_data.phone if hasattr(contact_data, 'phone') else None,
@@ -39,7 +50,7 @@ async def create_contact(
     
     db.add(new_contact)
     db.commit()
-    db.refresh(new_contact)
+    bump_version(current_user.id, CONTACTS)
     
     return new_contact
 
@@ -70,7 +81,7 @@ async def update_contact(
     
     db.add(contact)
     db.commit()
-    db.refresh(contact)
+    bump_version(current_user.id, CONTACTS)
     
     return contact
 
@@ -96,5 +107,6 @@ async def delete_contact(
     # Delete the contact
     db.delete(contact)
     db.commit()
+    bump_version(current_user.id, CONTACTS)
     
     return None
\ No newline at end of file
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Header, WebSocket, WebSocketDisconnect
+from app.db.database import AsyncSessionLocal
+from app.schemas.record import RecordIngestResult
+from app.services.device_auth import authenticate_device
+from app.services.ingestion import IngestBatch, LineTooLong, INGEST_FLUSH_MS
+from typing import Optional
+import asyncio
+import time
+
+router = APIRouter()
+
+async def resolve_device(api_key: Optional[str]) -> Optional[dict]:
+    # Short-lived session so no connection is held while the upload streams
+    async with AsyncSessionLocal() as db:
+        return await authenticate_device(db, api_key)
+
+async def get_current_device(x_device_key: str = Header(..., description="Device API key issued by POST /devices/{device_id}/api-key")):
+    device = await resolve_device(x_device_key)
+    if device is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or revoked device key"
+        )
+    return device
+
+@router.post("/ingest/records", tags=["Ingest"], response_model=RecordIngestResult)
+async def ingest_records(
+    request: Request,
+    device: dict = Depends(get_current_device)
+):
+    """
+    Stream NDJSON readings from a device (one {"level", "timestamp", "description"} object per line).
+    The body is consumed incrementally and written in micro-batches that commit independently,
+    so a long-running chunked upload never holds more than one batch in memory.
+    """
+    batch = IngestBatch(device)
+    try:
+        async for chunk in request.stream():
+            batch.feed(chunk)
+            if batch.full:
+                await batch.flush()
+        batch.end()
+    except LineTooLong as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    await batch.flush()
+
+    return batch.take_result()
+
+@router.websocket("/ingest/ws")
+async def ingest_websocket(
+    websocket: WebSocket,
+    key: Optional[str] = Query(None, description="Device API key, for clients that cannot set the X-Device-Key header")
+):
+    """
+    Persistent ingestion channel for a device.
+    Each message holds one or more NDJSON readings; after every write the server
+    replies with the accepted/rejected counts since the previous reply.
+    """
+    device = await resolve_device(websocket.headers.get("x-device-key") or key)
+    if device is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    batch = IngestBatch(device)
+    flush_after = INGEST_FLUSH_MS / 1000
+    deadline = None
+    try:
+        while True:
+            # Only wait with a timeout while readings are buffered
+            try:
+                if deadline is None:
+                    message = await websocket.receive()
+                else:
+                    message = await asyncio.wait_for(websocket.receive(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                message = None
+
+            if message is not None:
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("bytes") or (message.get("text") or "").encode()
+                try:
+                    batch.feed(data)
+                    batch.end()
+                except LineTooLong:
+                    await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                    return
+                if (batch.rows or batch.rejected) and deadline is None:
+                    deadline = time.monotonic() + flush_after
+
+            if batch.full or (deadline is not None and time.monotonic() >= deadline):
+                await batch.flush()
+                deadline = None
+                await websocket.send_text(batch.take_result().model_dump_json())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Readings received before the disconnect are still written
+        await batch.flush()
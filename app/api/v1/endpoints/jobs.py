@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from app.schemas.job import DeletionJob
+from app.services.deletion_jobs import deletion_jobs
+from typing import Annotated
+
+# Jobs outlive the objects they delete, so only the token is checked, not the user row
+from app.api.v1.endpoints.access import get_current_user_id
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", tags=["Jobs"], response_model=DeletionJob)
+async def get_job(
+    job_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)]
+):
+    """Get the status of a background deletion job"""
+    
+    job = deletion_jobs.get(job_id)
+    if job is None or job["user_id"] != current_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or you don't have access to it"
+        )
+    
+    return job
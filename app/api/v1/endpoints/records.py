@@ -1,43 +1,186 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
-from app.schemas.record import Record, RecordCreate
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.schemas.record import Record, RecordCreate, RecordBulkResult, RecordBulkItemResult, BulkItemStatus, AggregationBucket, RecordAggregate, GlucoseMetrics
 from app.db.models.record import Record as RecordModel
 from app.db.models.device import Device as DeviceModel
 from app.db.models.user import User as UserModel
-from app.db.database import get_db
-from sqlalchemy.orm import Session
-from typing import List, Annotated, Optional
-import uuid
-from datetime import datetime
+from app.db.database import get_async_db
+from app.db.types import new_id
+from app.core.pagination import paginate, set_next_cursor, decode_cursor
+from app.core.responses import schema_columns, rows_response, negotiate_list_format, LIST_RESPONSES
+from app.core.http_cache import RECORDS, bump_version, cache_validators, is_fresh
+from app.services.aggregation import aggregate_records
+from app.services.glucose_metrics import compute_metrics, fetch_series
+from app.services.export import iter_export, gzip_stream, MEDIA_TYPES
+from app.services.alert_rules import alert_engine
+from app.services.device_ownership import get_user_device_ids, user_owns_device
+from app.services.write_behind import record_writer, submit_or_503
+from app.services.series_blocks import iter_block_readings
+from app.services.rollups import apply_readings, reading_from_record, correct_after_delete, aggregate_rollups, can_serve_from_rollups
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select
+from pydantic import ValidationError
+from typing import List, Annotated, Optional, Literal
+import os
+import json
+import heapq
+from contextlib import aclosing
+from itertools import islice
+from datetime import datetime, timedelta
 
 # Import the authentication dependency
 from app.api.v1.endpoints.access import get_current_user
 
 router = APIRouter()
 
+# Maximum number of readings accepted in a single bulk upload
+MAX_BULK_RECORDS = int(os.getenv("RECORDS_BULK_MAX_ITEMS", "10000"))
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+async def read_bulk_items(request: Request) -> list:
+    """
+    Reads a bulk payload as a list of raw items.
+    Accepts either a JSON array or an NDJSON stream (one reading per line).
+    Lines that are not valid JSON are kept as exceptions so they can be
+    reported per item instead of failing the whole upload.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        items = []
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    items.append(_parse_ndjson_line(line))
+            if len(items) > MAX_BULK_RECORDS:
+                break
+        if buffer.strip():
+            items.append(_parse_ndjson_line(buffer))
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body must be a JSON array or an NDJSON stream"
+            )
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body must be a JSON array of records"
+            )
+
+    if len(items) > MAX_BULK_RECORDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A bulk upload can contain at most {MAX_BULK_RECORDS} records"
+        )
+
+    return items
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+def time_range(start: Optional[datetime], end: Optional[datetime]) -> list:
+    """
+    Timestamp bounds for listings. Bounded queries only read the matching
+    monthly partitions when `records` is partitioned.
+    """
+    filters = []
+    if start is not None:
+        filters.append(RecordModel.timestamp >= start)
+    if end is not None:
+        filters.append(RecordModel.timestamp < end)
+    return filters
+
+async def fetch_record_page(
+    db: AsyncSession,
+    query,
+    user_id: str,
+    device_id: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+) -> list:
+    """
+    One page of records newest first, with compacted readings from series blocks
+    merged in as rows with derived ids. With offset pagination both sources are
+    read up to skip + limit rows; with a cursor, up to limit rows after it.
+    """
+    needed = limit if cursor else skip + limit
+    position = None
+    block_end = end
+    if cursor:
+        position = decode_cursor(cursor)
+        # Block readings are whole seconds; the exact position is applied below
+        ceiling = position[0] + timedelta(seconds=1)
+        block_end = min(end, ceiling) if end else ceiling
+
+    blocks = []
+    async with aclosing(iter_block_readings(db, user_id, start, block_end, device_id, newest_first=True)) as batches:
+        async for readings in batches:
+            if position:
+                readings = [reading for reading in readings if (reading.timestamp, reading.id) < position]
+            blocks += readings
+            if len(blocks) >= needed:
+                break
+
+    if not blocks:
+        return (await db.execute(paginate(query, RecordModel.timestamp, RecordModel.id, skip, limit, cursor))).all()
+
+    rows = (await db.execute(paginate(query, RecordModel.timestamp, RecordModel.id, 0, needed, cursor))).all()
+    merged = heapq.merge(rows, blocks[:needed], key=lambda row: (row.timestamp, row.id), reverse=True)
+    return list(islice(merged, needed - limit if not cursor else 0, needed))
+
 @router.post("/records", tags=["Records"], status_code=status.HTTP_201_CREATED, response_model=Record)
 async def create_record(
     record_data: RecordCreate,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create a new glucose level record for the authenticated user"""
+    """
+    Create a new glucose level record for the authenticated user.
+    With write-behind enabled the record is group-committed with other requests;
+    in ack-on-enqueue mode the response is 202 and the record is written shortly after.
+    """
     
     # Verify device belongs to user if device_id is provided
-    if record_data.device_id:
-        device = db.query(DeviceModel).filter(
-            DeviceModel.id == record_data.device_id,
-            DeviceModel.user_id == current_user.id
-        ).first()
-        
-        if not device:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Device not found or you don't have access to it"
-            )
+    if record_data.device_id and not await user_owns_device(db, current_user.id, record_data.device_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found or you don't have access to it"
+        )
+
+    if record_writer.active:
+        row = {
+            "id": new_id(),
+            "level": record_data.level,
+            "description": record_data.description,
+            "timestamp": record_data.timestamp if record_data.timestamp else datetime.now(),
+            "user_id": current_user.id,
+            "device_id": record_data.device_id,
+        }
+        # Release the connection before waiting for the flush
+        await db.close()
+        # The buffer bumps the records version once the row is committed
+        await submit_or_503(record_writer, row)
+        if record_writer.durability == "enqueue":
+            response.status_code = status.HTTP_202_ACCEPTED
+        return row
     
     # Create new record
     new_record = RecordModel(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         level=record_data.level,
         description=record_data.description,
         timestamp=record_data.timestamp if record_data.timestamp else datetime.now(),
@@ -46,72 +189,275 @@ async def create_record(
     )
     
     db.add(new_record)
-    db.commit()
-    db.refresh(new_record)
+    await apply_readings(db, [reading_from_record(new_record)])
+    await db.commit()
+    bump_version(current_user.id, RECORDS)
+
+    # Alert rules run in the background
+    alert_engine.submit([reading_from_record(new_record)])
     
     return new_record
 
-@router.get("/records", tags=["Records"], response_model=List[Record])
+@router.post("/records/bulk", tags=["Records"], response_model=RecordBulkResult)
+async def create_records_bulk(
+    request: Request,
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create many glucose level records in a single transaction.
+    Accepts a JSON array or an NDJSON stream of records and returns
+    an accept/reject result for every item, in upload order.
+    """
+    items = await read_bulk_items(request)
+
+    results = []
+    pending = []
+
+    # Validate every item before touching the database
+    for index, item in enumerate(items):
+        if isinstance(item, Exception):
+            results.append(RecordBulkItemResult(index=index, status=BulkItemStatus.REJECTED, detail="Invalid JSON"))
+            continue
+        try:
+            record_data = RecordCreate.model_validate(item)
+        except ValidationError as e:
+            results.append(RecordBulkItemResult(
+                index=index,
+                status=BulkItemStatus.REJECTED,
+                detail=e.errors(include_url=False, include_context=False)
+            ))
+            continue
+        results.append(None)
+        pending.append((index, record_data))
+
+    # Verify device ownership once per distinct device
+    device_ids = {record_data.device_id for _, record_data in pending if record_data.device_id}
+    owned_device_ids = set()
+    if device_ids:
+        owned_device_ids = await get_user_device_ids(db, current_user.id, device_ids)
+
+    now = datetime.now()
+    rows = []
+    for index, record_data in pending:
+        if record_data.device_id and record_data.device_id not in owned_device_ids:
+            results[index] = RecordBulkItemResult(
+                index=index,
+                status=BulkItemStatus.REJECTED,
+                detail="Device not found or you don't have access to it"
+            )
+            continue
+        record_id = new_id()
+        rows.append({
+            "id": record_id,
+            "level": record_data.level,
+            "description": record_data.description,
+            "timestamp": record_data.timestamp if record_data.timestamp else now,
+            "user_id": current_user.id,
+            "device_id": record_data.device_id,
+        })
+        results[index] = RecordBulkItemResult(index=index, status=BulkItemStatus.ACCEPTED, id=record_id)
+
+    # Multi-row INSERT in a single transaction
+    if rows:
+        await db.execute(insert(RecordModel), rows)
+        await apply_readings(db, rows)
+        await db.commit()
+        bump_version(current_user.id, RECORDS)
+        alert_engine.submit(rows)
+
+    return RecordBulkResult(
+        accepted=len(rows),
+        rejected=len(results) - len(rows),
+        results=results
+    )
+
+@router.get("/records", tags=["Records"], response_model=List[Record], responses=LIST_RESPONSES)
 async def get_user_records(
+    request: Request,
     current_user: Annotated[UserModel, Depends(get_current_user)],
     limit: int = Query(100, description="Maximum number of records to return"),
     skip: int = Query(0, description="Number of records to skip"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    start: Optional[datetime] = Query(None, description="Only records at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only records before this time"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all glucose level records for the authenticated user"""
+    """
+    Get all glucose level records for the authenticated user.
+    The first page answers 304 without querying when If-None-Match holds the current ETag.
+    Columnar JSON or MessagePack is returned when requested in the Accept header.
+    """
+    
+    media_type = negotiate_list_format(request)
+    headers = None
+    if cursor is None and skip == 0:
+        headers = cache_validators(request, current_user.id, RECORDS, media_type)
+        if is_fresh(request, headers):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, "Vary": "Accept"})
     
-    records = db.query(RecordModel)\
-                .filter(RecordModel.user_id == current_user.id)\
-                .order_by(RecordModel.timestamp.desc())\
-                .offset(skip)\
-                .limit(limit)\
-                .all()
+    # Plain column tuples encoded with orjson; no ORM objects or per-row validation
+    query = select(*schema_columns(RecordModel, Record)).where(RecordModel.user_id == current_user.id, *time_range(start, end))
+    records = await fetch_record_page(db, query, current_user.id, None, start, end, skip, limit, cursor)
+    response = rows_response(records, Record, media_type)
+    set_next_cursor(response, records, limit)
+    if headers:
+        response.headers.update(headers)
     
-    return records
+    return response
 
-@router.get("/records/device/{device_id}", tags=["Records"], response_model=List[Record])
+@router.get("/records/device/{device_id}", tags=["Records"], response_model=List[Record], responses=LIST_RESPONSES)
 async def get_device_records(
     device_id: str,
+    request: Request,
     current_user: Annotated[UserModel, Depends(get_current_user)],
     limit: int = Query(100, description="Maximum number of records to return"),
     skip: int = Query(0, description="Number of records to skip"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    start: Optional[datetime] = Query(None, description="Only records at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only records before this time"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all glucose level records for a specific device"""
+    """
+    Get all glucose level records for a specific device.
+    Columnar JSON or MessagePack is returned when requested in the Accept header.
+    """
     
     # Verify device belongs to user
-    device = db.query(DeviceModel).filter(
-        DeviceModel.id == device_id,
-        DeviceModel.user_id == current_user.id
-    ).first()
-    
-    if not device:
+    if not await user_owns_device(db, current_user.id, device_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Device not found or you don't have access to it"
         )
     
-    records = db.query(RecordModel)\
-                .filter(RecordModel.device_id == device_id)\
-                .order_by(RecordModel.timestamp.desc())\
-                .offset(skip)\
-                .limit(limit)\
-                .all()
+    query = select(*schema_columns(RecordModel, Record)).where(RecordModel.device_id == device_id, *time_range(start, end))
+    records = await fetch_record_page(db, query, current_user.id, device_id, start, end, skip, limit, cursor)
+    response = rows_response(records, Record, negotiate_list_format(request))
+    set_next_cursor(response, records, limit)
     
-    return records
+    return response
+
+@router.get("/records/aggregate", tags=["Records"], response_model=List[RecordAggregate])
+async def get_records_aggregate(
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    bucket: AggregationBucket = Query(AggregationBucket.HOUR, description="Bucket width"),
+    start: Optional[datetime] = Query(None, description="Start of the range (inclusive), defaults to 24 hours before end"),
+    end: Optional[datetime] = Query(None, description="End of the range (exclusive), defaults to now"),
+    device_id: Optional[str] = Query(None, description="Restrict to a single device"),
+    percentiles: List[float] = Query([], description="Percentiles to compute per bucket, e.g. 50 and 90"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get per-bucket glucose statistics for the authenticated user over a time range"""
+
+    end = end or datetime.now()
+    start = start or end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    if any(q < 0 or q > 100 for q in percentiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Percentiles must be between 0 and 100"
+        )
+
+    # Verify device belongs to user if device_id is provided
+    if device_id and not await user_owns_device(db, current_user.id, device_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found or you don't have access to it"
+        )
+
+    # Whole-bucket ranges are answered from the rollup tables
+    if not percentiles and can_serve_from_rollups(bucket.value, start, end):
+        return await aggregate_rollups(db, current_user.id, start, end, bucket.value, device_id)
+
+    return await aggregate_records(db, current_user.id, start, end, bucket.value, device_id, percentiles)
+
+@router.get("/records/metrics", tags=["Records"], response_model=GlucoseMetrics)
+async def get_records_metrics(
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    start: Optional[datetime] = Query(None, description="Start of the window (inclusive), defaults to 14 days before end"),
+    end: Optional[datetime] = Query(None, description="End of the window (exclusive), defaults to now"),
+    device_id: Optional[str] = Query(None, description="Restrict to a single device"),
+    agp_bin_minutes: int = Query(60, description="Width of the ambulatory glucose profile time-of-day bins", ge=5, le=240),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get standard CGM metrics for the authenticated user over a window:
+    time in ranges, GMI, coefficient of variation and AGP percentile bands
+    """
+
+    end = end or datetime.now()
+    start = start or end - timedelta(days=14)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+
+    # Verify device belongs to user if device_id is provided
+    if device_id and not await user_owns_device(db, current_user.id, device_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found or you don't have access to it"
+        )
+
+    timestamps, levels = await fetch_series(db, current_user.id, start, end, device_id)
+    metrics = compute_metrics(timestamps, levels, (end - start).total_seconds(), agp_bin_minutes)
+    if metrics is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No records found in this window"
+        )
+
+    return {"start": start, "end": end, **metrics}
+
+@router.get("/records/export", tags=["Records"], response_class=StreamingResponse)
+async def export_records(
+    request: Request,
+    current_user: Annotated[UserModel, Depends(get_current_user)],
+    format: Literal["csv", "ndjson"] = Query("csv", description="Export format"),
+    include_alerts: bool = Query(False, description="Also export the alerts of the user's devices"),
+    device_id: Optional[str] = Query(None, description="Restrict to a single device"),
+    start: Optional[datetime] = Query(None, description="Only export history at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only export history before this time"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream the authenticated user's complete history as CSV or NDJSON.
+    The body is gzip-compressed on the fly when the client accepts it.
+    """
+
+    # Verify device belongs to user if device_id is provided
+    if device_id and not await user_owns_device(db, current_user.id, device_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Device not found or you don't have access to it"
+        )
+
+    body = iter_export(current_user.id, format, include_alerts, device_id, start, end)
+    headers = {"Content-Disposition": f'attachment; filename="records.{format}"'}
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
 
 @router.get("/records/{record_id}", tags=["Records"], response_model=Record)
 async def get_record(
     record_id: str,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific glucose level record by ID"""
     
-    record = db.query(RecordModel).filter(
+    record = await db.scalar(select(RecordModel).where(
         RecordModel.id == record_id,
         RecordModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not record:
         raise HTTPException(
@@ -125,14 +471,14 @@ async def get_record(
 async def delete_record(
     record_id: str,
     current_user: Annotated[UserModel, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a specific glucose level record"""
     
-    record = db.query(RecordModel).filter(
+    record = await db.scalar(select(RecordModel).where(
         RecordModel.id == record_id,
         RecordModel.user_id == current_user.id
-    ).first()
+    ))
     
     if not record:
         raise HTTPException(
@@ -140,7 +486,9 @@ async def delete_record(
             detail="Record not found or you don't have access to it"
         )
     
-    db.delete(record)
-    db.commit()
+    await db.delete(record)
+    await correct_after_delete(db, record)
+    await db.commit()
+    bump_version(current_user.id, RECORDS)
     
     return None
\ No newline at end of file
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import access, emergencies, alerts, devices, records
+from app.api.v1.endpoints import access, emergencies, alerts, devices, records, ingest, jobs
 
 router = APIRouter(prefix="/api/v1")
 
@@ -7,4 +7,6 @@ router.include_router(access.router, tags=["Access"])
 router.include_router(emergencies.router, tags=["Emergencies"])
 router.include_router(records.router, tags=["Records"])
 router.include_router(devices.router, tags=["Devices"])
-router.include_router(alerts.router, tags=["Alerts"])
\ No newline at end of file
+router.include_router(alerts.router, tags=["Alerts"])
+router.include_router(ingest.router, tags=["Ingest"])
+router.include_router(jobs.router, tags=["Jobs"])
\ No newline at end of file
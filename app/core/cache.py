@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+try:
+    import redis
+except ImportError:  # redis is an optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend:
+    """Minimal interface shared by the in-process and shared cache backends"""
+
+    def get(self, key: str) -> Any | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+class TTLCache(CacheBackend):
+    """
+    In-process LRU cache with a per-entry time to live.
+    Bounded by `max_size`; the least recently used entry is evicted first.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def expire(self) -> int:
+        """
+        Drops expired entries from the least recently used end, stopping at the
+        first live one. Entries otherwise stay until read or pushed out by `max_size`.
+        """
+        now = time.monotonic()
+        expired = 0
+        with self._lock:
+            while self._entries:
+                key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at >= now:
+                    break
+                del self._entries[key]
+                expired += 1
+            self.evictions += expired
+        return expired
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class RedisCache(CacheBackend):
+    """
+    Shared cache backend for multi-worker deployments.
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, url: str, prefix: str, ttl: float = 60.0):
+        if redis is None:
+            raise RuntimeError("The redis package is required to use a shared cache backend")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any | None:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        self.client.set(self.prefix + key, json.dumps(value, default=str), px=int((self.ttl if ttl is None else ttl) * 1000))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+def create_cache(name: str, max_size: int, ttl: float) -> CacheBackend:
+    """
+    Builds the cache backend for `name`.
+    Uses the shared backend when CACHE_URL is set, the in-process one otherwise.
+    """
+    url = os.getenv("CACHE_URL")
+    if url:
+        return RedisCache(url, prefix=f"glucoteam:{name}:", ttl=ttl)
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        # Invalidations would only reach the worker that made the change
+        logger.warning("Cache %r is per process but WEB_CONCURRENCY > 1; set CACHE_URL to share it between workers", name)
+    return TTLCache(max_size=max_size, ttl=ttl)
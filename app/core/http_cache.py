@@ -0,0 +1,90 @@
+import hashlib
+import os
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request
+from app.core.cache import create_cache
+
+# Resources with conditional GETs; each has one version per user
+USER = "user"
+DEVICES = "devices"
+CONTACTS = "contacts"
+RECORDS = "records"
+
+# Conditional GETs need versions that every worker sees. A single worker keeps them
+# in process; several workers need the shared cache backend, otherwise a write handled
+# by one worker would leave the others answering 304 on stale data.
+HTTP_CACHE_ENABLED = bool(os.getenv("CACHE_URL")) or int(os.getenv("WEB_CONCURRENCY", "1")) <= 1
+
+# Current version of every (user, resource) as [token, last modified epoch seconds].
+# An evicted or expired version is replaced by a new token, so clients re-fetch
+# once instead of ever getting a stale 304.
+resource_versions = create_cache(
+    "resource_versions",
+    max_size=int(os.getenv("HTTP_CACHE_MAX_SIZE", "100000")),
+    ttl=float(os.getenv("HTTP_CACHE_VERSION_TTL_SECONDS", "3600"))
+)
+
+def _key(user_id: str, resource: str) -> str:
+    return f"{user_id}:{resource}"
+
+def get_version(user_id: str, resource: str) -> list:
+    version = resource_versions.get(_key(user_id, resource))
+    if version is None:
+        version = [uuid.uuid4().hex, int(time.time())]
+        resource_versions.set(_key(user_id, resource), version)
+    return version
+
+def bump_version(user_id: str, *resources: str):
+    """Must be called after every commit that changes what one of `resources` returns for the user"""
+    if not HTTP_CACHE_ENABLED:
+        return
+    now = int(time.time())
+    for resource in resources:
+        previous = resource_versions.get(_key(user_id, resource))
+        # Last-Modified has whole-second precision, so it must move forward on every change
+        modified = max(now, previous[1] + 1) if previous else now
+        resource_versions.set(_key(user_id, resource), [uuid.uuid4().hex, modified])
+
+def cache_validators(request: Request, user_id: str, resource: str, representation: str = "") -> dict:
+    """
+    ETag, Last-Modified and Cache-Control headers for the current version of a
+    user's resource. Must be read before the resource is queried: a write that
+    lands in between then only makes the ETag change one request later.
+    Empty when conditional GETs are disabled.
+    """
+    if not HTTP_CACHE_ENABLED:
+        return {}
+    token, modified = get_version(user_id, resource)
+    # Query parameters (filters, page size) and the negotiated media type select a different body of the same version
+    digest = hashlib.blake2b(f"{resource}:{token}:{representation}:{request.url.query}".encode(), digest_size=12).hexdigest()
+    return {
+        "ETag": f'"{digest}"',
+        "Last-Modified": formatdate(modified, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+
+def is_fresh(request: Request, headers: dict) -> bool:
+    """
+    Whether the client's copy is current, so a 304 can be sent without running the query.
+    If-Modified-Since is only used when the request has no If-None-Match.
+    """
+    if not headers:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as required for If-None-Match
+        etag = headers["ETag"]
+        return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+            return parsedate_to_datetime(headers["Last-Modified"]).timestamp() <= since
+        except (TypeError, ValueError):
+            return False
+    return False
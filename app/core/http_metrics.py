@@ -0,0 +1,132 @@
+import time
+from bisect import bisect_left
+from app.core.query_stats import escape_label
+
+# Requests that matched no route share one label so cardinality stays bounded
+UNMATCHED = "unmatched"
+
+def hdr_bounds(lowest: float = 0.0001, highest: float = 60.0, sub_buckets: int = 4) -> list[float]:
+    """
+    HDR-style bucket upper bounds in seconds: every power of two between
+    `lowest` and `highest` is split into `sub_buckets` linear steps,
+    so relative error stays constant across the range.
+    """
+    bounds = []
+    base = lowest
+    while base < highest:
+        bounds.extend(round(base * (1 + i / sub_buckets), 7) for i in range(sub_buckets))
+        base *= 2
+    return bounds
+
+class RouteStats:
+    __slots__ = ("counts", "sum", "statuses", "request_bytes", "response_bytes")
+
+    def __init__(self, buckets: int):
+        # One extra slot for observations above the highest bound (+Inf)
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.statuses: dict[int, int] = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+class HttpMetrics:
+    """
+    Per-route request metrics.
+    Updated only from the event loop thread, so plain integer updates are
+    safe without a lock and the hot path stays a few attribute writes.
+    """
+
+    def __init__(self, bounds: list[float]):
+        self.bounds = bounds
+        self.routes: dict[tuple[str, str], RouteStats] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status_code: int, elapsed: float, request_bytes: int, response_bytes: int):
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats(len(self.bounds))
+        stats.counts[bisect_left(self.bounds, elapsed)] += 1
+        stats.sum += elapsed
+        stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        routes = sorted(self.routes.items())
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds Request latency per route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), stats in routes:
+            labels = f'method="{method}",route="{escape_label(route)}"'
+            cumulative = 0
+            for bound, count in zip(self.bounds, stats.counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += stats.counts[-1]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.sum:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += ["# HELP http_responses_total Responses per route template and status code.", "# TYPE http_responses_total counter"]
+        for (method, route), stats in routes:
+            labels = f'method="{method}",route="{escape_label(route)}"'
+            lines.extend(f'http_responses_total{{{labels},status="{code}"}} {count}' for code, count in sorted(stats.statuses.items()))
+
+        lines += ["# HELP http_request_bytes_total Request body bytes per route template.", "# TYPE http_request_bytes_total counter"]
+        lines.extend(
+            f'http_request_bytes_total{{method="{method}",route="{escape_label(route)}"}} {stats.request_bytes}'
+            for (method, route), stats in routes
+        )
+        lines += ["# HELP http_response_bytes_total Response body bytes per route template.", "# TYPE http_response_bytes_total counter"]
+        lines.extend(
+            f'http_response_bytes_total{{method="{method}",route="{escape_label(route)}"}} {stats.response_bytes}'
+            for (method, route), stats in routes
+        )
+        return "\n".join(lines) + "\n"
+
+http_metrics = HttpMetrics(hdr_bounds())
+
+class HttpMetricsMiddleware:
+    """Records latency, status code and payload sizes for every HTTP request, labelled by route template"""
+
+    def __init__(self, app, metrics: HttpMetrics = http_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        status_code = 500
+        response_bytes = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            else:
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.in_flight -= 1
+            request_bytes = 0
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    request_bytes = int(value)
+                    break
+            # The router stores the matched route in the scope; its path is the template
+            route = scope.get("route")
+            metrics.observe(scope["method"], route.path if route is not None else UNMATCHED, status_code, elapsed, request_bytes, response_bytes)
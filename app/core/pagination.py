@@ -0,0 +1,53 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(timestamp: datetime, id: str) -> str:
+    """Encodes the (timestamp, id) position of a row as an opaque cursor"""
+    raw = json.dumps([timestamp.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Decodes a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, id = json.loads(raw)
+        # An id that is not a UUID would bind as NULL and silently skip rows
+        return datetime.fromisoformat(timestamp), str(uuid.UUID(id))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def paginate(query, timestamp_column, id_column, skip: int, limit: int, cursor: str | None = None):
+    """
+    Orders a query newest first and applies either keyset (cursor) or
+    offset pagination. With a cursor, only rows strictly after the cursor
+    position are returned, so the database can seek on the
+    (..., timestamp, id) index instead of scanning and discarding `skip` rows.
+    """
+    query = query.order_by(timestamp_column.desc(), id_column.desc())
+
+    if cursor:
+        timestamp, id = decode_cursor(cursor)
+        # The redundant `timestamp <= ...` bound keeps the predicate sargable
+        query = query.filter(and_(
+            timestamp_column <= timestamp,
+            or_(timestamp_column < timestamp, id_column < id)
+        ))
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+def set_next_cursor(response: Response, rows: list, limit: int):
+    """Exposes the cursor of the next page when the current page is full"""
+    if rows and len(rows) >= limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.timestamp, last.id)
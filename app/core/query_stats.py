@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("app.sql")
+
+SLOW_QUERY_SECONDS = float(os.getenv("SQL_SLOW_QUERY_MS", "100")) / 1000
+# Dev mode tracks repeated statements and lazy loads per request to flag N+1 patterns
+SQL_DEV_MODE = os.getenv("SQL_DEV_MODE", "false").lower() == "true"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+SLOW_QUERY_SAMPLES = 50
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """Replaces literals and bind parameters so statements that differ only in values group together"""
+    statement = _STRING.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("IN (...)", statement)
+    statement = _VALUES_LIST.sub(r"\1", statement)
+    return _WHITESPACE.sub(" ", statement).strip()[:500]
+
+def statement_kind(statement: str) -> str:
+    kind = statement.lstrip()[:6].upper()
+    return kind if kind in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+class RequestQueryStats:
+    """Statements issued while handling one request"""
+
+    __slots__ = ("statements", "seconds", "slow", "repeated", "lazy_loads")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.slow = []
+        self.repeated: dict[str, int] = {}
+        self.lazy_loads: dict[str, int] = {}
+
+    def n_plus_one(self) -> dict:
+        """Statements and lazy-loaded relationships seen at least N_PLUS_ONE_THRESHOLD times"""
+        return {
+            "statements": {sql: count for sql, count in self.repeated.items() if count >= N_PLUS_ONE_THRESHOLD},
+            "lazy_loads": {name: count for name, count in self.lazy_loads.items() if count >= N_PLUS_ONE_THRESHOLD},
+        }
+
+current_query_stats: ContextVar[RequestQueryStats | None] = ContextVar("current_query_stats", default=None)
+
+class QueryMetrics:
+    """Process-wide statement counters, exported on /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements: dict[str, int] = {}
+        self.seconds: dict[str, float] = {}
+        self.slow_statements = 0
+        self.slow_samples = deque(maxlen=SLOW_QUERY_SAMPLES)
+        # Per route template: [requests, statements, seconds]
+        self.routes: dict[str, list] = {}
+
+    def observe_statement(self, kind: str, elapsed: float, statement: str):
+        with self._lock:
+            self.statements[kind] = self.statements.get(kind, 0) + 1
+            self.seconds[kind] = self.seconds.get(kind, 0.0) + elapsed
+            if elapsed >= SLOW_QUERY_SECONDS:
+                self.slow_statements += 1
+                self.slow_samples.append({"sql": normalize_sql(statement), "ms": round(elapsed * 1000, 2)})
+
+    def observe_request(self, route: str, stats: RequestQueryStats):
+        with self._lock:
+            totals = self.routes.setdefault(route, [0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += stats.statements
+            totals[2] += stats.seconds
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP db_statements_total SQL statements executed, by kind.",
+                "# TYPE db_statements_total counter",
+                *(f'db_statements_total{{kind="{kind}"}} {count}' for kind, count in sorted(self.statements.items())),
+                "# HELP db_statement_seconds_total Time spent executing SQL statements, by kind.",
+                "# TYPE db_statement_seconds_total counter",
+                *(f'db_statement_seconds_total{{kind="{kind}"}} {seconds:.6f}' for kind, seconds in sorted(self.seconds.items())),
+                "# HELP db_slow_statements_total Statements slower than SQL_SLOW_QUERY_MS.",
+                "# TYPE db_slow_statements_total counter",
+                f"db_slow_statements_total {self.slow_statements}",
+                "# HELP db_route_requests_total Requests per route template.",
+                "# TYPE db_route_requests_total counter",
+                *(f'db_route_requests_total{{route="{escape_label(route)}"}} {totals[0]}' for route, totals in sorted(self.routes.items())),
+                "# HELP db_route_statements_total SQL statements issued per route template.",
+                "# TYPE db_route_statements_total counter",
+                *(f'db_route_statements_total{{route="{escape_label(route)}"}} {totals[1]}' for route, totals in sorted(self.routes.items())),
+                "# HELP db_route_seconds_total Time spent in SQL per route template.",
+                "# TYPE db_route_seconds_total counter",
+                *(f'db_route_seconds_total{{route="{escape_label(route)}"}} {totals[2]:.6f}' for route, totals in sorted(self.routes.items())),
+            ]
+        return "\n".join(lines) + "\n"
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+query_metrics = QueryMetrics()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    query_metrics.observe_statement(statement_kind(statement), elapsed, statement)
+
+    stats = current_query_stats.get()
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.seconds += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        stats.slow.append({"sql": normalize_sql(statement), "ms": round(elapsed * 1000, 2)})
+    if SQL_DEV_MODE:
+        sql = normalize_sql(statement)
+        stats.repeated[sql] = stats.repeated.get(sql, 0) + 1
+
+def _do_orm_execute(orm_execute_state):
+    if not orm_execute_state.is_relationship_load:
+        return
+    stats = current_query_stats.get()
+    if stats is None:
+        return
+    path = orm_execute_state.loader_strategy_path
+    prop = path[-1] if path is not None and len(path) else None
+    name = f"{prop.parent.class_.__name__}.{prop.key}" if hasattr(prop, "parent") else "unknown"
+    stats.lazy_loads[name] = stats.lazy_loads.get(name, 0) + 1
+
+def instrument_engine(engine):
+    """Installs the statement hooks on a sync engine (use async_engine.sync_engine for async engines)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+if SQL_DEV_MODE:
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+
+class QueryStatsMiddleware:
+    """
+    Collects the SQL statements issued while handling each HTTP request.
+    Adds a Server-Timing header, logs a JSON line for slow or N+1 requests
+    and aggregates statement counts per route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timing = f'db;dur={stats.seconds * 1000:.2f};desc="{stats.statements} queries"'
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            query_metrics.observe_request(route_path, stats)
+            self.log(scope, route_path, status_code, stats)
+
+    @staticmethod
+    def log(scope, route_path: str, status_code: int | None, stats: RequestQueryStats):
+        n_plus_one = stats.n_plus_one() if SQL_DEV_MODE else None
+        flagged = n_plus_one is not None and (n_plus_one["statements"] or n_plus_one["lazy_loads"])
+        if not stats.slow and not flagged and not logger.isEnabledFor(logging.DEBUG):
+            return
+        entry = {
+            "method": scope["method"],
+            "route": route_path,
+            "status": status_code,
+            "statements": stats.statements,
+            "db_ms": round(stats.seconds * 1000, 2),
+            "slow": stats.slow,
+        }
+        if flagged:
+            entry["n_plus_one"] = n_plus_one
+        level = logging.WARNING if stats.slow or flagged else logging.DEBUG
+        logger.log(level, json.dumps(entry))
@@ -0,0 +1,101 @@
+from enum import Enum
+from datetime import datetime
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # msgpack is an optional dependency; without it MessagePack is not offered
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+# {"field": [value, ...], ...}: one array per schema field instead of one object per row
+COLUMNAR_MEDIA_TYPE = "application/vnd.glucoteam.columnar+json"
+# The columnar layout encoded as MessagePack
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+ACCEPTED_MEDIA_TYPES = {
+    JSON_MEDIA_TYPE: JSON_MEDIA_TYPE,
+    "application/*": JSON_MEDIA_TYPE,
+    "*/*": JSON_MEDIA_TYPE,
+    COLUMNAR_MEDIA_TYPE: COLUMNAR_MEDIA_TYPE,
+}
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE: MSGPACK_MEDIA_TYPE, "application/x-msgpack": MSGPACK_MEDIA_TYPE}
+# Representations that are known but cannot be produced without their optional package
+UNAVAILABLE_MEDIA_TYPES = set()
+if msgpack is not None:
+    ACCEPTED_MEDIA_TYPES.update(MSGPACK_MEDIA_TYPES)
+else:
+    UNAVAILABLE_MEDIA_TYPES.update(MSGPACK_MEDIA_TYPES)
+
+# OpenAPI description of the extra representations, for `responses=` on list routes
+LIST_RESPONSES = {200: {"content": {COLUMNAR_MEDIA_TYPE: {}, MSGPACK_MEDIA_TYPE: {}}}}
+
+def negotiate_list_format(request: Request) -> str:
+    """
+    Representation of a list endpoint picked from the Accept header by q-value,
+    earlier entries winning ties. JSON rows unless the client asks for another one.
+    406 when the client only accepts a representation whose optional package is
+    not installed, rather than silently answering with JSON it cannot read.
+    """
+    best, best_q = JSON_MEDIA_TYPE, 0.0
+    unavailable = None
+    for item in request.headers.get("accept", "").split(","):
+        media_type, _, params = item.strip().partition(";")
+        media_type = media_type.strip().lower()
+        chosen = ACCEPTED_MEDIA_TYPES.get(media_type)
+        if chosen is None and media_type not in UNAVAILABLE_MEDIA_TYPES:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if chosen is None:
+            if q > 0:
+                unavailable = media_type
+        elif q > best_q:
+            best, best_q = chosen, q
+    if best_q == 0 and unavailable is not None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"{unavailable} is not available on this server"
+        )
+    return best
+
+def schema_columns(model, schema: type[BaseModel]) -> list:
+    """ORM columns for every field of a response schema, in the schema's field order"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+def _msgpack_default(value):
+    # Same strings as in the JSON representations
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def rows_response(rows, schema: type[BaseModel], media_type: str = JSON_MEDIA_TYPE) -> Response:
+    """
+    Encodes rows selected with schema_columns straight to JSON with orjson,
+    skipping ORM hydration and per-item validation against `response_model`.
+    The JSON rows body is byte for byte what FastAPI renders for the same rows:
+    same key order, compact separators, raw UTF-8, ISO timestamps and enum values.
+    `media_type` selects the columnar JSON or MessagePack layout instead.
+    """
+    fields = tuple(schema.model_fields)
+    if media_type == JSON_MEDIA_TYPE:
+        response = ORJSONResponse([dict(zip(fields, row)) for row in rows])
+    else:
+        columns = list(zip(*rows)) if rows else [()] * len(fields)
+        content = {field: list(column) for field, column in zip(fields, columns)}
+        if media_type == MSGPACK_MEDIA_TYPE:
+            response = Response(msgpack.packb(content, default=_msgpack_default), media_type=MSGPACK_MEDIA_TYPE)
+        else:
+            response = ORJSONResponse(content, media_type=COLUMNAR_MEDIA_TYPE)
+    response.headers["Vary"] = "Accept"
+    return response
@@ -1,4 +1,6 @@
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from fastapi import Security, HTTPException
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
@@ -17,6 +19,78 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class HashingQueueFull(Exception):
+    """Raised when too many hashing jobs are already waiting"""
+
+class HashingExecutor:
+    """
+    Bounded pool that runs bcrypt off the event loop.
+    A bcrypt round takes hundreds of milliseconds, so running it inline in an
+    async endpoint stalls every other request on the worker.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, kind: str = "thread"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        # Created lazily so importing this module never spawns workers
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hashing")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.pending - self.max_workers)
+
+    async def run(self, fn, *args):
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise HashingQueueFull()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self.pending, self.max_workers),
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+hashing_executor = HashingExecutor(
+    max_workers=int(os.getenv("HASHING_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("HASHING_MAX_QUEUE", "256")),
+    kind=os.getenv("HASHING_EXECUTOR", "thread")
+)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hashing_executor.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await hashing_executor.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
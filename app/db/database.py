@@ -1,8 +1,12 @@
 import os
 import logging
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from app.core.query_stats import instrument_engine
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -10,11 +14,53 @@ logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Derives the async driver URL from the sync DATABASE_URL"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+def get_pool_options(url: str) -> dict:
+    """
+    Connection pool settings shared by the sync and async engines.
+    Sizing options only apply to queue pools; the pools SQLAlchemy picks for
+    in-memory SQLite (SingletonThreadPool, StaticPool) reject them.
+    """
+    options = {
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    url = make_url(url)
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        )
+    return options
+
 try:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **get_pool_options(SQLALCHEMY_DATABASE_URL))
+    # Handlers return objects right after commit; expiring them would force a SELECT per attribute access
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
     Base = declarative_base()
 
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_pool_options(ASYNC_DATABASE_URL))
+
+    # Statement counts and timings for Server-Timing, logs and /metrics
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+
+    # Objects stay usable after commit; async sessions cannot lazy load on attribute access
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
     def get_db():
         db = SessionLocal()
         try:
@@ -22,6 +68,10 @@ try:
         finally:
             db.close()
 
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
 except Exception as e:
     logger.error(f"Database connection error: {e}")
-    raise
\ No newline at end of file
+    raise
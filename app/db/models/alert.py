@@ -1,7 +1,8 @@
-from sqlalchemy import Column, ForeignKey, String, DateTime, Enum
+from sqlalchemy import Column, ForeignKey, String, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
 from app.db.database import Base
+from app.db.types import BinaryUUID
+from datetime import datetime
 import enum
 
 class AlertLevel(enum.Enum):
@@ -12,10 +13,14 @@ class AlertLevel(enum.Enum):
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        # Keyset pagination index for alert listings
+        Index("ix_alerts_device_id_timestamp_id", "device_id", "timestamp", "id"),
+    )
 
-    id = Column(String(36), primary_key=True, index=True) 
+    id = Column(BinaryUUID, primary_key=True, index=True) 
     message = Column(String(255), nullable=True)
     level = Column(Enum(AlertLevel), nullable=False)
-    timestamp = Column(DateTime, default=func.now(), nullable=False)
-    device_id = Column(String(36), ForeignKey('devices.id'), nullable=False)    
+    timestamp = Column(DateTime, default=datetime.now, nullable=False)
+    device_id = Column(BinaryUUID, ForeignKey('devices.id', ondelete="CASCADE"), nullable=False)    
     device = relationship("Device", back_populates="alerts")
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, ForeignKey, Integer, Float, Boolean
+from app.db.database import Base
+from app.db.types import BinaryUUID
+
+class AlertSettings(Base):
+    __tablename__ = "alert_settings"
+
+    user_id = Column(BinaryUUID, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    enabled = Column(Boolean, nullable=False, default=True)
+    very_low = Column(Integer, nullable=False, default=54)
+    low = Column(Integer, nullable=False, default=70)
+    high = Column(Integer, nullable=False, default=180)
+    very_high = Column(Integer, nullable=False, default=250)
+    # mg/dL per minute, in either direction
+    rate_of_change = Column(Float, nullable=False, default=3.0)
+    sustained_low_minutes = Column(Integer, nullable=False, default=15)
@@ -1,13 +1,14 @@
 from sqlalchemy import Column, ForeignKey, String
 from sqlalchemy.orm import relationship
 from app.db.database import Base
+from app.db.types import BinaryUUID
 
 class Contact(Base):
     __tablename__ = "contacts"
 
-    id = Column(String(36), primary_key=True, index=True) 
+    id = Column(BinaryUUID, primary_key=True, index=True) 
     email = Column(String(255), unique=True, index=True)
     name = Column(String(100), nullable=True)
     phone = Column(String(20), nullable=True)
-    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    user_id = Column(BinaryUUID, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     user = relationship("User", back_populates="contacts")
\ No newline at end of file
@@ -1,7 +1,8 @@
 from sqlalchemy import Column, ForeignKey, String, DateTime, Enum
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
 from app.db.database import Base
+from app.db.types import BinaryUUID
+from datetime import datetime
 import enum
 
 class Status(enum.Enum):
@@ -11,16 +12,21 @@ class Status(enum.Enum):
 class Device(Base):
     __tablename__ = "devices"
 
-    id = Column(String(36), primary_key=True, index=True)
+    id = Column(BinaryUUID, primary_key=True, index=True)
     status = Column(Enum(Status), nullable=False, default=Status.ACTIVE)
-    timestamp = Column(DateTime, default=func.now(), nullable=False)
+    timestamp = Column(DateTime, default=datetime.now, nullable=False)
+    # SHA-256 of the ingestion API key secret; NULL until a key is issued
+    api_key_hash = Column(String(64), nullable=True)
     
     # Foreign keys
-    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    user_id = Column(BinaryUUID, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     
     # Relationships
+    # passive_deletes leaves children to the database and app.services.deletion_jobs
+    # instead of loading every row into the session on delete
     user = relationship("User", back_populates="devices")
     records = relationship("Record", back_populates="device", 
                          foreign_keys="[Record.device_id]",
-                         primaryjoin="Device.id == Record.device_id")
-    alerts = relationship("Alert", back_populates="device", cascade="all, delete-orphan")
\ No newline at end of file
+                         primaryjoin="Device.id == Record.device_id",
+                         passive_deletes=True)
+    alerts = relationship("Alert", back_populates="device", cascade="all, delete-orphan", passive_deletes=True)
\ No newline at end of file
@@ -1,19 +1,26 @@
-from sqlalchemy import Column, ForeignKey, String, Integer, DateTime, Text
+from sqlalchemy import Column, ForeignKey, Integer, DateTime, Text, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
 from app.db.database import Base
+from app.db.types import BinaryUUID
+from datetime import datetime
 
 class Record(Base):
     __tablename__ = "records"
+    __table_args__ = (
+        # Keyset pagination indexes for user and device listings
+        Index("ix_records_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        Index("ix_records_device_id_timestamp_id", "device_id", "timestamp", "id"),
+    )
 
-    id = Column(String(36), primary_key=True, index=True)
+    id = Column(BinaryUUID, primary_key=True, index=True)
     level = Column(Integer, nullable=False)
     description = Column(Text, nullable=True)
-    timestamp = Column(DateTime, default=func.now(), nullable=False)
+    # Filled client-side so the value is known without reading the row back
+    timestamp = Column(DateTime, default=datetime.now, nullable=False)
     
     # Foreign keys
-    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
-    device_id = Column(String(36), ForeignKey('devices.id'), nullable=True)
+    user_id = Column(BinaryUUID, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    device_id = Column(BinaryUUID, ForeignKey('devices.id', ondelete="SET NULL"), nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="records")
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, DateTime, Text, Index
+from app.db.database import Base
+from app.db.types import BinaryUUID
+from datetime import datetime
+
+class RecordArchive(Base):
+    """
+    Readings moved out of `records` by the retention job.
+    No foreign keys: archived readings outlive the devices they came from.
+    """
+    __tablename__ = "records_archive"
+    __table_args__ = (
+        Index("ix_records_archive_user_id_timestamp", "user_id", "timestamp"),
+        # InnoDB page compression; ignored by other backends
+        {"mysql_row_format": "COMPRESSED"},
+    )
+
+    id = Column(BinaryUUID, primary_key=True)
+    level = Column(Integer, nullable=False)
+    description = Column(Text, nullable=True)
+    timestamp = Column(DateTime, nullable=False)
+    user_id = Column(BinaryUUID, nullable=False)
+    device_id = Column(BinaryUUID, nullable=True)
+    archived_at = Column(DateTime, default=datetime.now, nullable=False)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, DateTime
+from sqlalchemy.orm import declared_attr
+from app.db.database import Base
+from app.db.types import BinaryUUID
+
+# device_id stored for readings that are not attached to a device
+NO_DEVICE = "00000000-0000-0000-0000-000000000000"
+
+class RecordRollupMixin:
+    """
+    Pre-aggregated glucose statistics for one user, device and bucket.
+    Sums and sums of squares allow mean and standard deviation to be derived
+    when buckets are merged; min/max and the time-in-range counters merge directly.
+    """
+
+    @declared_attr
+    def user_id(cls):
+        return Column(BinaryUUID, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+
+    device_id = Column(BinaryUUID, primary_key=True, default=NO_DEVICE)
+    bucket_start = Column(DateTime, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    level_sum = Column(BigInteger, nullable=False, default=0)
+    level_sum_squares = Column(BigInteger, nullable=False, default=0)
+    level_min = Column(Integer, nullable=False)
+    level_max = Column(Integer, nullable=False)
+    below_range = Column(Integer, nullable=False, default=0)
+    in_range = Column(Integer, nullable=False, default=0)
+    above_range = Column(Integer, nullable=False, default=0)
+
+class HourlyRecordRollup(RecordRollupMixin, Base):
+    __tablename__ = "record_rollups_hourly"
+
+class DailyRecordRollup(RecordRollupMixin, Base):
+    __tablename__ = "record_rollups_daily"
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, ForeignKey, Integer, DateTime, LargeBinary
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+from app.db.database import Base
+from app.db.types import BinaryUUID
+from app.db.models.rollup import NO_DEVICE
+
+class SeriesBlock(Base):
+    """
+    One day of compacted readings for a user and device (NO_DEVICE for readings
+    without a device), written by app.services.series_blocks in place of the raw rows.
+    About 2 bytes per reading instead of a full `records` row.
+    """
+    __tablename__ = "record_series_blocks"
+
+    user_id = Column(BinaryUUID, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    device_id = Column(BinaryUUID, primary_key=True, default=NO_DEVICE)
+    day = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    # Plain BLOB stops at 64 KB on MySQL, about 32,000 levels; MEDIUMBLOB holds 16 MB
+    # zlib-compressed little-endian uint32 seconds between readings, the first one from `day`
+    timestamps = Column(LargeBinary().with_variant(MEDIUMBLOB(), "mysql"), nullable=False)
+    # Little-endian uint16 levels in mg/dL, in timestamp order
+    levels = Column(LargeBinary().with_variant(MEDIUMBLOB(), "mysql"), nullable=False)
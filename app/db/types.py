@@ -0,0 +1,65 @@
+import os
+import time
+import uuid
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator, BINARY
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID (RFC 9562 version 7): a 48-bit Unix millisecond timestamp
+    followed by random bits. New keys land on the right edge of the clustered
+    index instead of splitting random pages.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & ~(0xF << 76) | 0x7 << 76  # version 7
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+def new_id() -> str:
+    """Primary key for new rows"""
+    return str(uuid7())
+
+class BinaryUUID(TypeDecorator):
+    """
+    UUID stored in 16 bytes: BINARY(16), or the native UUID type on PostgreSQL.
+    Python values stay canonical 36-character strings, so schemas, caches and
+    API payloads are unchanged. Byte order matches string order, so keyset
+    cursors compare the same way.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, uuid.UUID):
+            raw = value.bytes
+        else:
+            # bytes.fromhex is several times faster than uuid.UUID() on bulk inserts
+            try:
+                raw = bytes.fromhex(value.replace("-", ""))
+            except (ValueError, TypeError, AttributeError):
+                raw = None
+            if raw is None or len(raw) != 16:
+                # Not a UUID, so no row can match; NULL never compares equal to anything
+                return None
+        return str(uuid.UUID(bytes=raw)) if dialect.name == "postgresql" else raw
+
+    def bind_processor(self, dialect):
+        # Drivers accept bytes as is; skipping the impl's DBAPI Binary() wrapper saves a copy per value
+        if dialect.name == "postgresql":
+            return super().bind_processor(dialect)
+        return lambda value: self.process_bind_param(value, dialect)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            return str(value)
+        h = bytes(value).hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
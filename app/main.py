@@ -5,13 +5,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import database and models
-from app.db.database import engine, Base
+from app.db.database import engine, async_engine, Base
 
 from app.db.models.user import User
 from app.db.models.contact import Contact
 from app.db.models.device import Device
 from app.db.models.record import Record
+from app.db.models.record_archive import RecordArchive
 from app.db.models.alert import Alert
+from app.db.models.rollup import HourlyRecordRollup, DailyRecordRollup
+from app.db.models.series_block import SeriesBlock
+from app.db.models.alert_settings import AlertSettings
 
 # Uncomment this line to drop all tables
 # Base.metadata.drop_all(bind=engine) 
@@ -19,9 +23,34 @@ from app.db.models.alert import Alert
 # Create all tables
 Base.metadata.create_all(bind=engine)
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import router as api_router
+from app.core.security import hashing_executor
+from app.core.query_stats import QueryStatsMiddleware, query_metrics
+from app.core.http_metrics import HttpMetricsMiddleware, http_metrics
+from app.core.compression import CompressionMiddleware
+from app.services.alert_rules import alert_engine
+from app.services.write_behind import write_behind_buffers
+from app.services.deletion_jobs import deletion_jobs
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    alert_engine.start()
+    for buffer in write_behind_buffers:
+        buffer.start()
+    deletion_jobs.start()
+    yield
+    # Stop background workers on shutdown; buffered writes go first so their readings reach the alert engine
+    for buffer in write_behind_buffers:
+        await buffer.stop()
+    # Waits for the running deletion job; queued ones are marked interrupted
+    await deletion_jobs.stop()
+    await alert_engine.stop()
+    hashing_executor.shutdown()
+    await async_engine.dispose()
 
 # Create FastAPI app with metadata
 app = FastAPI(
@@ -29,7 +58,8 @@ app = FastAPI(
     description="API for glucose monitoring application",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
 #CORS Configuration
@@ -39,8 +69,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# gzip/brotli; inside the metrics middleware so payload sizes are bytes on the wire
+app.add_middleware(CompressionMiddleware)
+# Per-request SQL statement counts and timings
+app.add_middleware(QueryStatsMiddleware)
+# Latency histograms, status codes and payload sizes per route template
+app.add_middleware(HttpMetricsMiddleware)
+
 # Include API router
 app.include_router(api_router)
 
@@ -48,7 +86,17 @@ app.include_router(api_router)
 @app.get("/health", tags=["Health"])
 async def health_check():
     """Health check endpoint"""
-    return {"status": "ok", "environment": os.getenv("ENVIRONMENT", "development")}
+    return {
+        "status": "ok",
+        "environment": os.getenv("ENVIRONMENT", "development"),
+        "write_behind": {buffer.name: buffer.stats() for buffer in write_behind_buffers},
+        "deletion_jobs": deletion_jobs.stats(),
+    }
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(http_metrics.render() + query_metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
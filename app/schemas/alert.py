@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from enum import Enum
 
 class AlertLevel(str, Enum):
@@ -24,3 +24,24 @@ class Alert(AlertBase):
 
     class Config:
         from_attributes = True
+
+class AlertSettings(BaseModel):
+    enabled: bool
+    very_low: int
+    low: int
+    high: int
+    very_high: int
+    rate_of_change: float
+    sustained_low_minutes: int
+
+    class Config:
+        from_attributes = True
+
+class AlertSettingsUpdate(BaseModel):
+    enabled: bool | None = None
+    very_low: int | None = Field(default=None, gt=0)
+    low: int | None = Field(default=None, gt=0)
+    high: int | None = Field(default=None, gt=0)
+    very_high: int | None = Field(default=None, gt=0)
+    rate_of_change: float | None = Field(default=None, gt=0)
+    sustained_low_minutes: int | None = Field(default=None, gt=0)
@@ -22,4 +22,8 @@ class Device(DeviceBase):
     user_id: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DeviceApiKey(BaseModel):
+    device_id: str
+    api_key: str
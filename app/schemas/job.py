@@ -0,0 +1,25 @@
+from datetime import datetime
+from pydantic import BaseModel
+from enum import Enum
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    INTERRUPTED = "interrupted"
+
+class DeletionTarget(str, Enum):
+    DEVICE = "device"
+    USER = "user"
+
+class DeletionJob(BaseModel):
+    id: str
+    target: DeletionTarget
+    target_id: str
+    status: JobStatus
+    # Rows removed (or detached) so far, per table
+    rows: dict[str, int] = {}
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
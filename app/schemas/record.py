@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
+from enum import Enum
+from typing import Any
 
 class RecordBase(BaseModel):   
     level: int
@@ -18,4 +20,63 @@ class Record(RecordBase):
     timestamp: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BulkItemStatus(str, Enum):
+    ACCEPTED = "accepted"
+    REJECTED = "rejected"
+
+class RecordBulkItemResult(BaseModel):
+    index: int
+    status: BulkItemStatus
+    id: str | None = None
+    detail: Any = None
+
+class RecordBulkResult(BaseModel):
+    accepted: int
+    rejected: int
+    results: list[RecordBulkItemResult]
+
+class AggregationBucket(str, Enum):
+    FIVE_MINUTES = "5m"
+    HOUR = "1h"
+    DAY = "1d"
+
+class RecordAggregate(BaseModel):
+    bucket_start: datetime
+    count: int
+    min: int
+    max: int
+    mean: float
+    percentiles: dict[str, float] | None = None
+
+class AgpBin(BaseModel):
+    minute_of_day: int
+    count: int
+    percentiles: dict[str, float]
+
+class GlucoseMetrics(BaseModel):
+    start: datetime
+    end: datetime
+    readings: int
+    coverage: float
+    mean: float
+    standard_deviation: float
+    coefficient_of_variation: float
+    glucose_management_indicator: float
+    time_very_low: float
+    time_low: float
+    time_in_range: float
+    time_high: float
+    time_very_high: float
+    agp: list[AgpBin]
+
+class RecordIngest(BaseModel):
+    level: int
+    timestamp: datetime | None = None
+    description: str | None = None
+
+class RecordIngestResult(BaseModel):
+    accepted: int
+    rejected: int
+    errors: list[RecordBulkItemResult]
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+from itertools import chain
+import numpy as np
+from sqlalchemy import func, literal_column, cast, Integer, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.record import Record as RecordModel
+from app.services.series_blocks import fetch_block_series
+
+# Bucket widths supported by the aggregation API, in seconds
+BUCKET_SECONDS = {
+    "5m": 5 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+def epoch_seconds(dialect_name: str, column):
+    """
+    SQL expression for the number of seconds between the epoch and a naive
+    DATETIME column, independent of the connection time zone.
+    """
+    if dialect_name == "mysql":
+        return func.timestampdiff(literal_column("SECOND"), "1970-01-01 00:00:00", column)
+    if dialect_name == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    if dialect_name == "postgresql":
+        return cast(func.extract("epoch", column), Integer)
+    raise ValueError(f"Unsupported database backend: {dialect_name}")
+
+def whole_second(dialect_name: str, column):
+    """SQL condition that a DATETIME column has no fractional seconds"""
+    if dialect_name == "mysql":
+        return func.microsecond(column) == 0
+    if dialect_name == "sqlite":
+        # Stored as "YYYY-MM-DD HH:MM:SS[.ffffff]"; the fraction, if any, starts at character 21
+        return func.rtrim(func.substr(column, 21), "0") == ""
+    if dialect_name == "postgresql":
+        return func.date_trunc("second", column) == column
+    raise ValueError(f"Unsupported database backend: {dialect_name}")
+
+def bucket_expression(dialect_name: str, column, seconds: int):
+    """SQL expression for the index of the bucket a timestamp falls into"""
+    return func.floor(epoch_seconds(dialect_name, column) / seconds)
+
+def bucket_start(index: int, seconds: int) -> datetime:
+    return EPOCH + timedelta(seconds=int(index) * seconds)
+
+def record_filters(user_id: str, start: datetime, end: datetime, device_id: str | None = None) -> list:
+    filters = [
+        RecordModel.user_id == user_id,
+        RecordModel.timestamp >= start,
+        RecordModel.timestamp < end,
+    ]
+    if device_id:
+        filters.append(RecordModel.device_id == device_id)
+    return filters
+
+def integer_columns(rows: list, width: int) -> np.ndarray:
+    """
+    Converts result rows of integers into an (n, width) int64 array.
+    Flattening first is much faster than letting NumPy inspect each Row object.
+    """
+    return np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * width).reshape(-1, width)
+
+def grouped_statistics(buckets: np.ndarray, levels: np.ndarray, percentiles: list[float]) -> dict:
+    """
+    Computes per-bucket count/min/max/mean and percentiles over column arrays.
+    Values are sorted by (bucket, level) once; every statistic is then a
+    vectorized lookup into the sorted array, with no per-bucket Python loop.
+    """
+    order = np.lexsort((levels, buckets))
+    buckets = buckets[order]
+    levels = levels[order].astype(np.float64)
+
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(levels)]
+    counts = ends - starts
+
+    stats = {
+        "bucket": buckets[starts],
+        "count": counts,
+        "min": levels[starts],
+        "max": levels[ends - 1],
+        "mean": np.add.reduceat(levels, starts) / counts,
+    }
+
+    # Linear interpolation between the closest ranks, as numpy.percentile does
+    for q in percentiles:
+        position = starts + (counts - 1) * (q / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        stats[q] = levels[lower] + (levels[upper] - levels[lower]) * (position - lower)
+
+    return stats
+
+async def aggregate_records(
+    db: AsyncSession,
+    user_id: str,
+    start: datetime,
+    end: datetime,
+    bucket: str,
+    device_id: str | None = None,
+    percentiles: list[float] | None = None,
+) -> list[dict]:
+    """
+    Returns per-bucket glucose statistics for a time range.
+    Without percentiles the whole computation is a single GROUP BY query.
+    Percentiles need the individual values, so in that case the bucket index
+    and level columns are fetched in one query and reduced with NumPy; so are
+    ranges that include compacted series blocks.
+    """
+    seconds = BUCKET_SECONDS[bucket]
+    bucket_column = bucket_expression(db.bind.dialect.name, RecordModel.timestamp, seconds)
+    filters = record_filters(user_id, start, end, device_id)
+    block_timestamps, block_levels = await fetch_block_series(db, user_id, start, end, device_id)
+
+    if not percentiles and not len(block_levels):
+        bucket_index = bucket_column.label("bucket")
+        rows = (await db.execute(
+            select(
+                bucket_index,
+                func.count(RecordModel.level),
+                func.min(RecordModel.level),
+                func.max(RecordModel.level),
+                func.avg(RecordModel.level),
+            )
+            .where(*filters)
+            .group_by(bucket_index)
+            .order_by(bucket_index)
+        )).all()
+        return [
+            {
+                "bucket_start": bucket_start(index, seconds),
+                "count": count,
+                "min": minimum,
+                "max": maximum,
+                "mean": float(mean),
+            }
+            for index, count, minimum, maximum, mean in rows
+        ]
+
+    rows = (await db.execute(select(bucket_column, RecordModel.level).where(*filters))).all()
+    if not rows and not len(block_levels):
+        return []
+
+    columns = integer_columns(rows, 2)
+    buckets = np.concatenate([columns[:, 0], block_timestamps // seconds])
+    levels = np.concatenate([columns[:, 1], block_levels])
+    stats = grouped_statistics(buckets, levels, percentiles or [])
+
+    results = []
+    for i in range(len(stats["bucket"])):
+        result = {
+            "bucket_start": bucket_start(stats["bucket"][i], seconds),
+            "count": int(stats["count"][i]),
+            "min": int(stats["min"][i]),
+            "max": int(stats["max"][i]),
+            "mean": float(stats["mean"][i]),
+        }
+        if percentiles:
+            result["percentiles"] = {f"p{q:g}": float(stats[q][i]) for q in percentiles}
+        results.append(result)
+    return results
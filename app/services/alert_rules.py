@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from sqlalchemy import select, insert
+from app.core.cache import TTLCache, create_cache
+from app.db.database import AsyncSessionLocal
+from app.db.types import new_id
+from app.db.models.alert import Alert as AlertModel, AlertLevel
+from app.db.models.alert_settings import AlertSettings as AlertSettingsModel
+from app.services.alert_stream import alert_broker, alert_event
+
+logger = logging.getLogger(__name__)
+
+ALERT_RULES_ENABLED = os.getenv("ALERT_RULES_ENABLED", "true").lower() == "true"
+
+# Defaults used for users that never saved alert settings
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "very_low": 54,
+    "low": 70,
+    "high": 180,
+    "very_high": 250,
+    "rate_of_change": 3.0,
+    "sustained_low_minutes": 15,
+}
+
+# Glucose bands, from most to least severe on each side of the target range
+VERY_LOW, LOW, IN_RANGE, HIGH, VERY_HIGH = "very_low", "low", "in_range", "high", "very_high"
+
+BAND_ALERTS = {
+    VERY_LOW: (AlertLevel.CRITICAL, "Very low glucose: {level} mg/dL"),
+    LOW: (AlertLevel.HIGH, "Low glucose: {level} mg/dL"),
+    HIGH: (AlertLevel.MEDIUM, "High glucose: {level} mg/dL"),
+    VERY_HIGH: (AlertLevel.HIGH, "Very high glucose: {level} mg/dL"),
+}
+
+def classify(level: int, settings: dict) -> str:
+    if level < settings["very_low"]:
+        return VERY_LOW
+    if level < settings["low"]:
+        return LOW
+    if level > settings["very_high"]:
+        return VERY_HIGH
+    if level > settings["high"]:
+        return HIGH
+    return IN_RANGE
+
+def naive_timestamp(timestamp: datetime) -> datetime:
+    """
+    Readings may carry a UTC offset or not; converts aware timestamps to naive
+    local time, like the `datetime.now()` defaults, so every reading compares
+    """
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone().replace(tzinfo=None)
+
+class DeviceState:
+    """What the engine remembers about a device between readings"""
+
+    __slots__ = ("timestamp", "level", "band", "low_since", "low_alerted", "fast_change", "backfill")
+
+    def __init__(self):
+        self.timestamp = None
+        self.level = None
+        self.band = IN_RANGE
+        self.low_since = None
+        self.low_alerted = False
+        self.fast_change = False
+        # State of the late readings (older than `timestamp`) evaluated so far,
+        # so a backlog uploaded over several batches is evaluated as one series
+        self.backfill = None
+
+def evaluate(state: DeviceState, reading: dict, settings: dict) -> list[tuple[AlertLevel, str]]:
+    """
+    Applies every rule to one reading and updates the device state.
+    Rules are edge-triggered: a condition raises one alert when it starts,
+    not one alert per reading while it lasts.
+    """
+    alerts = []
+    level = reading["level"]
+    timestamp = reading["timestamp"]
+
+    # Threshold bands: alert when moving into a band further from the target range
+    band = classify(level, settings)
+    if band in BAND_ALERTS and band != state.band and not (state.band == VERY_LOW and band == LOW) \
+            and not (state.band == VERY_HIGH and band == HIGH):
+        alert_level, message = BAND_ALERTS[band]
+        alerts.append((alert_level, message.format(level=level)))
+
+    # Rate of change against the previous reading of the device
+    if state.timestamp is not None and timestamp > state.timestamp:
+        minutes = (timestamp - state.timestamp).total_seconds() / 60
+        rate = (level - state.level) / minutes
+        fast_change = abs(rate) >= settings["rate_of_change"]
+        if fast_change and not state.fast_change:
+            direction = "rising" if rate > 0 else "falling"
+            alerts.append((AlertLevel.MEDIUM, f"Glucose {direction} quickly: {rate:+.1f} mg/dL/min"))
+        state.fast_change = fast_change
+
+    # Sustained hypoglycemia: below the low threshold for the whole window
+    if band in (LOW, VERY_LOW):
+        if state.low_since is None:
+            state.low_since = timestamp
+            state.low_alerted = False
+        minutes_low = (timestamp - state.low_since).total_seconds() / 60
+        if not state.low_alerted and minutes_low >= settings["sustained_low_minutes"]:
+            alerts.append((AlertLevel.CRITICAL, f"Glucose below {settings['low']} mg/dL for {minutes_low:.0f} minutes"))
+            state.low_alerted = True
+    else:
+        state.low_since = None
+        state.low_alerted = False
+
+    state.timestamp = timestamp
+    state.level = level
+    state.band = band
+    return alerts
+
+class AlertRulesEngine:
+    """
+    Evaluates alert rules for ingested readings off the request path.
+    Ingestion only enqueues readings; a background task drains the queue in
+    batches, evaluates them and writes the resulting alerts with one INSERT.
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, max_devices: int, device_idle_seconds: float):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue | None = None
+        # Always in process: states are mutated in place. A device idle for longer than
+        # `device_idle_seconds` starts over from an empty state, like a new device.
+        self.devices = TTLCache(max_size=max_devices, ttl=device_idle_seconds)
+        self.settings_cache = create_cache("alert_settings", max_size=10000, ttl=300)
+        self.dropped = 0
+        self.evaluated = 0
+        self.alerts_created = 0
+        self._task = None
+        self._inflight = None
+
+    def submit(self, readings: list[dict]):
+        """Queues readings for evaluation without waiting; drops them when the queue is full"""
+        if self.queue is None:
+            return
+        for reading in readings:
+            if not reading.get("device_id"):
+                continue
+            reading = {**reading, "timestamp": naive_timestamp(reading["timestamp"])}
+            try:
+                self.queue.put_nowait(reading)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    def invalidate_settings(self, user_id: str):
+        self.settings_cache.delete(user_id)
+
+    async def load_settings(self, db, user_ids: set[str]) -> dict[str, dict]:
+        settings = {}
+        missing = set()
+        for user_id in user_ids:
+            cached = self.settings_cache.get(user_id)
+            if cached is None:
+                missing.add(user_id)
+            else:
+                settings[user_id] = cached
+        if missing:
+            rows = (await db.scalars(select(AlertSettingsModel).where(AlertSettingsModel.user_id.in_(missing)))).all()
+            loaded = {row.user_id: {key: getattr(row, key) for key in DEFAULT_SETTINGS} for row in rows}
+            for user_id in missing:
+                settings[user_id] = loaded.get(user_id, DEFAULT_SETTINGS)
+                self.settings_cache.set(user_id, settings[user_id])
+        return settings
+
+    async def process(self, readings: list[dict]):
+        async with AsyncSessionLocal() as db:
+            settings = await self.load_settings(db, {reading["user_id"] for reading in readings})
+            rows = []
+            owners = []
+            # Uploads may arrive out of order; evaluate each device chronologically
+            for reading in sorted(readings, key=lambda r: (r["device_id"], r["timestamp"])):
+                user_settings = settings[reading["user_id"]]
+                if not user_settings["enabled"]:
+                    continue
+                state = self.devices.get(reading["device_id"]) or DeviceState()
+                # Refreshes the idle timeout
+                self.devices.set(reading["device_id"], state)
+                if state.timestamp is not None and reading["timestamp"] <= state.timestamp:
+                    # A late reading (e.g. a device uploading its backlog after being offline)
+                    # must not rewind the live state; it is evaluated as its own series instead
+                    if reading["timestamp"] == state.timestamp:
+                        continue
+                    if state.backfill is None or reading["timestamp"] < state.backfill.timestamp:
+                        state.backfill = DeviceState()
+                    elif reading["timestamp"] == state.backfill.timestamp:
+                        continue
+                    state = state.backfill
+                for level, message in evaluate(state, reading, user_settings):
+                    rows.append({
+                        "id": new_id(),
+                        "message": message,
+                        "level": level,
+                        "timestamp": reading["timestamp"],
+                        "device_id": reading["device_id"],
+                    })
+                    owners.append(reading["user_id"])
+            self.evaluated += len(readings)
+            self.devices.expire()
+
+            if rows:
+                await db.execute(insert(AlertModel), rows)
+                await db.commit()
+                self.alerts_created += len(rows)
+                for user_id, row in zip(owners, rows):
+                    alert_broker.publish(user_id, alert_event(row))
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            # Shielded so stop() never cancels a batch halfway through its transaction
+            self._inflight = asyncio.ensure_future(self.process(batch))
+            try:
+                await asyncio.shield(self._inflight)
+            except Exception:
+                logger.exception("Alert rule evaluation failed for %d readings", len(batch))
+
+    def start(self):
+        if not ALERT_RULES_ENABLED or self._task is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._inflight is not None:
+            try:
+                await self._inflight
+            except Exception:
+                logger.exception("Alert rule evaluation failed during shutdown")
+            self._inflight = None
+        # Evaluate what was accepted before shutdown
+        pending = []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        if pending:
+            try:
+                await self.process(pending)
+            except Exception:
+                logger.exception("Alert rule evaluation failed for %d readings during shutdown", len(pending))
+        self.queue = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "evaluated": self.evaluated,
+            "alerts_created": self.alerts_created,
+            "dropped": self.dropped,
+            "tracked_devices": self.devices.stats()["size"],
+            "evicted_devices": self.devices.evictions,
+        }
+
+alert_engine = AlertRulesEngine(
+    queue_size=int(os.getenv("ALERT_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("ALERT_BATCH_SIZE", "500")),
+    max_devices=int(os.getenv("ALERT_MAX_DEVICES", "100000")),
+    device_idle_seconds=float(os.getenv("ALERT_DEVICE_IDLE_SECONDS", "21600"))
+)
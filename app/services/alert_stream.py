@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+class Subscription:
+    """A single connected client; only holds a small bounded queue"""
+
+    __slots__ = ("user_id", "queue", "overflowed")
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+class AlertBroker:
+    """
+    In-process fan-out of new alerts to per-user subscribers.
+    Every event gets a process-wide increasing id. The last events of each user
+    are kept so a reconnecting client can resume after the last id it saw.
+    Slow consumers whose queue fills up are disconnected instead of buffering
+    without bound; they resume from history when they reconnect.
+    Histories are kept for at most `history_users` users, and a user's history
+    is dropped once `history_ttl` seconds pass without a new event: connected
+    clients already received those events, and clients gone for that long reload.
+    """
+
+    def __init__(self, history_size: int, queue_size: int, history_users: int, history_ttl: float):
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self.history_users = history_users
+        self.history_ttl = history_ttl
+        self.channels: dict[str, set[Subscription]] = {}
+        # user id -> (time of the last event, events), least recently published first
+        self.history: OrderedDict[str, tuple[float, deque]] = OrderedDict()
+        self.sequence = itertools.count(1)
+        self.published = 0
+        self.disconnected_slow = 0
+
+    def publish(self, user_id: str, alert: dict):
+        event = (next(self.sequence), json.dumps(alert, default=str))
+        now = time.monotonic()
+        _, history = self.history.pop(user_id, (now, None))
+        if history is None:
+            history = deque(maxlen=self.history_size)
+        history.append(event)
+        self.history[user_id] = (now, history)
+        self.prune_history(now)
+        self.published += 1
+
+        for subscription in self.channels.get(user_id, ()):
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.overflow(subscription)
+
+    def prune_history(self, now: float):
+        while self.history:
+            user_id, (updated, _) = next(iter(self.history.items()))
+            if len(self.history) <= self.history_users and now - updated < self.history_ttl:
+                break
+            del self.history[user_id]
+
+    def overflow(self, subscription: Subscription):
+        # Drop the backlog and wake the consumer with a sentinel so it disconnects
+        subscription.overflowed = True
+        self.disconnected_slow += 1
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def subscribe(self, user_id: str, last_event_id: int | None = None) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        if last_event_id is not None:
+            for event in self.history.get(user_id, (0, ()))[1]:
+                if event[0] > last_event_id:
+                    try:
+                        subscription.queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        self.overflow(subscription)
+                        break
+        self.channels.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        channel = self.channels.get(subscription.user_id)
+        if channel is not None:
+            channel.discard(subscription)
+            if not channel:
+                del self.channels[subscription.user_id]
+                self.prune_history(time.monotonic())
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": sum(len(channel) for channel in self.channels.values()),
+            "channels": len(self.channels),
+            "histories": len(self.history),
+            "published": self.published,
+            "disconnected_slow": self.disconnected_slow,
+        }
+
+def alert_event(alert) -> dict:
+    """Event payload for an alert ORM object or insert row, shaped like schemas.alert.Alert"""
+    get = alert.get if isinstance(alert, dict) else lambda key: getattr(alert, key)
+    level = get("level")
+    return {
+        "message": get("message"),
+        "level": getattr(level, "value", level),
+        "timestamp": get("timestamp").isoformat(),
+        "id": get("id"),
+        "device_id": get("device_id"),
+    }
+
+# Seconds between keepalive comments on idle SSE connections
+KEEPALIVE_SECONDS = float(os.getenv("ALERT_STREAM_KEEPALIVE_SECONDS", "25"))
+
+alert_broker = AlertBroker(
+    history_size=int(os.getenv("ALERT_STREAM_HISTORY", "100")),
+    queue_size=int(os.getenv("ALERT_STREAM_QUEUE_SIZE", "100")),
+    history_users=int(os.getenv("ALERT_STREAM_HISTORY_USERS", "10000")),
+    history_ttl=float(os.getenv("ALERT_STREAM_HISTORY_SECONDS", "3600"))
+)
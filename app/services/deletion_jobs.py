@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime
+from sqlalchemy import select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import create_cache
+from app.core.http_cache import USER, DEVICES, CONTACTS, RECORDS, bump_version
+from app.db.database import AsyncSessionLocal
+from app.db.models.alert import Alert as AlertModel
+from app.db.models.alert_settings import AlertSettings as AlertSettingsModel
+from app.db.models.contact import Contact as ContactModel
+from app.db.models.device import Device as DeviceModel
+from app.db.models.record import Record as RecordModel
+from app.db.models.record_archive import RecordArchive
+from app.db.models.rollup import HourlyRecordRollup, DailyRecordRollup
+from app.db.models.series_block import SeriesBlock
+from app.db.models.user import User as UserModel
+from app.schemas.job import JobStatus, DeletionTarget
+from app.services.alert_rules import alert_engine
+from app.services.device_auth import invalidate_device_key
+from app.services.device_ownership import invalidate_user_devices
+from app.services.rollups import detach_device_rollups
+from app.services.series_blocks import detach_device_blocks
+
+logger = logging.getLogger(__name__)
+
+# Rows removed per statement (and per transaction) so locks and undo logs stay small
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", "5000"))
+# Finished jobs stay queryable for this long
+DELETION_JOB_TTL_SECONDS = float(os.getenv("DELETION_JOB_TTL_SECONDS", "86400"))
+
+async def execute_in_chunks(db: AsyncSession, statement, filters: list, key, chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+    """
+    Runs a set-based DELETE or UPDATE over the rows matching `filters`, at most
+    about `chunk_size` rows at a time and committing after each chunk.
+    Chunks are ranges of the indexed `key` column, so every statement is an
+    index range scan rather than an IN list; `statement` must make matched
+    rows stop matching `filters`. Returns the number of rows affected.
+    """
+    total = 0
+    while True:
+        bound = await db.scalar(select(key).where(*filters).order_by(key).offset(chunk_size - 1).limit(1))
+        chunk = statement.where(*filters)
+        if bound is not None:
+            chunk = chunk.where(key <= bound)
+        result = await db.execute(chunk)
+        await db.commit()
+        total += result.rowcount
+        if bound is None:
+            return total
+        # Let requests sharing the event loop run between chunks
+        await asyncio.sleep(0)
+
+async def delete_device_data(db: AsyncSession, device_id: str, rows: dict) -> list[str]:
+    """
+    Deletes a device and its alerts. Its readings stay with the user as readings
+    without a device; their rollups and series blocks are merged into the user's NO_DEVICE ones.
+    Returns the user ids whose caches must be invalidated.
+    """
+    user_id = await db.scalar(select(DeviceModel.user_id).where(DeviceModel.id == device_id))
+    if user_id is None:
+        return []
+
+    rows["alerts"] = await execute_in_chunks(db, delete(AlertModel), [AlertModel.device_id == device_id], AlertModel.timestamp)
+    rows["records"] = await execute_in_chunks(
+        db, update(RecordModel).values(device_id=None), [RecordModel.device_id == device_id], RecordModel.timestamp
+    )
+    rows["record_rollups"] = await detach_device_rollups(db, user_id, device_id)
+    rows["record_series_blocks"] = await detach_device_blocks(db, user_id, device_id)
+
+    # Writes that passed the ownership check before the device was marked as deleting
+    # can land behind the chunked passes; the few stragglers are swept again here,
+    # the records and alerts in the same transaction as the device itself
+    rows["record_rollups"] += await detach_device_rollups(db, user_id, device_id)
+    rows["alerts"] += (await db.execute(delete(AlertModel).where(AlertModel.device_id == device_id))).rowcount
+    rows["records"] += (await db.execute(
+        update(RecordModel).values(device_id=None).where(RecordModel.device_id == device_id)
+    )).rowcount
+    rows["devices"] = (await db.execute(delete(DeviceModel).where(DeviceModel.id == device_id))).rowcount
+    await db.commit()
+
+    invalidate_device_key(device_id)
+    alert_engine.devices.delete(device_id)
+    bump_version(user_id, DEVICES, RECORDS)
+    return [user_id]
+
+async def delete_user_data(db: AsyncSession, user_id: str, rows: dict) -> list[str]:
+    """Deletes a user and everything they own, children first so no statement relies on a database cascade"""
+    device_ids = list(await db.scalars(select(DeviceModel.id).where(DeviceModel.user_id == user_id)))
+    user_devices = select(DeviceModel.id).where(DeviceModel.user_id == user_id).scalar_subquery()
+
+    rows["alerts"] = await execute_in_chunks(db, delete(AlertModel), [AlertModel.device_id.in_(user_devices)], AlertModel.timestamp)
+    rows["records"] = await execute_in_chunks(db, delete(RecordModel), [RecordModel.user_id == user_id], RecordModel.timestamp)
+    rows["records_archive"] = await execute_in_chunks(db, delete(RecordArchive), [RecordArchive.user_id == user_id], RecordArchive.timestamp)
+    rows["record_series_blocks"] = await execute_in_chunks(db, delete(SeriesBlock), [SeriesBlock.user_id == user_id], SeriesBlock.day)
+    for table in (HourlyRecordRollup, DailyRecordRollup):
+        rows[table.__tablename__] = await execute_in_chunks(db, delete(table), [table.user_id == user_id], table.bucket_start)
+
+    # Small per-user tables go in the final transaction together with the user
+    for model, column in (
+        (AlertSettingsModel, AlertSettingsModel.user_id),
+        (ContactModel, ContactModel.user_id),
+        (DeviceModel, DeviceModel.user_id),
+        (UserModel, UserModel.id),
+    ):
+        rows[model.__tablename__] = (await db.execute(delete(model).where(column == user_id))).rowcount
+    await db.commit()
+
+    for device_id in device_ids:
+        invalidate_device_key(device_id)
+        alert_engine.devices.delete(device_id)
+    alert_engine.invalidate_settings(user_id)
+    bump_version(user_id, USER, DEVICES, CONTACTS, RECORDS)
+    return [user_id]
+
+DELETERS = {
+    DeletionTarget.DEVICE: delete_device_data,
+    DeletionTarget.USER: delete_user_data,
+}
+
+class DeletionJobs:
+    """
+    Runs device and account deletions off the request path.
+    Handlers mark the target inactive, submit a job and return 202; a background
+    task removes children with chunked set-based statements, then the parent.
+    Job state is kept in a cache backend so any worker can answer status requests
+    when CACHE_URL points at a shared backend.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue | None = None
+        self.jobs = create_cache("deletion_jobs", max_size=10000, ttl=DELETION_JOB_TTL_SECONDS)
+        # (target, target_id) -> job id for jobs not finished yet, so repeated deletes share a job
+        self.pending: dict[tuple[str, str], str] = {}
+        self.completed = 0
+        self.failed = 0
+        self._task = None
+        self._inflight = None
+
+    def get(self, job_id: str) -> dict | None:
+        return self.jobs.get(job_id)
+
+    def save(self, job: dict):
+        self.jobs.set(job["id"], job)
+
+    async def submit(self, target: DeletionTarget, target_id: str, user_id: str, on_complete=None) -> dict:
+        """
+        Queues the deletion of a device or user and returns the job.
+        `on_complete()` runs once the rows are gone, e.g. to drop caches the service cannot reach.
+        Without a running worker the job runs before this returns.
+        """
+        job_id = self.pending.get((target.value, target_id))
+        if job_id is not None and self.get(job_id) is not None:
+            return self.get(job_id)
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "target": target.value,
+            "target_id": target_id,
+            "user_id": user_id,
+            "status": JobStatus.PENDING.value,
+            "rows": {},
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+        }
+        self.save(job)
+        self.pending[(target.value, target_id)] = job["id"]
+        if self.queue is None:
+            await self.process(job, on_complete)
+        else:
+            self.queue.put_nowait((job, on_complete))
+        return self.get(job["id"]) or job
+
+    async def process(self, job: dict, on_complete=None):
+        job["status"] = JobStatus.RUNNING.value
+        self.save(job)
+        try:
+            async with AsyncSessionLocal() as db:
+                user_ids = await DELETERS[DeletionTarget(job["target"])](db, job["target_id"], job["rows"])
+            for user_id in user_ids:
+                invalidate_user_devices(user_id)
+            if on_complete is not None:
+                on_complete()
+            job["status"] = JobStatus.COMPLETED.value
+            self.completed += 1
+        except Exception as e:
+            logger.exception("Deletion of %s %s failed", job["target"], job["target_id"])
+            job["status"] = JobStatus.FAILED.value
+            job["error"] = str(e)
+            self.failed += 1
+        finally:
+            job["finished_at"] = datetime.now().isoformat()
+            self.save(job)
+            self.pending.pop((job["target"], job["target_id"]), None)
+
+    async def run(self):
+        while True:
+            job, on_complete = await self.queue.get()
+            # Shielded so stop() waits for the running job instead of cancelling it mid-chunk
+            self._inflight = asyncio.ensure_future(self.process(job, on_complete))
+            await asyncio.shield(self._inflight)
+
+    def start(self):
+        if self._task is not None:
+            return
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        # Every chunk commits on its own, so queued jobs can simply be requested again
+        while not self.queue.empty():
+            job, _ = self.queue.get_nowait()
+            job["status"] = JobStatus.INTERRUPTED.value
+            job["finished_at"] = datetime.now().isoformat()
+            self.save(job)
+            self.pending.pop((job["target"], job["target_id"]), None)
+        self.queue = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "pending": len(self.pending),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+deletion_jobs = DeletionJobs()
@@ -0,0 +1,56 @@
+import hashlib
+import hmac
+import os
+import secrets
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import create_cache
+from app.db.models.device import Device as DeviceModel, Status
+
+# Verified keys are cached so steady-state ingestion never touches the devices table
+device_key_cache = create_cache(
+    "device_keys",
+    max_size=int(os.getenv("DEVICE_KEY_CACHE_MAX_SIZE", "100000")),
+    ttl=float(os.getenv("DEVICE_KEY_CACHE_TTL_SECONDS", "300"))
+)
+
+def hash_api_key(secret: str) -> str:
+    """
+    Keys are 256 random bits, so a single SHA-256 is enough; bcrypt would
+    cost more per reading than the insert itself.
+    """
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+def generate_api_key(device_id: str) -> tuple[str, str]:
+    """Returns the key handed to the device ("<device_id>.<secret>") and the hash to store"""
+    secret = secrets.token_urlsafe(32)
+    return f"{device_id}.{secret}", hash_api_key(secret)
+
+async def authenticate_device(db: AsyncSession, api_key: str) -> dict | None:
+    """Returns {"device_id", "user_id"} for a valid key of an active device, otherwise None"""
+    device_id, _, secret = (api_key or "").partition(".")
+    if not device_id or not secret:
+        return None
+
+    entry = device_key_cache.get(device_id)
+    if entry is None:
+        row = (await db.execute(
+            select(DeviceModel.user_id, DeviceModel.status, DeviceModel.api_key_hash)
+            .where(DeviceModel.id == device_id)
+        )).first()
+        if row is None or row.api_key_hash is None:
+            return None
+        entry = {
+            "user_id": row.user_id,
+            "active": row.status == Status.ACTIVE,
+            "api_key_hash": row.api_key_hash,
+        }
+        device_key_cache.set(device_id, entry)
+
+    if not entry["active"] or not hmac.compare_digest(entry["api_key_hash"], hash_api_key(secret)):
+        return None
+    return {"device_id": device_id, "user_id": entry["user_id"]}
+
+def invalidate_device_key(device_id: str):
+    """Must be called whenever a device's key, status or owner changes, or the device is deleted"""
+    device_key_cache.delete(device_id)
@@ -0,0 +1,52 @@
+import os
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import create_cache
+from app.db.models.device import Device as DeviceModel
+
+# Device ids owned by each user; invalidated when devices are created or deleted
+device_ids_cache = create_cache(
+    "device_ids",
+    max_size=int(os.getenv("DEVICE_OWNERSHIP_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.getenv("DEVICE_OWNERSHIP_CACHE_TTL_SECONDS", "300"))
+)
+
+# Devices whose deletion has been requested. The row stays until the deletion job
+# reaches it, but the device must stop accepting readings right away.
+deleting_devices = create_cache(
+    "deleting_devices",
+    max_size=int(os.getenv("DEVICE_OWNERSHIP_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.getenv("DELETION_JOB_TTL_SECONDS", "86400"))
+)
+
+async def load_user_device_ids(db: AsyncSession, user_id: str) -> list[str]:
+    device_ids = list(await db.scalars(select(DeviceModel.id).where(DeviceModel.user_id == user_id)))
+    device_ids_cache.set(user_id, device_ids)
+    return device_ids
+
+async def get_user_device_ids(db: AsyncSession, user_id: str, expected: set[str] | None = None) -> set[str]:
+    """
+    Returns the ids of the user's devices, querying only the id column on a cache miss.
+    The set is also re-queried when it lacks one of `expected`: the device may have been
+    created on another worker, whose invalidation only reaches this one through CACHE_URL.
+    Those of `expected` that are being deleted are left out.
+    """
+    device_ids = device_ids_cache.get(user_id)
+    if device_ids is None or (expected and not expected.issubset(device_ids)):
+        device_ids = await load_user_device_ids(db, user_id)
+    device_ids = set(device_ids)
+    if expected:
+        device_ids -= {device_id for device_id in expected if deleting_devices.get(device_id) is not None}
+    return device_ids
+
+async def user_owns_device(db: AsyncSession, user_id: str, device_id: str) -> bool:
+    return device_id in await get_user_device_ids(db, user_id, {device_id})
+
+def invalidate_user_devices(user_id: str):
+    """Must be called by every path that creates, deletes or reassigns a device"""
+    device_ids_cache.delete(user_id)
+
+def mark_device_deleting(user_id: str, device_id: str):
+    """Must be called as soon as a device's deletion is requested, before its job runs"""
+    deleting_devices.set(device_id, True)
+    invalidate_user_devices(user_id)
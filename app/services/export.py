@@ -0,0 +1,148 @@
+import bisect
+import csv
+import heapq
+import io
+import json
+import os
+import zlib
+from collections.abc import AsyncIterator
+from datetime import datetime
+from sqlalchemy import select
+from app.db.database import AsyncSessionLocal
+from app.db.models.record import Record as RecordModel
+from app.db.models.alert import Alert as AlertModel
+from app.db.models.device import Device as DeviceModel
+from app.services.series_blocks import iter_block_readings
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_COLUMNS = ("type", "id", "device_id", "timestamp", "level", "description")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def record_rows(user_id: str, device_id: str | None = None, start: datetime | None = None, end: datetime | None = None):
+    query = select(
+        RecordModel.id, RecordModel.device_id, RecordModel.timestamp, RecordModel.level, RecordModel.description
+    ).where(RecordModel.user_id == user_id)
+    if device_id:
+        query = query.where(RecordModel.device_id == device_id)
+    if start:
+        query = query.where(RecordModel.timestamp >= start)
+    if end:
+        query = query.where(RecordModel.timestamp < end)
+    return query.order_by(RecordModel.timestamp, RecordModel.id)
+
+def alert_rows(user_id: str, device_id: str | None = None, start: datetime | None = None, end: datetime | None = None):
+    query = select(
+        AlertModel.id, AlertModel.device_id, AlertModel.timestamp, AlertModel.level, AlertModel.message
+    ).join(DeviceModel, DeviceModel.id == AlertModel.device_id).where(DeviceModel.user_id == user_id)
+    if device_id:
+        query = query.where(AlertModel.device_id == device_id)
+    if start:
+        query = query.where(AlertModel.timestamp >= start)
+    if end:
+        query = query.where(AlertModel.timestamp < end)
+    return query.order_by(AlertModel.timestamp, AlertModel.id)
+
+async def iter_block_rows(db, user_id: str, device_id: str | None, start: datetime | None, end: datetime | None):
+    """Compacted readings as batches of record_rows-shaped rows"""
+    async for readings in iter_block_readings(db, user_id, start, end, device_id):
+        yield [(reading.id, reading.device_id, reading.timestamp, reading.level, None) for reading in readings]
+
+async def merge_batches(first, second, key) -> AsyncIterator[list]:
+    """
+    Merges two async iterators of sorted row batches into sorted batches.
+    Rows up to the smaller of the two batch ends are final, so at most one
+    batch per source is held in memory.
+    """
+    pending = {first: [], second: []}
+    while True:
+        for source in list(pending):
+            if not pending[source]:
+                batch = await anext(source, None)
+                if batch is None:
+                    del pending[source]
+                else:
+                    pending[source] = list(batch)
+        if not pending:
+            return
+        if len(pending) == 1:
+            source, rows = next(iter(pending.items()))
+            pending[source] = []
+            yield rows
+            continue
+        bound = min(key(rows[-1]) for rows in pending.values())
+        ready = []
+        for source, rows in pending.items():
+            cut = bisect.bisect_right(rows, bound, key=key)
+            ready.append(rows[:cut])
+            pending[source] = rows[cut:]
+        yield list(heapq.merge(*ready, key=key))
+
+def encode_csv(kind: str, rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for id, device_id, timestamp, level, description in rows:
+        writer.writerow((kind, id, device_id or "", timestamp.isoformat(), getattr(level, "value", level), description or ""))
+    return buffer.getvalue().encode()
+
+def encode_ndjson(kind: str, rows) -> bytes:
+    text_field = "description" if kind == "record" else "message"
+    return "".join(
+        json.dumps({
+            "type": kind,
+            "id": id,
+            "device_id": device_id,
+            "timestamp": timestamp.isoformat(),
+            "level": getattr(level, "value", level),
+            text_field: description,
+        }) + "\n"
+        for id, device_id, timestamp, level, description in rows
+    ).encode()
+
+async def iter_export(
+    user_id: str,
+    format: str,
+    include_alerts: bool = False,
+    device_id: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yields the user's history in CSV or NDJSON, one cursor batch at a time.
+    Uses its own session because request-scoped sessions are closed before
+    a streaming response body is sent. Memory stays constant: only one batch
+    of plain rows is alive at any time, no ORM objects are built.
+    """
+    encode = encode_csv if format == "csv" else encode_ndjson
+    if format == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+
+    queries = [("record", record_rows(user_id, device_id, start, end))]
+    if include_alerts:
+        queries.append(("alert", alert_rows(user_id, device_id, start, end)))
+
+    # Blocks are read on a second session while the first one streams its cursor
+    async with AsyncSessionLocal() as db, AsyncSessionLocal() as blocks_db:
+        for kind, query in queries:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            batches = result.partitions()
+            if kind == "record":
+                # Compacted readings are merged back in time order
+                batches = merge_batches(batches, iter_block_rows(blocks_db, user_id, device_id, start, end), key=lambda row: (row[2], row[0]))
+            async for batch in batches:
+                if batch:
+                    yield encode(kind, batch)
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compresses a byte stream on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,91 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.record import Record as RecordModel
+from app.services.aggregation import epoch_seconds, grouped_statistics, integer_columns, record_filters
+from app.services.rollups import TARGET_RANGE_LOW, TARGET_RANGE_HIGH
+from app.services.series_blocks import concatenate_series, fetch_block_series
+
+# Consensus thresholds for clinically significant hypo- and hyperglycemia, in mg/dL
+VERY_LOW = 54
+VERY_HIGH = 250
+
+# Ambulatory glucose profile percentile bands
+AGP_PERCENTILES = [5, 25, 50, 75, 95]
+
+# Nominal CGM sampling interval used to estimate sensor coverage
+READING_INTERVAL_SECONDS = 5 * 60
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+def compute_metrics(
+    timestamps: np.ndarray,
+    levels: np.ndarray,
+    window_seconds: float,
+    agp_bin_minutes: int = 60,
+) -> dict | None:
+    """
+    Computes standard CGM metrics from epoch-second timestamps and levels.
+    Everything is vectorized over the input arrays; there is no per-reading
+    Python code, so a year of 5-minute readings takes milliseconds.
+    """
+    count = len(levels)
+    if count == 0:
+        return None
+
+    levels = levels.astype(np.float64)
+    mean = levels.mean()
+    sd = levels.std(ddof=1) if count > 1 else 0.0
+
+    def percent(mask: np.ndarray) -> float:
+        return float(np.count_nonzero(mask)) * 100.0 / count
+
+    # AGP: percentiles of all readings that fall into the same time-of-day bin
+    bin_seconds = agp_bin_minutes * 60
+    time_of_day_bins = (timestamps % SECONDS_PER_DAY) // bin_seconds
+    agp = grouped_statistics(time_of_day_bins, levels, AGP_PERCENTILES)
+
+    return {
+        "readings": count,
+        "coverage": min(100.0, count * READING_INTERVAL_SECONDS * 100.0 / window_seconds),
+        "mean": float(mean),
+        "standard_deviation": float(sd),
+        "coefficient_of_variation": float(sd * 100.0 / mean) if mean else 0.0,
+        "glucose_management_indicator": float(3.31 + 0.02392 * mean),
+        "time_very_low": percent(levels < VERY_LOW),
+        "time_low": percent((levels >= VERY_LOW) & (levels < TARGET_RANGE_LOW)),
+        "time_in_range": percent((levels >= TARGET_RANGE_LOW) & (levels <= TARGET_RANGE_HIGH)),
+        "time_high": percent((levels > TARGET_RANGE_HIGH) & (levels <= VERY_HIGH)),
+        "time_very_high": percent(levels > VERY_HIGH),
+        "agp": [
+            {
+                "minute_of_day": int(agp["bucket"][i]) * agp_bin_minutes,
+                "count": int(agp["count"][i]),
+                "percentiles": {f"p{q}": float(agp[q][i]) for q in AGP_PERCENTILES},
+            }
+            for i in range(len(agp["bucket"]))
+        ],
+    }
+
+async def fetch_series(
+    db: AsyncSession,
+    user_id: str,
+    start: datetime,
+    end: datetime,
+    device_id: str | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fetches (epoch seconds, level) columns for a window as NumPy arrays,
+    merging raw records with compacted series blocks. Arrays are not sorted.
+    Only two integer columns cross the wire and no ORM objects are built.
+    """
+    timestamp_column = epoch_seconds(db.bind.dialect.name, RecordModel.timestamp)
+    rows = (await db.execute(
+        select(timestamp_column, RecordModel.level).where(*record_filters(user_id, start, end, device_id))
+    )).all()
+    parts = [await fetch_block_series(db, user_id, start, end, device_id)]
+    if rows:
+        columns = integer_columns(rows, 2)
+        parts.append((columns[:, 0], columns[:, 1]))
+    return concatenate_series(parts)
@@ -0,0 +1,59 @@
+"""
+Copies a database created with CHAR(36) ids into a fresh database that uses
+16-byte ids (app.db.types.BinaryUUID).
+
+DATABASE_URL points at the new, empty database; its tables are created from the
+current models. Ids are kept, so tokens, device keys and links stay valid; only
+rows created afterwards get time-ordered ids. Stop writers before running it.
+
+Usage: python -m app.services.id_migration --source mysql+pymysql://user:pw@host/old_db
+"""
+import argparse
+import os
+from sqlalchemy import MetaData, create_engine, insert, select, func
+
+COPY_CHUNK_SIZE = int(os.getenv("ID_MIGRATION_CHUNK_SIZE", "10000"))
+
+def copy_table(source, target, source_table, target_table, chunk_size: int = COPY_CHUNK_SIZE) -> int:
+    """
+    Streams rows in chunks; string ids are converted by the BinaryUUID columns on insert.
+    Each chunk commits on its own, so memory stays flat for large tables.
+    """
+    columns = [column.name for column in target_table.columns if column.name in source_table.columns]
+    copied = 0
+    with source.connect() as reader:
+        result = reader.execution_options(stream_results=True).execute(select(*(source_table.c[name] for name in columns)))
+        for rows in result.partitions(chunk_size):
+            with target.begin() as writer:
+                writer.execute(insert(target_table), [dict(zip(columns, row)) for row in rows])
+            copied += len(rows)
+    return copied
+
+def main():
+    # Importing the app registers every model and creates the tables in the target database
+    import app.main  # noqa: F401
+    from app.db.database import Base, engine
+
+    parser = argparse.ArgumentParser(description="Copy a database with CHAR(36) ids into one with binary ids")
+    parser.add_argument("--source", required=True, help="SQLAlchemy URL of the existing database")
+    args = parser.parse_args()
+
+    source = create_engine(args.source)
+    source_metadata = MetaData()
+    source_metadata.reflect(bind=source)
+
+    with engine.connect() as connection:
+        non_empty = [table.name for table in Base.metadata.sorted_tables if connection.scalar(select(func.count()).select_from(table))]
+    if non_empty:
+        raise SystemExit(f"target database is not empty: {', '.join(non_empty)}")
+
+    # Parents before children so foreign keys are satisfied
+    for table in Base.metadata.sorted_tables:
+        source_table = source_metadata.tables.get(table.name)
+        if source_table is None:
+            print(f"{table.name}: not in source, skipped")
+            continue
+        print(f"{table.name}: {copy_table(source, engine, source_table, table)} rows")
+
+if __name__ == "__main__":
+    main()
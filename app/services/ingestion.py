@@ -0,0 +1,107 @@
+import os
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import insert
+from app.core.http_cache import RECORDS, bump_version
+from app.db.database import AsyncSessionLocal
+from app.db.types import new_id
+from app.db.models.record import Record as RecordModel
+from app.schemas.record import RecordIngest, RecordIngestResult, RecordBulkItemResult, BulkItemStatus
+from app.services.alert_rules import alert_engine
+from app.services.rollups import apply_readings
+
+# Readings are written in micro-batches of at most this many rows
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+# Upper bound on how long a WebSocket reading waits in a partial batch
+INGEST_FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "200"))
+INGEST_MAX_LINE_BYTES = int(os.getenv("INGEST_MAX_LINE_BYTES", "65536"))
+# Rejected lines beyond this are counted but not described
+INGEST_MAX_REPORTED_ERRORS = 100
+
+class LineTooLong(ValueError):
+    pass
+
+async def write_readings(rows: list[dict]):
+    """Inserts a micro-batch with its rollups in one transaction, then hands it to the alert engine"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(RecordModel), rows)
+        await apply_readings(db, rows)
+        await db.commit()
+    # A micro-batch comes from a single device, so from a single user
+    bump_version(rows[0]["user_id"], RECORDS)
+    alert_engine.submit(rows)
+
+class IngestBatch:
+    """
+    Collects NDJSON readings from one authenticated device.
+    Each line is a reading without user_id or device_id; both come from the device key.
+    """
+
+    __slots__ = ("user_id", "device_id", "rows", "partial", "line", "accepted", "rejected", "errors")
+
+    def __init__(self, device: dict):
+        self.user_id = device["user_id"]
+        self.device_id = device["device_id"]
+        self.rows = []
+        self.partial = b""
+        self.line = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+
+    @property
+    def full(self) -> bool:
+        return len(self.rows) >= INGEST_BATCH_SIZE
+
+    def feed(self, chunk: bytes):
+        """Adds a chunk of a stream; an incomplete last line is kept for the next chunk"""
+        *lines, self.partial = (self.partial + chunk).split(b"\n")
+        # Complete lines too: a single chunk (e.g. a WebSocket message) can hold a huge one
+        if any(len(line) > INGEST_MAX_LINE_BYTES for line in (*lines, self.partial)):
+            raise LineTooLong(f"Lines must be at most {INGEST_MAX_LINE_BYTES} bytes")
+        for line in lines:
+            self.add_line(line)
+
+    def end(self):
+        if self.partial:
+            self.add_line(self.partial)
+            self.partial = b""
+
+    def add_line(self, line: bytes):
+        if not line.strip():
+            return
+        index = self.line
+        self.line += 1
+        try:
+            reading = RecordIngest.model_validate_json(line)
+        except ValidationError as e:
+            self.rejected += 1
+            if len(self.errors) < INGEST_MAX_REPORTED_ERRORS:
+                self.errors.append(RecordBulkItemResult(
+                    index=index,
+                    status=BulkItemStatus.REJECTED,
+                    detail=e.errors(include_url=False, include_context=False, include_input=False)
+                ))
+            return
+        self.rows.append({
+            "id": new_id(),
+            "level": reading.level,
+            "description": reading.description,
+            "timestamp": reading.timestamp or datetime.now(),
+            "user_id": self.user_id,
+            "device_id": self.device_id,
+        })
+
+    async def flush(self):
+        if self.rows:
+            rows, self.rows = self.rows, []
+            await write_readings(rows)
+            self.accepted += len(rows)
+
+    def take_result(self) -> RecordIngestResult:
+        """Returns the counts since the previous call and resets them"""
+        result = RecordIngestResult(accepted=self.accepted, rejected=self.rejected, errors=self.errors)
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+        return result
@@ -0,0 +1,114 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Catch-all partition for rows beyond the newest monthly partition
+MAX_PARTITION = "pmax"
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: datetime) -> str:
+    return f"p{month:%Y%m}"
+
+def partition_clause(month: datetime) -> str:
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')"
+
+def supports_partitioning(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "mysql"
+
+async def list_partitions(db: AsyncSession) -> list[tuple[str, datetime | None]]:
+    """Returns (name, exclusive upper bound) for each partition of `records`, oldest first; pmax has no bound"""
+    rows = await db.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'records' AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ))
+    partitions = []
+    for name, description in rows:
+        bound = None if description == "MAXVALUE" else datetime.fromisoformat(description.strip("'"))
+        partitions.append((name, bound))
+    return partitions
+
+async def partition_records_table(db: AsyncSession, months_ahead: int = 3):
+    """
+    Converts `records` into monthly RANGE COLUMNS partitions on `timestamp`, from the
+    oldest reading's month to `months_ahead` months from now, plus a catch-all partition.
+    MySQL requires the partition column in every unique key and does not allow foreign
+    keys on partitioned tables, so the primary key becomes (id, timestamp) and the
+    foreign keys of `records` are dropped; deletes of users and devices remove their
+    readings explicitly.
+    """
+    oldest = await db.scalar(text("SELECT MIN(timestamp) FROM records"))
+    first = month_start(oldest or datetime.now())
+    last = add_months(month_start(datetime.now()), months_ahead)
+
+    foreign_keys = (await db.scalars(text(
+        "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'records'"
+    ))).all()
+    for name in foreign_keys:
+        await db.execute(text(f"ALTER TABLE records DROP FOREIGN KEY `{name}`"))
+    await db.execute(text("ALTER TABLE records DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"))
+
+    clauses = []
+    month = first
+    while month <= last:
+        clauses.append(partition_clause(month))
+        month = add_months(month, 1)
+    clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    await db.execute(text(f"ALTER TABLE records PARTITION BY RANGE COLUMNS(timestamp) ({', '.join(clauses)})"))
+
+async def extend_partitions(db: AsyncSession, months_ahead: int = 3) -> list[str]:
+    """Splits the catch-all partition so monthly partitions exist `months_ahead` months from now"""
+    bounds = [bound for _, bound in await list_partitions(db) if bound is not None]
+    if not bounds:
+        return []
+    month = max(bounds)
+    last = add_months(month_start(datetime.now()), months_ahead)
+    clauses = []
+    added = []
+    while month <= last:
+        clauses.append(partition_clause(month))
+        added.append(partition_name(month))
+        month = add_months(month, 1)
+    if clauses:
+        clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE)")
+        await db.execute(text(f"ALTER TABLE records REORGANIZE PARTITION {MAX_PARTITION} INTO ({', '.join(clauses)})"))
+    return added
+
+async def archive_partitions_before(db: AsyncSession, cutoff: datetime) -> list[str]:
+    """
+    Moves every monthly partition that ends on or before `cutoff` into `records_archive`
+    and drops it. Dropping a partition is a metadata operation, unlike a range DELETE.
+    The bulk copy runs without locks; late readings written to the partition meanwhile
+    are copied again under a write lock on both tables, held until the partition is dropped.
+    """
+    archived = []
+    for name, bound in await list_partitions(db):
+        if bound is None or bound > cutoff:
+            continue
+        await db.execute(text(
+            "INSERT INTO records_archive (id, level, description, timestamp, user_id, device_id, archived_at) "
+            f"SELECT id, level, description, timestamp, user_id, device_id, NOW() FROM records PARTITION ({name})"
+        ))
+        await db.commit()
+
+        # LOCK TABLES and the DDL commit implicitly; everything up to UNLOCK stays on this session's connection
+        await db.execute(text("LOCK TABLES records WRITE, records_archive WRITE, records_archive AS archived READ"))
+        try:
+            await db.execute(text(
+                "INSERT INTO records_archive (id, level, description, timestamp, user_id, device_id, archived_at) "
+                f"SELECT id, level, description, timestamp, user_id, device_id, NOW() FROM records PARTITION ({name}) "
+                "WHERE NOT EXISTS (SELECT 1 FROM records_archive AS archived WHERE archived.id = records.id)"
+            ))
+            await db.execute(text(f"ALTER TABLE records DROP PARTITION {name}"))
+        finally:
+            await db.execute(text("UNLOCK TABLES"))
+            await db.commit()
+        archived.append(name)
+    return archived
\ No newline at end of file
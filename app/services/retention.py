@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, insert, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.record import Record as RecordModel
+from app.db.models.record_archive import RecordArchive
+from app.db.models.rollup import NO_DEVICE
+from app.db.types import BinaryUUID
+from app.core.http_cache import RECORDS, bump_version
+from app.services.aggregation import EPOCH, bucket_expression, epoch_seconds, integer_columns, whole_second
+from app.services.partitions import supports_partitioning, list_partitions, archive_partitions_before
+from app.services.series_blocks import SERIES_COMPACT_AFTER_DAYS, MAX_BLOCK_LEVEL, append_to_block
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is only needed for Parquet archives
+    pyarrow = None
+
+# Readings older than this are moved out of `records`; rollups keep their statistics
+RECORDS_RETENTION_DAYS = int(os.getenv("RECORDS_RETENTION_DAYS", "730"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("RECORDS_ARCHIVE_BATCH_SIZE", "5000"))
+
+ARCHIVE_COLUMNS = ("id", "level", "description", "timestamp", "user_id", "device_id")
+
+def bump_records_versions(user_ids):
+    """Readings left `records`, so the users' cached record listings are stale"""
+    for user_id in set(user_ids):
+        bump_version(user_id, RECORDS)
+
+def retention_cutoff(days: int = RECORDS_RETENTION_DAYS) -> datetime:
+    """Start of the day `days` ago; whole days keep every rollup bucket in a single table"""
+    return (datetime.now() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+async def archive_records(db: AsyncSession, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Moves readings older than `cutoff` into `records_archive` in batches, one
+    transaction per batch so locks stay short. Whole monthly partitions are
+    moved and dropped first when `records` is partitioned.
+    Returns the number of rows moved batch by batch.
+    """
+    cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+    if supports_partitioning(db) and await list_partitions(db):
+        user_ids = (await db.scalars(select(RecordModel.user_id).where(RecordModel.timestamp < cutoff).distinct())).all()
+        await archive_partitions_before(db, cutoff)
+        bump_records_versions(user_ids)
+
+    moved = 0
+    while True:
+        rows = (await db.execute(
+            select(RecordModel.id, RecordModel.user_id).where(RecordModel.timestamp < cutoff).order_by(RecordModel.timestamp).limit(batch_size)
+        )).all()
+        if not rows:
+            return moved
+        ids = [row.id for row in rows]
+        columns = [getattr(RecordModel, column) for column in ARCHIVE_COLUMNS]
+        await db.execute(insert(RecordArchive).from_select(ARCHIVE_COLUMNS, select(*columns).where(RecordModel.id.in_(ids))))
+        await db.execute(delete(RecordModel).where(RecordModel.id.in_(ids)))
+        await db.commit()
+        bump_records_versions(row.user_id for row in rows)
+        moved += len(ids)
+
+async def export_records_to_parquet(db: AsyncSession, cutoff: datetime, directory: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Writes readings older than `cutoff` to Parquet files (one per batch) and deletes them
+    from `records`. Each file is fully written before its rows are deleted.
+    """
+    if pyarrow is None:
+        raise RuntimeError("Parquet archives require pyarrow (pip install pyarrow)")
+    os.makedirs(directory, exist_ok=True)
+
+    moved = 0
+    while True:
+        rows = (await db.execute(
+            select(*(getattr(RecordModel, column) for column in ARCHIVE_COLUMNS))
+            .where(RecordModel.timestamp < cutoff)
+            .order_by(RecordModel.timestamp)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            return moved
+        table = pyarrow.table({column: [row[i] for row in rows] for i, column in enumerate(ARCHIVE_COLUMNS)})
+        path = os.path.join(directory, f"records-{rows[0].timestamp:%Y%m%dT%H%M%S}-{rows[0].id}.parquet")
+        pyarrow.parquet.write_table(table, path, compression="zstd")
+        await db.execute(delete(RecordModel).where(RecordModel.id.in_([row.id for row in rows])))
+        await db.commit()
+        bump_records_versions(row.user_id for row in rows)
+        moved += len(rows)
+
+async def compact_records(db: AsyncSession, cutoff: datetime, batch_days: int = 100) -> int:
+    """
+    Replaces the raw readings of whole days before `cutoff` with series blocks,
+    one block per user, device and day, one transaction per `batch_days` blocks.
+    Readings with a description, a level a block cannot hold or a fractional second
+    (blocks store whole epoch seconds) stay in `records`.
+    Rollups are untouched. Returns the number of readings compacted.
+    """
+    cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+    dialect_name = db.bind.dialect.name
+    device_key = func.coalesce(RecordModel.device_id, literal(NO_DEVICE, BinaryUUID))
+    compactable = [
+        RecordModel.timestamp < cutoff,
+        RecordModel.description.is_(None),
+        RecordModel.level.between(0, MAX_BLOCK_LEVEL),
+        whole_second(dialect_name, RecordModel.timestamp),
+    ]
+
+    compacted = 0
+    while True:
+        days = (await db.execute(
+            select(RecordModel.user_id, device_key, bucket_expression(dialect_name, RecordModel.timestamp, 24 * 60 * 60))
+            .where(*compactable)
+            .distinct()
+            .limit(batch_days)
+        )).all()
+        if not days:
+            return compacted
+        for user_id, device_id, day_index in days:
+            day = EPOCH + timedelta(days=int(day_index))
+            filters = [
+                *compactable,
+                RecordModel.user_id == user_id,
+                RecordModel.device_id.is_(None) if device_id == NO_DEVICE else RecordModel.device_id == device_id,
+                RecordModel.timestamp >= day,
+                RecordModel.timestamp < day + timedelta(days=1),
+            ]
+            rows = (await db.execute(
+                select(epoch_seconds(dialect_name, RecordModel.timestamp), RecordModel.level).where(*filters)
+            )).all()
+            columns = integer_columns(rows, 2)
+            await append_to_block(db, user_id, device_id, day, columns[:, 0], columns[:, 1])
+            await db.execute(delete(RecordModel).where(*filters))
+            compacted += len(rows)
+        await db.commit()
+        # Compacted readings get new ids in listings
+        bump_records_versions(user_id for user_id, _, _ in days)
+
+async def main():
+    # Importing the app registers every model and creates missing tables
+    import app.main  # noqa: F401
+    from app.db.database import AsyncSessionLocal, async_engine
+    from app.services.partitions import partition_records_table, extend_partitions
+
+    parser = argparse.ArgumentParser(description="Partitioning and retention for glucose records")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    archive = subcommands.add_parser("archive", help="Move readings older than the retention period out of `records`")
+    archive.add_argument("--days", type=int, default=RECORDS_RETENTION_DAYS, help="Retention period in days")
+    archive.add_argument("--parquet", metavar="DIRECTORY", help="Write Parquet files instead of using the archive table")
+    compact = subcommands.add_parser("compact", help="Pack readings of whole days into compact series blocks")
+    compact.add_argument("--days", type=int, default=SERIES_COMPACT_AFTER_DAYS, help="Compact days older than this")
+    for name, help in (("partition", "Partition `records` by month (MySQL only)"), ("extend-partitions", "Add upcoming monthly partitions (MySQL only)")):
+        command = subcommands.add_parser(name, help=help)
+        command.add_argument("--months-ahead", type=int, default=3)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        if args.command == "archive":
+            cutoff = retention_cutoff(args.days)
+            if args.parquet:
+                moved = await export_records_to_parquet(db, cutoff, args.parquet)
+            else:
+                moved = await archive_records(db, cutoff)
+            print(f"archived readings older than {cutoff:%Y-%m-%d} ({moved} moved row by row)")
+        elif args.command == "compact":
+            cutoff = retention_cutoff(args.days)
+            compacted = await compact_records(db, cutoff)
+            print(f"compacted {compacted} readings older than {cutoff:%Y-%m-%d} into series blocks")
+        elif not supports_partitioning(db):
+            print(f"partitioning is only supported on MySQL, not {db.bind.dialect.name}")
+        elif args.command == "partition":
+            await partition_records_table(db, args.months_ahead)
+            print("records partitioned by month")
+        else:
+            added = await extend_partitions(db, args.months_ahead)
+            print(f"added partitions: {', '.join(added) or 'none'}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import os
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func, select, delete, case, insert, literal
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.record import Record as RecordModel
+from app.db.models.record_archive import RecordArchive
+from app.db.models.rollup import HourlyRecordRollup, DailyRecordRollup, NO_DEVICE
+from app.db.types import BinaryUUID
+from app.db.models.series_block import SeriesBlock
+from app.services.aggregation import bucket_expression, bucket_start
+from app.services.series_blocks import block_filters, load_blocks
+
+# Consensus target range for time-in-range, in mg/dL
+TARGET_RANGE_LOW = 70
+TARGET_RANGE_HIGH = 180
+
+ROLLUPS_ENABLED = os.getenv("RECORD_ROLLUPS_ENABLED", "true").lower() == "true"
+
+# Rollup table for each bucket width it can serve, with the width in seconds
+ROLLUP_TABLES = {
+    "1h": (HourlyRecordRollup, 60 * 60),
+    "1d": (DailyRecordRollup, 24 * 60 * 60),
+}
+
+STAT_COLUMNS = ("count", "level_sum", "level_sum_squares", "level_min", "level_max", "below_range", "in_range", "above_range")
+
+def truncate(timestamp: datetime, seconds: int) -> datetime:
+    if seconds == 24 * 60 * 60:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def summarize_readings(readings: Iterable[dict], seconds: int) -> list[dict]:
+    """Folds readings (user_id, device_id, timestamp, level) into one row per bucket"""
+    buckets = {}
+    for reading in readings:
+        key = (reading["user_id"], reading["device_id"] or NO_DEVICE, truncate(reading["timestamp"], seconds))
+        level = reading["level"]
+        row = buckets.get(key)
+        if row is None:
+            row = buckets[key] = {
+                "user_id": key[0], "device_id": key[1], "bucket_start": key[2],
+                "count": 0, "level_sum": 0, "level_sum_squares": 0,
+                "level_min": level, "level_max": level,
+                "below_range": 0, "in_range": 0, "above_range": 0,
+            }
+        row["count"] += 1
+        row["level_sum"] += level
+        row["level_sum_squares"] += level * level
+        row["level_min"] = min(row["level_min"], level)
+        row["level_max"] = max(row["level_max"], level)
+        if level < TARGET_RANGE_LOW:
+            row["below_range"] += 1
+        elif level > TARGET_RANGE_HIGH:
+            row["above_range"] += 1
+        else:
+            row["in_range"] += 1
+    return list(buckets.values())
+
+def summarize_series(user_id: str, device_id: str, timestamps: np.ndarray, levels: np.ndarray, seconds: int) -> list[dict]:
+    """summarize_readings for (epoch seconds, level) arrays such as a decoded series block"""
+    if not len(levels):
+        return []
+    order = np.argsort(timestamps // seconds, kind="stable")
+    buckets = (timestamps // seconds)[order]
+    levels = levels[order]
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    columns = {
+        "count": np.diff(np.r_[starts, len(levels)]),
+        "level_sum": np.add.reduceat(levels, starts),
+        "level_sum_squares": np.add.reduceat(levels * levels, starts),
+        "level_min": np.minimum.reduceat(levels, starts),
+        "level_max": np.maximum.reduceat(levels, starts),
+        "below_range": np.add.reduceat((levels < TARGET_RANGE_LOW).astype(np.int64), starts),
+        "in_range": np.add.reduceat(((levels >= TARGET_RANGE_LOW) & (levels <= TARGET_RANGE_HIGH)).astype(np.int64), starts),
+        "above_range": np.add.reduceat((levels > TARGET_RANGE_HIGH).astype(np.int64), starts),
+    }
+    return [
+        {
+            "user_id": user_id,
+            "device_id": device_id,
+            "bucket_start": bucket_start(buckets[start], seconds),
+            **{column: int(values[i]) for column, values in columns.items()},
+        }
+        for i, start in enumerate(starts)
+    ]
+
+def upsert_statement(dialect_name: str, table):
+    """INSERT that adds to the counters of an existing bucket instead of failing"""
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table)
+        values = stmt.inserted
+        least, greatest = func.least, func.greatest
+    elif dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect_name == "sqlite" else postgresql).insert(table)
+        values = stmt.excluded
+        # SQLite's scalar min()/max() accept several arguments
+        least, greatest = (func.min, func.max) if dialect_name == "sqlite" else (func.least, func.greatest)
+    else:
+        raise ValueError(f"Unsupported database backend: {dialect_name}")
+
+    updates = {
+        "count": table.count + values["count"],
+        "level_sum": table.level_sum + values["level_sum"],
+        "level_sum_squares": table.level_sum_squares + values["level_sum_squares"],
+        "level_min": least(table.level_min, values["level_min"]),
+        "level_max": greatest(table.level_max, values["level_max"]),
+        "below_range": table.below_range + values["below_range"],
+        "in_range": table.in_range + values["in_range"],
+        "above_range": table.above_range + values["above_range"],
+    }
+    if dialect_name == "mysql":
+        return stmt.on_duplicate_key_update(**updates)
+    return stmt.on_conflict_do_update(index_elements=["user_id", "device_id", "bucket_start"], set_=updates)
+
+async def apply_readings(db: AsyncSession, readings: list[dict]):
+    """
+    Adds newly inserted readings to the hourly and daily rollups.
+    Runs in the caller's transaction so rollups commit together with the records.
+    """
+    if not ROLLUPS_ENABLED or not readings:
+        return
+    dialect_name = db.bind.dialect.name
+    for table, seconds in ROLLUP_TABLES.values():
+        await db.execute(upsert_statement(dialect_name, table), summarize_readings(readings, seconds))
+
+def reading_from_record(record: RecordModel) -> dict:
+    return {
+        "user_id": record.user_id,
+        "device_id": record.device_id,
+        "timestamp": record.timestamp,
+        "level": record.level,
+    }
+
+async def summarize_table(db: AsyncSession, model, seconds: int, user_id: str | None, device_id: str | None, start: datetime | None, end: datetime | None) -> list[dict]:
+    """One rollup row per bucket of the readings in `records` or `records_archive`"""
+    dialect_name = db.bind.dialect.name
+    model_device_id = func.coalesce(model.device_id, literal(NO_DEVICE, BinaryUUID))
+    filters = []
+    if user_id is not None:
+        filters.append(model.user_id == user_id)
+    if device_id is not None:
+        filters.append(model_device_id == device_id)
+    if start is not None:
+        filters.append(model.timestamp >= start)
+    if end is not None:
+        filters.append(model.timestamp < end)
+
+    bucket_index = bucket_expression(dialect_name, model.timestamp, seconds).label("bucket")
+    level = model.level
+    rows = (await db.execute(
+        select(
+            model.user_id,
+            model_device_id,
+            bucket_index,
+            func.count(level),
+            func.sum(level),
+            func.sum(level * level),
+            func.min(level),
+            func.max(level),
+            func.sum(case((level < TARGET_RANGE_LOW, 1), else_=0)),
+            func.sum(case((level.between(TARGET_RANGE_LOW, TARGET_RANGE_HIGH), 1), else_=0)),
+            func.sum(case((level > TARGET_RANGE_HIGH, 1), else_=0)),
+        )
+        .where(*filters)
+        .group_by(model.user_id, model_device_id, bucket_index)
+    )).all()
+    return [
+        {
+            "user_id": row[0],
+            "device_id": row[1],
+            "bucket_start": bucket_start(row[2], seconds),
+            **{column: int(value) for column, value in zip(STAT_COLUMNS, row[3:])},
+        }
+        for row in rows
+    ]
+
+async def rebuild_rollups(
+    db: AsyncSession,
+    user_id: str | None = None,
+    device_id: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
+    """
+    Regenerates rollups from raw records, archived records and series blocks,
+    optionally limited to one user, one device (NO_DEVICE for readings without
+    a device) and a time range. Readings exported to Parquet are gone from the
+    database, so a rebuild drops their statistics.
+    The range is widened to whole days so hourly and daily buckets stay consistent.
+    Pending changes must be flushed before calling this.
+    """
+    if not ROLLUPS_ENABLED:
+        return
+    dialect_name = db.bind.dialect.name
+    if start is not None:
+        start = truncate(start, 24 * 60 * 60)
+    if end is not None:
+        end = truncate(end, 24 * 60 * 60) + timedelta(days=1)
+
+    # Blocks cover whole days, and the range is whole days, so they are either fully in or out
+    blocks = await load_blocks(db, block_filters(user_id, start, end, device_id))
+
+    for table, seconds in ROLLUP_TABLES.values():
+        stale = delete(table)
+        if user_id is not None:
+            stale = stale.where(table.user_id == user_id)
+        if device_id is not None:
+            stale = stale.where(table.device_id == device_id)
+        if start is not None:
+            stale = stale.where(table.bucket_start >= start)
+        if end is not None:
+            stale = stale.where(table.bucket_start < end)
+        await db.execute(stale)
+
+        rows = await summarize_table(db, RecordModel, seconds, user_id, device_id, start, end)
+        if rows:
+            await db.execute(insert(table), rows)
+
+        # Archived and compacted readings are added on top of buckets that also have raw rows
+        summaries = await summarize_table(db, RecordArchive, seconds, user_id, device_id, start, end)
+        summaries.extend(
+            summary
+            for block_user_id, block_device_id, timestamps, levels in blocks
+            for summary in summarize_series(block_user_id, block_device_id, timestamps, levels, seconds)
+        )
+        if summaries:
+            await db.execute(upsert_statement(dialect_name, table), summaries)
+
+async def detach_device_rollups(db: AsyncSession, user_id: str, device_id: str, chunk_size: int = 5000) -> int:
+    """
+    Merges a deleted device's buckets into the user's NO_DEVICE buckets, as its
+    raw records are kept with no device. Unlike a rebuild this keeps the statistics
+    of archived readings. One transaction per chunk of buckets.
+    """
+    dialect_name = db.bind.dialect.name
+    moved = 0
+    for table, _ in ROLLUP_TABLES.values():
+        filters = [table.user_id == user_id, table.device_id == device_id]
+        while True:
+            rows = (await db.execute(
+                select(table.bucket_start, *(getattr(table, column) for column in STAT_COLUMNS))
+                .where(*filters)
+                .order_by(table.bucket_start)
+                .limit(chunk_size)
+            )).all()
+            if not rows:
+                break
+            await db.execute(upsert_statement(dialect_name, table), [
+                {"user_id": user_id, "device_id": NO_DEVICE, "bucket_start": row[0], **dict(zip(STAT_COLUMNS, row[1:]))}
+                for row in rows
+            ])
+            await db.execute(delete(table).where(*filters, table.bucket_start <= rows[-1][0]))
+            await db.commit()
+            moved += len(rows)
+    return moved
+
+async def correct_after_delete(db: AsyncSession, record: RecordModel):
+    """Recomputes the buckets a deleted record contributed to"""
+    await db.flush()
+    await rebuild_rollups(
+        db,
+        user_id=record.user_id,
+        device_id=record.device_id or NO_DEVICE,
+        start=record.timestamp,
+        end=record.timestamp,
+    )
+
+async def aggregate_rollups(
+    db: AsyncSession,
+    user_id: str,
+    start: datetime,
+    end: datetime,
+    bucket: str,
+    device_id: str | None = None,
+) -> list[dict]:
+    """Serves bucket statistics from the rollup tables in O(buckets)"""
+    table, _ = ROLLUP_TABLES[bucket]
+    query = select(
+        table.bucket_start,
+        func.sum(table.count),
+        func.min(table.level_min),
+        func.max(table.level_max),
+        func.sum(table.level_sum),
+    ).where(
+        table.user_id == user_id,
+        table.bucket_start >= start,
+        table.bucket_start < end,
+    )
+    if device_id:
+        query = query.where(table.device_id == device_id)
+    rows = (await db.execute(query.group_by(table.bucket_start).order_by(table.bucket_start))).all()
+    return [
+        {
+            "bucket_start": bucket_start_value,
+            "count": int(count),
+            "min": minimum,
+            "max": maximum,
+            "mean": int(level_sum) / int(count),
+        }
+        for bucket_start_value, count, minimum, maximum, level_sum in rows
+    ]
+
+def can_serve_from_rollups(bucket: str, start: datetime, end: datetime) -> bool:
+    """Rollups hold whole buckets, so the range must start and end on bucket boundaries"""
+    if not ROLLUPS_ENABLED or bucket not in ROLLUP_TABLES:
+        return False
+    _, seconds = ROLLUP_TABLES[bucket]
+    return truncate(start, seconds) == start and truncate(end, seconds) == end
+
+async def main():
+    # Importing the app registers every model and creates missing tables
+    import app.main  # noqa: F401
+    from app.db.database import AsyncSessionLocal, async_engine
+
+    parser = argparse.ArgumentParser(description="Maintain glucose rollup tables")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="Regenerate rollups from raw, archived and compacted records")
+    rebuild.add_argument("--user-id", help="Only rebuild rollups for this user")
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        if args.user_id:
+            user_ids = [args.user_id]
+        else:
+            # Users with rollups but no records left still need their rollups cleared
+            user_ids = set(await db.scalars(select(RecordModel.user_id).distinct()))
+            user_ids.update(await db.scalars(select(RecordArchive.user_id).distinct()))
+            user_ids.update(await db.scalars(select(SeriesBlock.user_id).distinct()))
+            for table, _ in ROLLUP_TABLES.values():
+                user_ids.update(await db.scalars(select(table.user_id).distinct()))
+        # One transaction per user keeps memory and lock time bounded
+        for user_id in user_ids:
+            await rebuild_rollups(db, user_id=user_id)
+            await db.commit()
+            print(f"rebuilt rollups for user {user_id}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
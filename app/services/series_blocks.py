@@ -0,0 +1,202 @@
+import calendar
+import os
+import uuid
+import zlib
+from collections import namedtuple
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.rollup import NO_DEVICE
+from app.db.models.series_block import SeriesBlock
+
+# Whole days older than this are compacted by `python -m app.services.retention compact`
+SERIES_COMPACT_AFTER_DAYS = int(os.getenv("SERIES_COMPACT_AFTER_DAYS", "90"))
+
+# Largest level a block can hold; other readings stay in `records`
+MAX_BLOCK_LEVEL = np.iinfo(np.uint16).max
+# Days of blocks decoded per query when listing or exporting compacted readings
+BLOCK_READ_CHUNK_DAYS = 7
+
+# Namespace of the ids derived for compacted readings
+READING_ID_NAMESPACE = uuid.UUID("5c1e3a0e-9b7d-4f52-8a4e-2f0c6d1b7a93")
+
+# A compacted reading in the field order of app.schemas.record.Record, so it can
+# be merged with rows selected through schema_columns
+BlockReading = namedtuple("BlockReading", ("level", "id", "user_id", "device_id", "description", "timestamp"))
+
+def day_epoch(day: datetime) -> int:
+    return calendar.timegm(day.timetuple())
+
+def epoch_ceiling(moment: datetime) -> int:
+    """First whole epoch second at or after `moment`"""
+    return day_epoch(moment) + (1 if moment.microsecond else 0)
+
+def empty_series() -> tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+def concatenate_series(parts: list[tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+    if not parts:
+        return empty_series()
+    return np.concatenate([timestamps for timestamps, _ in parts]), np.concatenate([levels for _, levels in parts])
+
+def encode_block(day: datetime, timestamps: np.ndarray, levels: np.ndarray) -> tuple[bytes, bytes]:
+    """
+    Packs epoch-second timestamps within `day` and their levels.
+    Timestamps become deltas from the previous reading, which are nearly
+    constant for a CGM and compress to a few bytes per day.
+    """
+    order = np.argsort(timestamps, kind="stable")
+    deltas = np.diff(timestamps[order], prepend=day_epoch(day)).astype("<u4")
+    return zlib.compress(deltas.tobytes()), levels[order].astype("<u2").tobytes()
+
+def decode_block(block) -> tuple[np.ndarray, np.ndarray]:
+    """Returns (epoch seconds, level) int64 arrays for a SeriesBlock or a row with its columns"""
+    deltas = np.frombuffer(zlib.decompress(block.timestamps), dtype="<u4")
+    timestamps = np.cumsum(deltas, dtype=np.int64) + day_epoch(block.day)
+    return timestamps, np.frombuffer(block.levels, dtype="<u2").astype(np.int64)
+
+def block_filters(
+    user_id: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    device_id: str | None = None,
+) -> list:
+    """Blocks overlapping [start, end); device_id is NO_DEVICE for readings without a device"""
+    filters = []
+    if user_id is not None:
+        filters.append(SeriesBlock.user_id == user_id)
+    if start is not None:
+        filters.append(SeriesBlock.day > start - timedelta(days=1))
+    if end is not None:
+        filters.append(SeriesBlock.day < end)
+    if device_id:
+        filters.append(SeriesBlock.device_id == device_id)
+    return filters
+
+async def load_blocks(db: AsyncSession, filters: list) -> list[tuple[str, str, np.ndarray, np.ndarray]]:
+    """Decoded (user_id, device_id, timestamps, levels) for every block matching `filters`"""
+    rows = (await db.execute(
+        select(SeriesBlock.user_id, SeriesBlock.device_id, SeriesBlock.day, SeriesBlock.timestamps, SeriesBlock.levels).where(*filters)
+    )).all()
+    return [(row.user_id, row.device_id, *decode_block(row)) for row in rows]
+
+async def fetch_block_series(
+    db: AsyncSession,
+    user_id: str,
+    start: datetime,
+    end: datetime,
+    device_id: str | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Compacted (epoch seconds, level) arrays in [start, end), the block counterpart of fetch_series"""
+    blocks = await load_blocks(db, block_filters(user_id, start, end, device_id))
+    timestamps, levels = concatenate_series([(timestamps, levels) for _, _, timestamps, levels in blocks])
+    in_window = (timestamps >= day_epoch(start)) & (timestamps < day_epoch(end))
+    return timestamps[in_window], levels[in_window]
+
+def reading_id(user_id: str, device_id: str, epoch: int, occurrence: int) -> str:
+    """
+    Stable id for a compacted reading, derived from its owner, device and second
+    (and its position among readings of the same second). It only identifies the
+    reading in listings and exports; GET /records/{record_id} does not resolve it.
+    """
+    return str(uuid.uuid5(READING_ID_NAMESPACE, f"{user_id}/{device_id}/{epoch}/{occurrence}"))
+
+def block_readings(user_id: str, device_id: str, timestamps: np.ndarray, levels: np.ndarray) -> list[BlockReading]:
+    """Readings of a decoded block as rows, in timestamp order"""
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, levels = timestamps[order], levels[order]
+    record_device_id = None if device_id == NO_DEVICE else device_id
+    readings = []
+    previous, occurrence = None, 0
+    for epoch, timestamp, level in zip(timestamps.tolist(), timestamps.astype("datetime64[s]").tolist(), levels.tolist()):
+        occurrence = occurrence + 1 if epoch == previous else 0
+        previous = epoch
+        readings.append(BlockReading(level, reading_id(user_id, device_id, epoch, occurrence), user_id, record_device_id, None, timestamp))
+    return readings
+
+async def iter_block_readings(
+    db: AsyncSession,
+    user_id: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    device_id: str | None = None,
+    newest_first: bool = False,
+    chunk_days: int = BLOCK_READ_CHUNK_DAYS,
+) -> AsyncIterator[list[BlockReading]]:
+    """
+    Compacted readings in [start, end) as batches ordered by (timestamp, id),
+    oldest first unless `newest_first`. Blocks are decoded `chunk_days` days
+    at a time, so callers that need a page only read the days they show.
+    """
+    filters = block_filters(user_id, start, end, device_id)
+    bound = None
+    while True:
+        if newest_first:
+            edge = await db.scalar(select(func.max(SeriesBlock.day)).where(*filters, *([SeriesBlock.day < bound] if bound else [])))
+            if edge is None:
+                return
+            bound = edge - timedelta(days=chunk_days - 1)
+            window = [SeriesBlock.day >= bound, SeriesBlock.day <= edge]
+        else:
+            edge = await db.scalar(select(func.min(SeriesBlock.day)).where(*filters, *([SeriesBlock.day > bound] if bound else [])))
+            if edge is None:
+                return
+            bound = edge + timedelta(days=chunk_days - 1)
+            window = [SeriesBlock.day >= edge, SeriesBlock.day <= bound]
+
+        readings = []
+        for block_user_id, block_device_id, timestamps, levels in await load_blocks(db, [*filters, *window]):
+            in_range = np.ones(len(timestamps), dtype=bool)
+            if start is not None:
+                in_range &= timestamps >= epoch_ceiling(start)
+            if end is not None:
+                in_range &= timestamps < epoch_ceiling(end)
+            readings += block_readings(block_user_id, block_device_id, timestamps[in_range], levels[in_range])
+        if readings:
+            readings.sort(key=lambda reading: (reading.timestamp, reading.id), reverse=newest_first)
+            yield readings
+
+def write_block(db: AsyncSession, user_id: str, device_id: str, day: datetime, timestamps: np.ndarray, levels: np.ndarray, existing: SeriesBlock | None = None):
+    """Adds or replaces the block for one day; committed with the caller's transaction"""
+    packed_timestamps, packed_levels = encode_block(day, timestamps, levels)
+    if existing is None:
+        existing = SeriesBlock(user_id=user_id, device_id=device_id, day=day)
+        db.add(existing)
+    existing.count = len(levels)
+    existing.timestamps = packed_timestamps
+    existing.levels = packed_levels
+
+async def append_to_block(db: AsyncSession, user_id: str, device_id: str, day: datetime, timestamps: np.ndarray, levels: np.ndarray):
+    """Merges readings of one day into that day's block, creating it if needed"""
+    existing = await db.get(SeriesBlock, (user_id, device_id, day))
+    if existing is not None:
+        previous_timestamps, previous_levels = decode_block(existing)
+        timestamps, levels = concatenate_series([(previous_timestamps, previous_levels), (timestamps, levels)])
+    write_block(db, user_id, device_id, day, timestamps, levels, existing)
+
+async def detach_device_blocks(db: AsyncSession, user_id: str, device_id: str, chunk_days: int = 100) -> int:
+    """
+    Merges a deleted device's blocks into the user's NO_DEVICE blocks, as its
+    raw records are kept with no device. One transaction per chunk of days.
+    """
+    moved = 0
+    while True:
+        blocks = (await db.scalars(
+            select(SeriesBlock)
+            .where(SeriesBlock.user_id == user_id, SeriesBlock.device_id == device_id)
+            .order_by(SeriesBlock.day)
+            .limit(chunk_days)
+        )).all()
+        if not blocks:
+            return moved
+        for block in blocks:
+            await append_to_block(db, user_id, NO_DEVICE, block.day, *decode_block(block))
+        await db.execute(delete(SeriesBlock).where(
+            SeriesBlock.user_id == user_id,
+            SeriesBlock.device_id == device_id,
+            SeriesBlock.day <= blocks[-1].day,
+        ))
+        await db.commit()
+        moved += len(blocks)
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import time
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from app.core.http_cache import RECORDS, bump_version
+from app.db.database import AsyncSessionLocal
+from app.db.models.alert import Alert as AlertModel
+from app.db.models.record import Record as RecordModel
+from app.services.alert_rules import alert_engine
+from app.services.alert_stream import alert_broker, alert_event
+from app.services.rollups import apply_readings
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+# "flush": respond once the row is committed; "enqueue": respond as soon as it is queued
+WRITE_BEHIND_DURABILITY = os.getenv("WRITE_BEHIND_DURABILITY", "flush").lower()
+DURABILITY_MODES = ("flush", "enqueue")
+
+class WriteBehindQueueFull(Exception):
+    pass
+
+class WriteBehindRowRejected(Exception):
+    """The database refused the row itself, e.g. a foreign key to a device deleted after the ownership check"""
+
+class WriteBehindBuffer:
+    """
+    Group commit for single-row writes.
+    Rows are queued in memory and a background task inserts them with one
+    multi-row INSERT every flush_ms or batch_size rows, whichever comes first.
+    """
+
+    def __init__(self, name: str, model, max_queue: int, batch_size: int, flush_ms: int, before_commit=None, after_commit=None):
+        if WRITE_BEHIND_DURABILITY not in DURABILITY_MODES:
+            raise ValueError(f"WRITE_BEHIND_DURABILITY must be one of: {', '.join(DURABILITY_MODES)}")
+        self.name = name
+        self.model = model
+        self.enabled = WRITE_BEHIND_ENABLED
+        self.durability = WRITE_BEHIND_DURABILITY
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        # before_commit(db, rows) runs in the flush transaction, after_commit(rows, contexts) once it committed
+        self.before_commit = before_commit
+        self.after_commit = after_commit
+        self.queue: asyncio.Queue | None = None
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.rejected = 0
+        self.last_flush_size = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self._task = None
+        self._inflight = None
+        # Rows taken off the queue for the batch being collected, so stop() can still write them
+        self._collecting = []
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.queue is not None
+
+    async def submit(self, row: dict, context=None):
+        """
+        Queues a row for the next flush.
+        With "flush" durability this waits until the row is committed and re-raises flush errors;
+        with "enqueue" it returns immediately and failures are only logged and counted.
+        """
+        done = asyncio.get_running_loop().create_future() if self.durability == "flush" else None
+        try:
+            self.queue.put_nowait((row, context, done))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise WriteBehindQueueFull(f"The {self.name} write queue is full")
+        if done is not None:
+            await done
+
+    async def commit_rows(self, rows: list):
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(self.model), rows)
+            if self.before_commit is not None:
+                await self.before_commit(db, rows)
+            await db.commit()
+
+    def fail(self, items: list, error: Exception):
+        self.failed_rows += len(items)
+        for _, _, done in items:
+            if done is not None and not done.done():
+                done.set_exception(error)
+
+    async def commit_or_split(self, items: list) -> list:
+        """
+        Commits the rows of `items` in one transaction and returns the items written.
+        A batch the database rejects because of its data is split in halves and
+        retried, so only the offending rows fail and the rest of the batch is kept.
+        """
+        try:
+            await self.commit_rows([row for row, _, _ in items])
+        except (IntegrityError, DataError) as e:
+            if len(items) > 1:
+                middle = len(items) // 2
+                return await self.commit_or_split(items[:middle]) + await self.commit_or_split(items[middle:])
+            logger.warning("Write-behind %s row rejected: %s", self.name, e.orig)
+            self.fail(items, WriteBehindRowRejected(str(e.orig)))
+            return []
+        except Exception as e:
+            # Not caused by the rows (e.g. the database is unreachable); retrying row by row would not help
+            logger.exception("Write-behind flush of %d %s failed", len(items), self.name)
+            self.fail(items, e)
+            return []
+
+        for _, _, done in items:
+            if done is not None and not done.done():
+                done.set_result(None)
+        return items
+
+    async def flush(self, items: list):
+        start = time.perf_counter()
+        written = await self.commit_or_split(items)
+        if not written:
+            return
+
+        elapsed = time.perf_counter() - start
+        self.flushes += 1
+        self.flushed_rows += len(written)
+        self.last_flush_size = len(written)
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+        if self.after_commit is not None:
+            try:
+                self.after_commit([row for row, _, _ in written], [context for _, context, _ in written])
+            except Exception:
+                logger.exception("Write-behind post-commit hook for %s failed", self.name)
+
+    async def run(self):
+        while True:
+            batch = self._collecting = [await self.queue.get()]
+            deadline = time.monotonic() + self.flush_ms / 1000
+            while len(batch) < self.batch_size:
+                if self.queue.empty():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+            self._collecting = []
+            # Shielded so stop() never cancels a batch halfway through its transaction
+            self._inflight = asyncio.ensure_future(self.flush(batch))
+            await asyncio.shield(self._inflight)
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        # Write what was accepted before shutdown
+        pending, self._collecting = self._collecting, []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for i in range(0, len(pending), self.batch_size):
+            await self.flush(pending[i:i + self.batch_size])
+        self.queue = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "durability": self.durability,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "rejected": self.rejected,
+            "last_flush_size": self.last_flush_size,
+            "mean_flush_size": self.flushed_rows / self.flushes if self.flushes else 0.0,
+            "mean_flush_ms": self.flush_seconds_total / self.flushes * 1000 if self.flushes else 0.0,
+            "max_flush_ms": self.flush_seconds_max * 1000,
+        }
+
+async def submit_or_503(writer: WriteBehindBuffer, row: dict, context=None):
+    try:
+        await writer.submit(row, context)
+    except WriteBehindQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pending writes, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    except WriteBehindRowRejected:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The write conflicts with the current data, e.g. its device was deleted"
+        )
+    except Exception:
+        # The flush failed for reasons unrelated to this row
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The write could not be committed, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+def _records_committed(rows: list[dict], contexts: list):
+    for user_id in {row["user_id"] for row in rows}:
+        bump_version(user_id, RECORDS)
+    alert_engine.submit(rows)
+
+def _alerts_committed(rows: list[dict], contexts: list):
+    # The context of each alert is the id of the device owner
+    for user_id, row in zip(contexts, rows):
+        alert_broker.publish(user_id, alert_event(row))
+
+def _buffer_options() -> dict:
+    return {
+        "max_queue": int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000")),
+        "batch_size": int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500")),
+        "flush_ms": int(os.getenv("WRITE_BEHIND_FLUSH_MS", "20")),
+    }
+
+record_writer = WriteBehindBuffer("records", RecordModel, before_commit=apply_readings, after_commit=_records_committed, **_buffer_options())
+alert_writer = WriteBehindBuffer("alerts", AlertModel, after_commit=_alerts_committed, **_buffer_options())
+write_behind_buffers = (record_writer, alert_writer)
@@ -0,0 +1,94 @@
+"""
+Measures the alert endpoints for a user who owns many devices: latency
+and SQL statements per request, next to the previous "load every device,
+then filter with IN (...)" access pattern.
+
+Usage: python -m benchmarks.bench_alert_ownership [devices] [alerts_per_device]
+"""
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, select
+
+from benchmarks.common import make_client, sign_up_and_sign_in
+from app.db.database import SessionLocal, async_engine, engine
+from app.db.types import new_id
+from app.db.models.alert import Alert as AlertModel, AlertLevel
+from app.db.models.device import Device as DeviceModel, Status
+
+REPEATS = 50
+
+def seed(user_id: str, devices: int, alerts_per_device: int) -> tuple[list, list]:
+    device_ids = [new_id() for _ in range(devices)]
+    alert_ids = []
+    start = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        db.execute(insert(DeviceModel), [
+            {"id": device_id, "status": Status.ACTIVE, "timestamp": start, "user_id": user_id}
+            for device_id in device_ids
+        ])
+        rows = []
+        for device_id in device_ids:
+            for i in range(alerts_per_device):
+                alert_id = new_id()
+                alert_ids.append(alert_id)
+                rows.append({
+                    "id": alert_id, "message": "bench", "level": AlertLevel.HIGH,
+                    "timestamp": start + timedelta(minutes=i), "device_id": device_id,
+                })
+        db.execute(insert(AlertModel), rows)
+        db.commit()
+    return device_ids, alert_ids
+
+def legacy_get_alerts(user_id: str):
+    with SessionLocal() as db:
+        device_ids = [device.id for device in db.scalars(select(DeviceModel).where(DeviceModel.user_id == user_id))]
+        db.scalars(
+            select(AlertModel)
+            .where(AlertModel.device_id.in_(device_ids))
+            .order_by(AlertModel.timestamp.desc(), AlertModel.id.desc())
+            .limit(100)
+        ).all()
+
+def measure(fn) -> tuple[float, float]:
+    statements = []
+    samples = []
+
+    def count(*args):
+        statements[-1] += 1
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", count)
+    try:
+        for _ in range(REPEATS):
+            statements.append(0)
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", count)
+    return statistics.median(samples) * 1000, statistics.median(statements)
+
+def main(devices: int = 500, alerts_per_device: int = 20):
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+        _, alert_ids = seed(user_id, devices, alerts_per_device)
+
+        cases = {
+            "GET /alerts": lambda: client.get("/api/v1/alerts", headers=headers).raise_for_status(),
+            "GET /alerts/{id}": lambda: client.get(f"/api/v1/alerts/{alert_ids[0]}", headers=headers).raise_for_status(),
+            "legacy list queries": lambda: legacy_get_alerts(user_id),
+        }
+        print(f"devices: {devices}, alerts: {devices * alerts_per_device}")
+        for name, fn in cases.items():
+            latency, statements = measure(fn)
+            print(f"{name:>22}: {latency:8.2f} ms  {statements:.0f} statements")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
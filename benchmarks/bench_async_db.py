@@ -0,0 +1,67 @@
+"""
+Compares query throughput of the synchronous engine (queries block the
+event loop) against the async engine (queries are awaited) when many
+requests are in flight on a single worker.
+SQLite has no network round trip, so the async driver only pays off when
+DATABASE_URL points at a real MySQL server.
+
+Usage: python -m benchmarks.bench_async_db [concurrency] [queries_per_task]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from benchmarks.common import make_client, sign_up_and_sign_in
+from app.db.database import SessionLocal, AsyncSessionLocal, engine, async_engine
+from app.db.types import new_id
+from app.db.models.record import Record as RecordModel
+
+def seed(user_id: str, count: int = 5000):
+    start = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        db.execute(insert(RecordModel), [
+            {"id": new_id(), "level": 100, "timestamp": start + timedelta(minutes=5 * i), "user_id": user_id}
+            for i in range(count)
+        ])
+        db.commit()
+
+def page_query(user_id: str):
+    return select(RecordModel)\
+        .where(RecordModel.user_id == user_id)\
+        .order_by(RecordModel.timestamp.desc(), RecordModel.id.desc())\
+        .limit(100)
+
+async def sync_task(user_id: str, queries: int):
+    for _ in range(queries):
+        with SessionLocal() as db:
+            db.scalars(page_query(user_id)).all()
+        await asyncio.sleep(0)
+
+async def async_task(user_id: str, queries: int):
+    for _ in range(queries):
+        async with AsyncSessionLocal() as db:
+            (await db.scalars(page_query(user_id))).all()
+
+async def run(task, user_id: str, concurrency: int, queries: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*[task(user_id, queries) for _ in range(concurrency)])
+    return concurrency * queries / (time.perf_counter() - start)
+
+async def main(concurrency: int = 20, queries: int = 50):
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+    seed(user_id)
+
+    print(f"backend: {engine.url.drivername} / {async_engine.url.drivername}")
+    print(f"concurrency: {concurrency}, queries per task: {queries}")
+    print(f" sync engine: {await run(sync_task, user_id, concurrency, queries):8.0f} queries/s")
+    print(f"async engine: {await run(async_task, user_id, concurrency, queries):8.0f} queries/s")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    asyncio.run(main(*args))
@@ -0,0 +1,105 @@
+"""
+Insert throughput into a `records`-shaped table with CHAR(36) and BINARY(16)
+ids, each with random (v4) and time-ordered (v7) UUIDs. Throughput is
+reported per segment as the table grows, plus the size of the table and its
+indexes.
+
+Usage: python -m benchmarks.bench_binary_ids [rows]
+"""
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text, func, insert, select, text
+
+from benchmarks.common import make_client  # noqa: F401  (points DATABASE_URL at a throwaway database)
+from app.db.database import engine
+from app.db.types import BinaryUUID, uuid7
+
+BATCH = 1000
+SEGMENTS = 5
+
+VARIANTS = {
+    "char(36) + uuid4": (String(36), lambda: str(uuid.uuid4())),
+    "char(36) + uuid7": (String(36), lambda: str(uuid7())),
+    "binary(16) + uuid4": (BinaryUUID, lambda: str(uuid.uuid4())),
+    "binary(16) + uuid7": (BinaryUUID, lambda: str(uuid7())),
+}
+
+def records_table(metadata: MetaData, name: str, id_type) -> Table:
+    """Same columns and indexes as app.db.models.record.Record, without foreign keys"""
+    return Table(
+        name, metadata,
+        Column("id", id_type, primary_key=True),
+        Column("level", Integer, nullable=False),
+        Column("description", Text, nullable=True),
+        Column("timestamp", DateTime, nullable=False),
+        Column("user_id", id_type, nullable=False),
+        Column("device_id", id_type, nullable=True),
+        Index(f"ix_{name}_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        Index(f"ix_{name}_device_id_timestamp_id", "device_id", "timestamp", "id"),
+    )
+
+def table_bytes(name: str) -> int | None:
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            try:
+                return connection.scalar(text(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = :name OR name LIKE :indexes"
+                ), {"name": name, "indexes": f"%{name}%"})
+            except Exception:
+                return None  # SQLite built without dbstat
+        if engine.dialect.name == "mysql":
+            return connection.scalar(text(
+                "SELECT data_length + index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :name"
+            ), {"name": name})
+    return None
+
+def main(rows: int = 200000):
+    metadata = MetaData()
+    tables = {label: records_table(metadata, f"bench_ids_{i}", id_type) for i, (label, (id_type, _)) in enumerate(VARIANTS.items())}
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    user_ids = [str(uuid7()) for _ in range(10)]
+    device_ids = [str(uuid7()) for _ in range(20)]
+    start = datetime(2024, 1, 1)
+    segment = rows // SEGMENTS
+
+    print(f"rows: {rows}, batch: {BATCH}, database: {engine.dialect.name}")
+    print(f"{'':<22}" + "".join(f"{f'{(i + 1) * segment // 1000}k rows/s':>14}" for i in range(SEGMENTS)) + f"{'MB':>10}")
+    try:
+        for label, table in tables.items():
+            generate = VARIANTS[label][1]
+            rates = []
+            written = 0
+            for _ in range(SEGMENTS):
+                elapsed = 0.0
+                for _ in range(segment // BATCH):
+                    batch = [
+                        {
+                            "id": generate(),
+                            "level": 100,
+                            "timestamp": start + timedelta(minutes=5 * (written + i)),
+                            "user_id": user_ids[(written + i) % len(user_ids)],
+                            "device_id": device_ids[(written + i) % len(device_ids)],
+                        }
+                        for i in range(BATCH)
+                    ]
+                    began = time.perf_counter()
+                    with engine.begin() as connection:
+                        connection.execute(insert(table), batch)
+                    elapsed += time.perf_counter() - began
+                    written += BATCH
+                rates.append(segment / elapsed)
+            with engine.connect() as connection:
+                assert connection.scalar(select(func.count()).select_from(table)) == written
+            size = table_bytes(table.name)
+            print(f"{label:<22}" + "".join(f"{rate:14.0f}" for rate in rates) + (f"{size / 1e6:10.1f}" if size else f"{'n/a':>10}"))
+    finally:
+        metadata.drop_all(engine)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,52 @@
+"""
+Compares uploading a day of CGM readings one request at a time
+against a single POST /api/v1/records/bulk call.
+
+Usage: python -m benchmarks.bench_bulk_records [readings]
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_client, sign_up_and_sign_in, create_device, timer
+
+def make_readings(device_id: str, count: int) -> list:
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "level": 80 + (i * 7) % 120,
+            "timestamp": (start + timedelta(minutes=5 * i)).isoformat(),
+            "device_id": device_id,
+        }
+        for i in range(count)
+    ]
+
+def main(count: int = 288):
+    results = {}
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        device_id = create_device(client, headers)
+        readings = make_readings(device_id, count)
+
+        with timer(results, "single"):
+            for reading in readings:
+                client.post("/api/v1/records", json=reading, headers=headers).raise_for_status()
+
+        with timer(results, "bulk_json"):
+            client.post("/api/v1/records/bulk", json=readings, headers=headers).raise_for_status()
+
+        ndjson = "\n".join(json.dumps(reading) for reading in readings)
+        with timer(results, "bulk_ndjson"):
+            client.post(
+                "/api/v1/records/bulk",
+                content=ndjson,
+                headers={**headers, "Content-Type": "application/x-ndjson"}
+            ).raise_for_status()
+
+    print(f"readings: {count}")
+    for name, elapsed in results.items():
+        print(f"{name:>12}: {elapsed * 1000:9.1f} ms  ({count / elapsed:10.0f} readings/s)")
+    print(f"speedup (single -> bulk_json): {results['single'] / results['bulk_json']:.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 288)
@@ -0,0 +1,70 @@
+"""
+Times the clinical metrics engine on a year of 5-minute readings:
+the vectorized computation alone, then GET /api/v1/records/metrics end to
+end (column fetch + computation + serialization).
+
+Usage: python -m benchmarks.bench_glucose_metrics [days]
+"""
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from benchmarks.common import make_client, sign_up_and_sign_in
+from app.db.database import SessionLocal
+from app.db.types import new_id
+from app.db.models.record import Record as RecordModel
+from app.services.glucose_metrics import compute_metrics, READING_INTERVAL_SECONDS
+
+START = datetime(2023, 1, 1)
+REPEATS = 10
+
+def synthetic_levels(count: int) -> np.ndarray:
+    """Daily sine wave with noise, roughly 40-300 mg/dL"""
+    rng = np.random.default_rng(42)
+    minutes = np.arange(count) * (READING_INTERVAL_SECONDS / 60)
+    wave = 140 + 60 * np.sin(2 * np.pi * minutes / (24 * 60))
+    return np.clip(wave + rng.normal(0, 25, count), 40, 400).astype(np.int64)
+
+def median_ms(fn) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main(days: int = 365):
+    count = days * 24 * 60 * 60 // READING_INTERVAL_SECONDS
+    epoch = int((START - datetime(1970, 1, 1)).total_seconds())
+    timestamps = epoch + np.arange(count, dtype=np.int64) * READING_INTERVAL_SECONDS
+    levels = synthetic_levels(count)
+    window = days * 24 * 60 * 60
+
+    print(f"readings: {count} ({days} days)")
+    print(f"compute_metrics: {median_ms(lambda: compute_metrics(timestamps, levels, window)):8.2f} ms")
+
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+        with SessionLocal() as db:
+            db.execute(insert(RecordModel), [
+                {
+                    "id": new_id(),
+                    "level": int(level),
+                    "timestamp": START + timedelta(seconds=i * READING_INTERVAL_SECONDS),
+                    "user_id": user_id,
+                }
+                for i, level in enumerate(levels)
+            ])
+            db.commit()
+
+        params = {"start": START.isoformat(), "end": (START + timedelta(days=days)).isoformat()}
+        request = lambda: client.get("/api/v1/records/metrics", params=params, headers=headers).raise_for_status()
+        print(f"GET /records/metrics: {median_ms(request):8.2f} ms")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 365)
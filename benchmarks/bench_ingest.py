@@ -0,0 +1,57 @@
+"""
+Measures device-authenticated ingestion throughput: a chunked NDJSON
+POST /api/v1/ingest/records and the /api/v1/ingest/ws WebSocket.
+
+Usage: python -m benchmarks.bench_ingest [readings]
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_client, sign_up_and_sign_in, create_device, timer
+
+# Readings per WebSocket message
+MESSAGE_SIZE = 100
+
+def make_lines(count: int) -> list[bytes]:
+    start = datetime(2024, 1, 1)
+    return [
+        json.dumps({"level": 80 + (i * 7) % 120, "timestamp": (start + timedelta(seconds=i)).isoformat()}).encode()
+        for i in range(count)
+    ]
+
+def chunked(lines: list[bytes], size: int):
+    for i in range(0, len(lines), size):
+        yield b"\n".join(lines[i:i + size]) + b"\n"
+
+def main(count: int = 50000):
+    results = {}
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        device_id = create_device(client, headers)
+        api_key = client.post(f"/api/v1/devices/{device_id}/api-key", headers=headers).json()["api_key"]
+        lines = make_lines(count)
+
+        with timer(results, "http_stream"):
+            response = client.post(
+                "/api/v1/ingest/records",
+                content=chunked(lines, MESSAGE_SIZE),
+                headers={"X-Device-Key": api_key, "Content-Type": "application/x-ndjson"}
+            )
+            response.raise_for_status()
+            assert response.json()["accepted"] == count
+
+        with timer(results, "websocket"):
+            accepted = 0
+            with client.websocket_connect("/api/v1/ingest/ws", headers={"X-Device-Key": api_key}) as websocket:
+                for message in chunked(lines, MESSAGE_SIZE):
+                    websocket.send_bytes(message)
+                while accepted < count:
+                    accepted += websocket.receive_json()["accepted"]
+
+    print(f"readings: {count}")
+    for name, elapsed in results.items():
+        print(f"{name:>12}: {elapsed * 1000:9.1f} ms  ({count / elapsed:10.0f} readings/s)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
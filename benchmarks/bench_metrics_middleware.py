@@ -0,0 +1,61 @@
+"""
+Microbenchmark for the per-request cost of HttpMetricsMiddleware.
+
+Drives a minimal ASGI app directly, without HTTP parsing, with and without
+the middleware and reports the difference per request. The budget is 5 µs.
+
+Usage: python -m benchmarks.bench_metrics_middleware [requests]
+"""
+import asyncio
+import sys
+import time
+
+from app.core.http_metrics import HttpMetrics, HttpMetricsMiddleware, hdr_bounds
+
+BUDGET_US = 5.0
+
+class Route:
+    path = "/api/v1/records/{record_id}"
+
+ROUTE = Route()
+START = {"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]}
+BODY = {"type": "http.response.body", "body": b'{"level": 120}'}
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    await send(START)
+    await send(BODY)
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+async def measure(app, requests: int) -> float:
+    headers = [(b"host", b"bench"), (b"content-length", b"0")]
+    start = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/api/v1/records/1", "headers": headers}
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+async def run(requests: int):
+    wrapped = HttpMetricsMiddleware(endpoint, HttpMetrics(hdr_bounds()))
+    # Warm up both paths, then take the best of several rounds
+    await measure(endpoint, 10000)
+    await measure(wrapped, 10000)
+    bare = min([await measure(endpoint, requests) for _ in range(5)])
+    instrumented = min([await measure(wrapped, requests) for _ in range(5)])
+    return bare, instrumented
+
+def main(requests: int = 100000):
+    bare, instrumented = asyncio.run(run(requests))
+    overhead = instrumented - bare
+    print(f"bare app:        {bare:6.2f} µs/request")
+    print(f"with middleware: {instrumented:6.2f} µs/request")
+    print(f"overhead:        {overhead:6.2f} µs/request (budget {BUDGET_US} µs)")
+    return 0 if overhead <= BUDGET_US else 1
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
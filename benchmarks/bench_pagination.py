@@ -0,0 +1,73 @@
+"""
+Compares page latency of offset pagination against cursor pagination
+for GET /api/v1/records, at the first page and at a deep page.
+
+Usage: python -m benchmarks.bench_pagination [page_size] [deep_page]
+"""
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.common import make_client, sign_up_and_sign_in
+from app.core.pagination import encode_cursor
+from app.db.database import SessionLocal
+from app.db.types import new_id
+from app.db.models.record import Record as RecordModel
+
+REPEATS = 20
+
+def seed_records(user_id: str, count: int):
+    start = datetime(2020, 1, 1)
+    with SessionLocal() as db:
+        for offset in range(0, count, 10000):
+            db.execute(insert(RecordModel), [
+                {
+                    "id": new_id(),
+                    "level": 80 + i % 120,
+                    "timestamp": start + timedelta(minutes=5 * i),
+                    "user_id": user_id,
+                }
+                for i in range(offset, min(offset + 10000, count))
+            ])
+        db.commit()
+
+def cursor_for_offset(user_id: str, offset: int) -> str | None:
+    if offset == 0:
+        return None
+    with SessionLocal() as db:
+        row = db.query(RecordModel.timestamp, RecordModel.id)\
+                .filter(RecordModel.user_id == user_id)\
+                .order_by(RecordModel.timestamp.desc(), RecordModel.id.desc())\
+                .offset(offset - 1)\
+                .first()
+    return encode_cursor(row.timestamp, row.id)
+
+def median_ms(client, headers, params) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        client.get("/api/v1/records", params=params, headers=headers).raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main(page_size: int = 20, deep_page: int = 10000):
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+        seed_records(user_id, page_size * deep_page)
+
+        print(f"records: {page_size * deep_page}, page size: {page_size}")
+        for page in (1, deep_page):
+            offset = (page - 1) * page_size
+            offset_ms = median_ms(client, headers, {"limit": page_size, "skip": offset})
+            cursor = cursor_for_offset(user_id, offset)
+            cursor_params = {"limit": page_size, **({"cursor": cursor} if cursor else {})}
+            cursor_ms = median_ms(client, headers, cursor_params)
+            print(f"page {page:>6}: offset {offset_ms:8.2f} ms   cursor {cursor_ms:8.2f} ms")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
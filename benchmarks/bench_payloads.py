@@ -0,0 +1,54 @@
+"""
+Bytes on the wire for a page of GET /api/v1/records in every representation
+(JSON rows, columnar JSON, MessagePack) and content encoding (identity,
+gzip, brotli), with the median request latency of each combination.
+
+Usage: python -m benchmarks.bench_payloads [page_size]
+"""
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.common import make_client, sign_up_and_sign_in, create_device
+from benchmarks.seed import insert_history
+from app.core.compression import ENCODERS
+from app.core.responses import JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ACCEPTED_MEDIA_TYPES
+
+REPEATS = 20
+
+def measure(client, headers: dict, params: dict) -> tuple[int, float]:
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = client.get("/api/v1/records", params=params, headers=headers)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+    # httpx decodes the body, so the encoded size comes from Content-Length
+    size = int(response.headers.get("content-length", len(response.content)))
+    return size, statistics.median(samples) * 1000
+
+def main(page_size: int = 1000):
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+        device_id = create_device(client, headers)
+        insert_history(user_id, device_id, datetime(2024, 1, 1), page_size, np.random.default_rng(0))
+
+        media_types = [media_type for media_type in (JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE) if media_type in ACCEPTED_MEDIA_TYPES]
+        encodings = ["identity", *ENCODERS]
+        params = {"limit": page_size}
+        baseline = None
+
+        print(f"page size: {page_size}, median of {REPEATS}")
+        print(f"{'':<42}{'encoding':>10}{'bytes':>10}{'ratio':>8}{'ms':>8}")
+        for media_type in media_types:
+            for encoding in encodings:
+                size, ms = measure(client, {**headers, "Accept": media_type, "Accept-Encoding": encoding}, params)
+                baseline = baseline or size
+                print(f"{media_type:<42}{encoding:>10}{size:10d}{baseline / size:7.1f}x{ms:8.2f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
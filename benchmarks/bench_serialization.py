@@ -0,0 +1,114 @@
+"""
+CPU per row of the list endpoints' response path, from query to JSON body:
+ORM objects validated through `response_model` (the previous path) against
+plain column tuples encoded by orjson (app.core.responses). Both bodies are
+checked to be byte-identical for every page.
+
+Usage: python -m benchmarks.bench_serialization [page_size] [pages]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+from benchmarks.common import make_client, sign_up_and_sign_in, create_device
+from app.core.pagination import paginate
+from app.core.responses import schema_columns, rows_response
+from app.db.database import SessionLocal, AsyncSessionLocal
+from app.db.types import new_id
+from app.db.models.alert import Alert as AlertModel, AlertLevel
+from app.db.models.record import Record as RecordModel
+from app.schemas.alert import Alert
+from app.schemas.record import Record
+
+REPEATS = 5
+
+def seed(user_id: str, device_id: str, count: int):
+    start = datetime(2024, 1, 1)
+    levels = list(AlertLevel)
+    with SessionLocal() as db:
+        db.execute(insert(RecordModel), [
+            {
+                "id": new_id(),
+                "level": 80 + i % 120,
+                # Mix whole seconds with microseconds, and rows with and without text
+                "timestamp": start + timedelta(minutes=5 * i, microseconds=(i * 7919) % 1000000 if i % 2 else 0),
+                "description": f"après repas n°{i}" if i % 3 == 0 else None,
+                "user_id": user_id,
+                "device_id": device_id if i % 4 else None,
+            }
+            for i in range(count)
+        ])
+        db.execute(insert(AlertModel), [
+            {
+                "id": new_id(),
+                "message": f"Glucose {80 + i % 120} mg/dL",
+                "level": levels[i % len(levels)],
+                "timestamp": start + timedelta(minutes=5 * i),
+                "device_id": device_id,
+            }
+            for i in range(count)
+        ])
+        db.commit()
+
+async def orm_body(model, schema, where, page_size: int, skip: int) -> bytes:
+    """What FastAPI does with `response_model=List[schema]` and ORM objects"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.scalars(paginate(select(model).where(where), model.timestamp, model.id, skip, page_size))).all()
+        adapter = TypeAdapter(list[schema])
+        return JSONResponse(adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")).body
+
+async def tuple_body(model, schema, where, page_size: int, skip: int) -> bytes:
+    async with AsyncSessionLocal() as db:
+        query = select(*schema_columns(model, schema)).where(where)
+        rows = (await db.execute(paginate(query, model.timestamp, model.id, skip, page_size))).all()
+        return rows_response(rows, schema).body
+
+async def cpu_per_row(body, model, schema, where, page_size: int, pages: int) -> tuple[float, list[bytes]]:
+    bodies = [await body(model, schema, where, page_size, 0)]  # warm up statement caches
+    best = float("inf")
+    for _ in range(REPEATS):
+        bodies = []
+        start = time.process_time()
+        for page in range(pages):
+            bodies.append(await body(model, schema, where, page_size, page * page_size))
+        best = min(best, time.process_time() - start)
+    return best / (page_size * pages) * 1e6, bodies
+
+async def compare(user_id: str, device_id: str, page_size: int, pages: int, served: dict):
+    cases = {
+        "records": (RecordModel, Record, RecordModel.user_id == user_id),
+        "alerts": (AlertModel, Alert, AlertModel.device_id == device_id),
+    }
+    print(f"page size: {page_size}, pages: {pages}, best of {REPEATS}")
+    print(f"{'':<10}{'orm + pydantic':>16}{'tuples + orjson':>17}{'speedup':>10}")
+    for name, (model, schema, where) in cases.items():
+        before, expected = await cpu_per_row(orm_body, model, schema, where, page_size, pages)
+        after, bodies = await cpu_per_row(tuple_body, model, schema, where, page_size, pages)
+        assert bodies == expected, f"{name}: bodies differ"
+        # The endpoint serves the same bytes as the first page
+        assert served[name] == expected[0], f"{name}: endpoint body differs"
+        print(f"{name:<10}{before:13.1f} us{after:14.1f} us{before / after:9.1f}x")
+
+def main(page_size: int = 1000, pages: int = 10):
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+        device_id = create_device(client, headers)
+        seed(user_id, device_id, page_size * pages)
+
+        served = {}
+        for name in ("records", "alerts"):
+            response = client.get(f"/api/v1/{name}", params={"limit": page_size}, headers=headers)
+            response.raise_for_status()
+            served[name] = response.content
+
+    asyncio.run(compare(user_id, device_id, page_size, pages, served))
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,92 @@
+"""
+Compares a year of 5-minute readings stored as raw `records` rows and as
+compacted series blocks: payload bytes per reading, then GET
+/api/v1/records/metrics and a percentile aggregate before and after
+`compact_records`.
+
+Usage: python -m benchmarks.bench_series_blocks [days]
+"""
+import logging
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+from benchmarks.common import make_client, sign_up_and_sign_in, create_device
+from benchmarks.seed import insert_history
+from app.db.database import SessionLocal, AsyncSessionLocal
+from app.db.models.record import Record as RecordModel
+from app.db.models.series_block import SeriesBlock
+from app.services.glucose_metrics import READING_INTERVAL_SECONDS
+from app.services.retention import compact_records
+
+# Full-year scans cross the slow-query threshold on every request
+logging.getLogger("app.sql").setLevel(logging.ERROR)
+
+START = datetime(2023, 1, 1)
+REPEATS = 10
+
+def median_ms(fn) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def raw_payload_bytes() -> int:
+    """Column payload of the raw rows; DATETIME and INTEGER counted as 8 and 4 bytes"""
+    with SessionLocal() as db:
+        return db.scalar(select(func.sum(
+            func.length(RecordModel.id) + func.length(RecordModel.user_id)
+            + func.coalesce(func.length(RecordModel.device_id), 0)
+            + func.coalesce(func.length(RecordModel.description), 0) + 12
+        ))) or 0
+
+def block_payload_bytes() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.sum(
+            func.length(SeriesBlock.timestamps) + func.length(SeriesBlock.levels)
+            + func.length(SeriesBlock.user_id) + func.length(SeriesBlock.device_id) + 12
+        ))) or 0
+
+def main(days: int = 365):
+    count = days * 24 * 60 * 60 // READING_INTERVAL_SECONDS
+    end = START + timedelta(days=days)
+
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+        device_id = create_device(client, headers)
+        insert_history(user_id, device_id, START, count, np.random.default_rng(42))
+
+        # Unaligned window so the aggregate is computed from readings, not rollups
+        params = {"start": (START + timedelta(minutes=30)).isoformat(), "end": end.isoformat()}
+        metrics = lambda: client.get("/api/v1/records/metrics", params=params, headers=headers).raise_for_status()
+        aggregate = lambda: client.get(
+            "/api/v1/records/aggregate", params={**params, "bucket": "1d", "percentiles": [5, 50, 95]}, headers=headers
+        ).raise_for_status()
+
+        print(f"readings: {count} ({days} days)")
+        raw_bytes = raw_payload_bytes()
+        raw = {"metrics": median_ms(metrics), "aggregate": median_ms(aggregate)}
+
+        async def compact():
+            async with AsyncSessionLocal() as db:
+                return await compact_records(db, end)
+        start = time.perf_counter()
+        compacted = client.portal.call(compact)
+        print(f"compacted {compacted} readings in {time.perf_counter() - start:.2f} s")
+        block_bytes = block_payload_bytes()
+        blocks = {"metrics": median_ms(metrics), "aggregate": median_ms(aggregate)}
+
+        print(f"{'':<34}{'raw rows':>12}{'blocks':>12}")
+        print(f"{'payload bytes per reading':<34}{raw_bytes / count:12.1f}{block_bytes / count:12.1f}")
+        print(f"{'GET /records/metrics (ms)':<34}{raw['metrics']:12.2f}{blocks['metrics']:12.2f}")
+        print(f"{'GET /records/aggregate p5/50/95':<34}{raw['aggregate']:12.2f}{blocks['aggregate']:12.2f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 365)
@@ -0,0 +1,62 @@
+"""
+Measures GET /health latency while a burst of sign-ins is in flight.
+With bcrypt running on the hashing executor the health checks should
+stay close to their idle latency instead of queueing behind bcrypt.
+
+Usage: python -m benchmarks.bench_signin_burst [concurrent_sign_ins]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import PASSWORD
+from app.main import app
+from app.core.security import hashing_executor
+
+async def probe_health(client: httpx.AsyncClient, samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        (await client.get("/health")).raise_for_status()
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.005)
+
+def summarize(name: str, samples: list):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:>6}: n={len(samples):4d}  p50={statistics.median(samples) * 1000:7.2f} ms  p99={p99 * 1000:7.2f} ms")
+
+async def main(burst: int = 50):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        await client.post("/api/v1/users/sign-up", json={"email": email, "password": PASSWORD})
+
+        idle, loaded = [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, idle, stop))
+        await asyncio.sleep(1)
+        stop.set()
+        await probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, loaded, stop))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/v1/users/sign-in", json={"email": email, "password": PASSWORD})
+            for _ in range(burst)
+        ])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    print(f"sign-ins: {burst} in {elapsed:.2f}s ({sum(r.status_code == 200 for r in responses)} ok)")
+    summarize("idle", idle)
+    summarize("burst", loaded)
+    print(f"executor: {hashing_executor.stats()}")
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,73 @@
+"""
+Compares concurrent single-record POST /api/v1/records throughput with
+write-behind disabled, in ack-on-flush mode and in ack-on-enqueue mode.
+
+Usage: python -m benchmarks.bench_write_behind [requests] [concurrency]
+
+On SQLite, high concurrency in direct mode runs into "database is locked"
+once writers wait longer than the busy timeout; those requests are counted
+as errors rather than aborting the run.
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.common import make_client, sign_up_and_sign_in, create_device
+from app.main import app
+from app.services.write_behind import record_writer
+
+MODES = {
+    "direct": (False, "flush"),
+    "ack_on_flush": (True, "flush"),
+    "ack_on_enqueue": (True, "enqueue"),
+}
+
+async def run_mode(headers: dict, device_id: str, requests: int, concurrency: int) -> tuple[float, int]:
+    start_time = datetime(2024, 1, 1)
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def post(i: int):
+                nonlocal errors
+                reading = {
+                    "level": 80 + (i * 7) % 120,
+                    "timestamp": (start_time + timedelta(minutes=5 * i)).isoformat(),
+                    "device_id": device_id,
+                }
+                async with semaphore:
+                    response = await client.post("/api/v1/records", json=reading, headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(post(i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+    # Leaving the lifespan flushes anything still queued
+    return elapsed, errors
+
+def main(requests: int = 2000, concurrency: int = 50):
+    with make_client() as client:
+        headers = sign_up_and_sign_in(client)
+        device_id = create_device(client, headers)
+
+    print(f"requests: {requests}, concurrency: {concurrency}")
+    for name, (enabled, durability) in MODES.items():
+        record_writer.enabled = enabled
+        record_writer.durability = durability
+        elapsed, errors = asyncio.run(run_mode(headers, device_id, requests, concurrency))
+        stats = record_writer.stats()
+        print(
+            f"{name:>15}: {elapsed * 1000:9.1f} ms  ({requests / elapsed:8.0f} req/s)"
+            f"  mean flush {stats['mean_flush_size']:6.1f} rows / {stats['mean_flush_ms']:5.1f} ms"
+            f"  errors {errors}"
+        )
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,46 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Boots `app.main:app` against a throwaway SQLite database unless
+DATABASE_URL is already set (e.g. to a local MySQL instance).
+"""
+import logging
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+if not os.getenv("DATABASE_URL"):
+    _tmpdir = tempfile.mkdtemp(prefix="glucoteam-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+PASSWORD = "bench-password"
+
+# Keep per-request client logging out of the benchmark output
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def make_client() -> TestClient:
+    return TestClient(app)
+
+def sign_up_and_sign_in(client: TestClient, email: str | None = None) -> dict:
+    """Creates a fresh user and returns the Authorization headers for it"""
+    email = email or f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    client.post("/api/v1/users/sign-up", json={"email": email, "password": PASSWORD})
+    response = client.post("/api/v1/users/sign-in", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def create_device(client: TestClient, headers: dict) -> str:
+    response = client.post("/api/v1/devices", json={"timestamp": "2024-01-01T00:00:00"}, headers=headers)
+    response.raise_for_status()
+    return response.json()["id"]
+
+@contextmanager
+def timer(results: dict, name: str):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
@@ -0,0 +1,263 @@
+"""
+Reproducible load test for the whole API.
+
+Boots `app.main:app` in-process (SQLite by default; point DATABASE_URL at a
+local MySQL, e.g. `docker run -e MYSQL_ROOT_PASSWORD=pw -e MYSQL_DATABASE=glucoteam
+-p 3306:3306 mysql:8`, for realistic numbers), seeds synthetic users, devices
+and CGM history, then drives request mixes:
+
+    device_uploads   bulk and device-key ingestion uploads
+    dashboard        record listings, aggregates, CGM metrics, devices, alerts
+    alert_polling    frequent small alert listings
+    sign_in_storm    concurrent sign-ins (bcrypt bound)
+
+Results are written as JSON: throughput per scenario and, per endpoint,
+p50/p95/p99 latency and SQL statements per request (from Server-Timing).
+Request sequences are derived from --seed so runs are comparable.
+
+Usage:
+    python -m benchmarks.load_test [--days 365] [--output results.json]
+    python -m benchmarks.load_test --compare base.json head.json [--threshold 10]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.common import PASSWORD
+from benchmarks.seed import Dataset, seed_dataset
+from app.main import app
+from app.db.database import engine
+
+# Under load nearly every statement crosses the slow-query threshold; the report already has the numbers
+logging.getLogger("app.sql").setLevel(logging.ERROR)
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+UPLOAD_READINGS = 12
+
+class UploadClock:
+    """Hands out timestamps after the seeded history so uploads never overlap"""
+
+    def __init__(self, start: datetime):
+        self.next = start
+
+    def take(self, count: int) -> list[datetime]:
+        step = timedelta(minutes=5)
+        stamps = [self.next + step * i for i in range(count)]
+        self.next += step * count
+        return stamps
+
+def bulk_upload(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    device = rng.choice(user.devices)
+    readings = [
+        {"level": rng.randint(60, 260), "timestamp": stamp.isoformat(), "device_id": device.id}
+        for stamp in clock.take(UPLOAD_READINGS)
+    ]
+    return "POST /api/v1/records/bulk", "POST", "/api/v1/records/bulk", {"json": readings, "headers": user.headers}
+
+def device_upload(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    device = rng.choice(rng.choice(dataset.users).devices)
+    body = "\n".join(
+        json.dumps({"level": rng.randint(60, 260), "timestamp": stamp.isoformat()})
+        for stamp in clock.take(UPLOAD_READINGS)
+    )
+    return "POST /api/v1/ingest/records", "POST", "/api/v1/ingest/records", {
+        "content": body,
+        "headers": {"X-Device-Key": device.api_key, "Content-Type": "application/x-ndjson"},
+    }
+
+def recent_records(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    return "GET /api/v1/records", "GET", "/api/v1/records", {"params": {"limit": 288}, "headers": user.headers}
+
+def weekly_aggregate(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    end = dataset.end - timedelta(days=rng.randint(0, 30))
+    params = {"bucket": "1h", "start": (end - timedelta(days=7)).isoformat(), "end": end.isoformat()}
+    return "GET /api/v1/records/aggregate", "GET", "/api/v1/records/aggregate", {"params": params, "headers": user.headers}
+
+def cgm_metrics(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    end = dataset.end - timedelta(days=rng.randint(0, 30))
+    params = {"start": (end - timedelta(days=14)).isoformat(), "end": end.isoformat()}
+    return "GET /api/v1/records/metrics", "GET", "/api/v1/records/metrics", {"params": params, "headers": user.headers}
+
+def list_devices(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    return "GET /api/v1/devices", "GET", "/api/v1/devices", {"headers": user.headers}
+
+def poll_alerts(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    return "GET /api/v1/alerts", "GET", "/api/v1/alerts", {"params": {"limit": 20}, "headers": user.headers}
+
+def alert_settings(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    return "GET /api/v1/alerts/settings", "GET", "/api/v1/alerts/settings", {"headers": user.headers}
+
+def sign_in(dataset: Dataset, rng: random.Random, clock: UploadClock):
+    user = rng.choice(dataset.users)
+    return "POST /api/v1/users/sign-in", "POST", "/api/v1/users/sign-in", {"json": {"email": user.email, "password": PASSWORD}}
+
+# Scenario name -> (default request count, [(weight, request builder)])
+SCENARIOS = {
+    "device_uploads": (1000, [(1, bulk_upload), (1, device_upload)]),
+    "dashboard": (600, [(3, recent_records), (2, weekly_aggregate), (1, cgm_metrics), (2, list_devices), (2, poll_alerts)]),
+    "alert_polling": (2000, [(9, poll_alerts), (1, alert_settings)]),
+    "sign_in_storm": (50, [(1, sign_in)]),
+}
+
+def percentile(sorted_samples: list[float], q: float) -> float:
+    index = min(len(sorted_samples) - 1, max(0, round(q / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+def summarize_endpoint(samples: list[tuple[float, int | None, bool]]) -> dict:
+    latencies = sorted(elapsed for elapsed, _, _ in samples)
+    queries = [count for _, count, _ in samples if count is not None]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "max_queries": max(queries) if queries else None,
+    }
+
+async def run_scenario(client: httpx.AsyncClient, dataset: Dataset, name: str, requests: int, concurrency: int, seed: int, clock: UploadClock) -> dict:
+    _, mix = SCENARIOS[name]
+    weights = [weight for weight, _ in mix]
+    builders = [builder for _, builder in mix]
+    # Build the whole request sequence up front so it only depends on the seed
+    rng = random.Random(f"{seed}-{name}")
+    plan = [rng.choices(builders, weights)[0](dataset, rng, clock) for _ in range(requests)]
+    samples: dict[str, list] = {}
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < len(plan):
+            label, method, url, kwargs = plan[position]
+            position += 1
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - start
+            match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+            samples.setdefault(label, []).append((elapsed, int(match.group(1)) if match else None, response.status_code < 400))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 1),
+        "errors": sum(1 for endpoint in samples.values() for _, _, ok in endpoint if not ok),
+        "endpoints": {label: summarize_endpoint(endpoint) for label, endpoint in sorted(samples.items())},
+    }
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> dict:
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "database": engine.dialect.name,
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "users": args.users,
+            "devices_per_user": args.devices_per_user,
+            "days": args.days,
+        },
+        "scenarios": {},
+    }
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            seed_start = time.perf_counter()
+            dataset = await seed_dataset(client, args.users, args.devices_per_user, args.days, args.seed)
+            report["meta"]["records"] = dataset.records
+            report["meta"]["seed_s"] = round(time.perf_counter() - seed_start, 3)
+
+            clock = UploadClock(dataset.end)
+            for name in args.scenarios:
+                requests = args.requests or SCENARIOS[name][0]
+                report["scenarios"][name] = await run_scenario(client, dataset, name, requests, args.concurrency, args.seed, clock)
+                print(f"{name:>15}: {report['scenarios'][name]['throughput_rps']:8.1f} req/s", file=sys.stderr)
+
+    return report
+
+def compare(base_path: str, head_path: str, threshold: float) -> int:
+    """Prints per-endpoint p95 and per-scenario throughput changes; fails when p95 regresses beyond the threshold"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+
+    regressions = 0
+    for name, scenario in head["scenarios"].items():
+        previous = base["scenarios"].get(name)
+        if previous is None:
+            continue
+        change = (scenario["throughput_rps"] / previous["throughput_rps"] - 1) * 100
+        print(f"{name}: {previous['throughput_rps']} -> {scenario['throughput_rps']} req/s ({change:+.1f}%)")
+        for label, endpoint in scenario["endpoints"].items():
+            old = previous["endpoints"].get(label)
+            if old is None:
+                continue
+            change = (endpoint["p95_ms"] / old["p95_ms"] - 1) * 100
+            flag = "REGRESSION" if change > threshold else ""
+            regressions += bool(flag)
+            print(
+                f"  {label:<34} p95 {old['p95_ms']:9.2f} -> {endpoint['p95_ms']:9.2f} ms ({change:+6.1f}%)"
+                f"  queries {old['queries_per_request']} -> {endpoint['queries_per_request']}  {flag}"
+            )
+    return 1 if regressions else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the GlucoTeam API")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--devices-per-user", type=int, default=1)
+    parser.add_argument("--days", type=float, default=365, help="Days of 5-minute history per device")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, help="Requests per scenario (default depends on the scenario)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="Compare two JSON reports instead of running")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p95 regression threshold in percent for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Synthetic dataset for the load-test suite: users with devices, device API
+keys and a continuous 5-minute CGM history per device.
+
+Users, devices and keys are created through the API so every code path
+(hashing, caches) sees them; the CGM history is bulk inserted and the
+rollups rebuilt from it.
+"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+from sqlalchemy import insert
+
+from benchmarks.common import PASSWORD
+from app.db.database import SessionLocal, AsyncSessionLocal
+from app.db.types import new_id
+from app.db.models.record import Record as RecordModel
+from app.services.glucose_metrics import READING_INTERVAL_SECONDS
+from app.services.rollups import rebuild_rollups
+
+INSERT_CHUNK = 10000
+
+@dataclass
+class SeededDevice:
+    id: str
+    api_key: str
+
+@dataclass
+class SeededUser:
+    id: str
+    email: str
+    headers: dict
+    devices: list[SeededDevice] = field(default_factory=list)
+
+@dataclass
+class Dataset:
+    users: list[SeededUser]
+    # First timestamp of the seeded history and the first one after it
+    start: datetime
+    end: datetime
+    records: int
+
+def synthetic_levels(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Daily sine wave with meal spikes and sensor noise, clipped to 40-400 mg/dL"""
+    minutes = np.arange(count) * (READING_INTERVAL_SECONDS / 60)
+    wave = 140 + 50 * np.sin(2 * np.pi * minutes / (24 * 60))
+    meals = 60 * np.exp(-(((minutes % (8 * 60)) - 60) ** 2) / (2 * 30 ** 2))
+    return np.clip(wave + meals + rng.normal(0, 20, count), 40, 400).astype(np.int64)
+
+def insert_history(user_id: str, device_id: str, start: datetime, count: int, rng: np.random.Generator):
+    levels = synthetic_levels(count, rng)
+    step = timedelta(seconds=READING_INTERVAL_SECONDS)
+    with SessionLocal() as db:
+        for offset in range(0, count, INSERT_CHUNK):
+            db.execute(insert(RecordModel), [
+                {
+                    "id": new_id(),
+                    "level": int(levels[i]),
+                    "timestamp": start + step * i,
+                    "user_id": user_id,
+                    "device_id": device_id,
+                }
+                for i in range(offset, min(offset + INSERT_CHUNK, count))
+            ])
+        db.commit()
+
+async def seed_dataset(client: httpx.AsyncClient, users: int, devices_per_user: int, days: float, seed: int) -> Dataset:
+    rng = np.random.default_rng(seed)
+    end = datetime(2025, 1, 1)
+    start = end - timedelta(days=days)
+    count = int(days * 24 * 60 * 60 / READING_INTERVAL_SECONDS)
+    run_id = uuid.uuid4().hex[:8]
+
+    seeded = []
+    for index in range(users):
+        email = f"load-{run_id}-{index}@example.com"
+        (await client.post("/api/v1/users/sign-up", json={"email": email, "password": PASSWORD})).raise_for_status()
+        response = await client.post("/api/v1/users/sign-in", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        user_id = (await client.get("/api/v1/users/get-information", headers=headers)).json()["id"]
+        user = SeededUser(id=user_id, email=email, headers=headers)
+
+        for _ in range(devices_per_user):
+            response = await client.post("/api/v1/devices", json={"timestamp": start.isoformat()}, headers=headers)
+            response.raise_for_status()
+            device_id = response.json()["id"]
+            response = await client.post(f"/api/v1/devices/{device_id}/api-key", headers=headers)
+            response.raise_for_status()
+            user.devices.append(SeededDevice(id=device_id, api_key=response.json()["api_key"]))
+            insert_history(user_id, device_id, start, count, rng)
+
+        async with AsyncSessionLocal() as db:
+            await rebuild_rollups(db, user_id=user_id)
+            await db.commit()
+        seeded.append(user)
+
+    return Dataset(users=seeded, start=start, end=end, records=users * devices_per_user * count)
@@ -0,0 +1,95 @@
+"""
+Boots `app.main:app` against a throwaway SQLite database unless
+DATABASE_URL is already set (e.g. to a local MySQL instance).
+"""
+import os
+import tempfile
+import time
+import uuid
+
+if not os.getenv("DATABASE_URL"):
+    _tmpdir = tempfile.mkdtemp(prefix="glucoteam-tests-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/tests.db"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from sqlalchemy import select
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.db.models.record import Record as RecordModel
+from app.db.models.record_archive import RecordArchive
+from app.db.models.rollup import HourlyRecordRollup, DailyRecordRollup
+from app.services.rollups import STAT_COLUMNS, summarize_readings
+from app.services.alert_rules import alert_engine
+
+PASSWORD = "test-password"
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def sign_up(client) -> dict:
+    """Authorization headers of a fresh user"""
+    email = f"test-{uuid.uuid4().hex[:12]}@example.com"
+    client.post("/api/v1/users/sign-up", json={"email": email, "password": PASSWORD}).raise_for_status()
+    response = client.post("/api/v1/users/sign-in", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="session")
+def headers(client) -> dict:
+    return sign_up(client)
+
+def run_with_session(client, function, *args):
+    """
+    Runs `await function(db, *args)` on the app's event loop, whose connection pool
+    the async sessions are bound to, and returns its result
+    """
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await function(db, *args)
+    return client.portal.call(call)
+
+def create_device(client, headers: dict) -> str:
+    response = client.post("/api/v1/devices", json={"timestamp": "2024-01-01T00:00:00"}, headers=headers)
+    response.raise_for_status()
+    return response.json()["id"]
+
+@pytest.fixture(scope="session")
+def device_id(client, headers) -> str:
+    return create_device(client, headers)
+
+def wait_for_alert_engine(timeout: float = 5.0):
+    """Waits until the alert engine has evaluated every queued reading"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        idle = alert_engine.queue is None or alert_engine.queue.empty()
+        if idle and (alert_engine._inflight is None or alert_engine._inflight.done()):
+            return
+        time.sleep(0.01)
+    raise TimeoutError("Alert engine did not drain")
+
+def stored_rollups(user_id: str, table) -> list[dict]:
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(table.device_id, table.bucket_start, *(getattr(table, column) for column in STAT_COLUMNS))
+            .where(table.user_id == user_id)
+            .order_by(table.device_id, table.bucket_start)
+        ).all()
+    return [{"device_id": row[0], "bucket_start": row[1], **dict(zip(STAT_COLUMNS, row[2:]))} for row in rows]
+
+def expected_rollups(user_id: str, seconds: int) -> list[dict]:
+    """Rollups computed straight from every reading still in the database"""
+    with SessionLocal() as db:
+        readings = [
+            {"user_id": user_id, "device_id": row.device_id, "timestamp": row.timestamp, "level": row.level}
+            for model in (RecordModel, RecordArchive)
+            for row in db.execute(select(model.device_id, model.timestamp, model.level).where(model.user_id == user_id))
+        ]
+    rows = [{key: value for key, value in row.items() if key != "user_id"} for row in summarize_readings(readings, seconds)]
+    return sorted(rows, key=lambda row: (row["device_id"], row["bucket_start"]))
+
+def assert_rollups_match(user_id: str):
+    assert stored_rollups(user_id, HourlyRecordRollup) == expected_rollups(user_id, 60 * 60)
+    assert stored_rollups(user_id, DailyRecordRollup) == expected_rollups(user_id, 24 * 60 * 60)
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from tests.conftest import create_device, wait_for_alert_engine
+
+def device_alerts(client, headers, device_id) -> list[str]:
+    wait_for_alert_engine()
+    response = client.get("/api/v1/alerts", params={"device_id": device_id}, headers=headers)
+    response.raise_for_status()
+    return sorted(alert["message"] for alert in response.json())
+
+def upload(client, headers, device_id, readings):
+    body = [{"level": level, "timestamp": timestamp, "device_id": device_id} for timestamp, level in readings]
+    client.post("/api/v1/records/bulk", json=body, headers=headers).raise_for_status()
+
+def test_aware_and_naive_timestamps_in_one_batch(client, headers):
+    device_id = create_device(client, headers)
+    aware = datetime(2024, 3, 1, 10, tzinfo=timezone.utc)
+    naive = aware.astimezone().replace(tzinfo=None)
+    upload(client, headers, device_id, [(aware.isoformat(), 120), ((naive.replace(minute=5)).isoformat(), 45)])
+    # Five minutes apart once both are on the same clock
+    assert device_alerts(client, headers, device_id) == ["Glucose falling quickly: -15.0 mg/dL/min", "Very low glucose: 45 mg/dL"]
+
+def test_late_readings_are_evaluated_without_rewinding_live_state(client, headers):
+    device_id = create_device(client, headers)
+    upload(client, headers, device_id, [(f"2024-03-02T10:{minute:02d}:00", 120) for minute in range(0, 30, 5)])
+    assert device_alerts(client, headers, device_id) == []
+
+    # An offline backlog, older than the live readings, uploaded in two batches
+    backlog = [(f"2024-03-02T08:{minute:02d}:00", 60) for minute in range(0, 30, 5)]
+    upload(client, headers, device_id, backlog[:3])
+    upload(client, headers, device_id, backlog[3:])
+    assert device_alerts(client, headers, device_id) == ["Glucose below 70 mg/dL for 15 minutes", "Low glucose: 60 mg/dL"]
+
+    # The live state is still in range, so a new low reading raises its band alert again
+    upload(client, headers, device_id, [("2024-03-02T10:30:00", 60)])
+    assert device_alerts(client, headers, device_id).count("Low glucose: 60 mg/dL") == 2
+
+def test_settings_must_be_positive(client, headers):
+    for field, value in (("rate_of_change", 0), ("sustained_low_minutes", -5), ("low", 0)):
+        assert client.put("/api/v1/alerts/settings", json={field: value}, headers=headers).status_code == 422
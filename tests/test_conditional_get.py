@@ -0,0 +1,44 @@
+"""Conditional GETs: 200, then 304 while unchanged, then 200 again after a write"""
+import pytest
+
+def create_contact(client, headers, device_id):
+    client.post("/api/v1/contacts", json={"email": "conditional@example.com", "name": "C", "phone": "555-0100"}, headers=headers).raise_for_status()
+
+def update_profile(client, headers, device_id):
+    client.put("/api/v1/users/update-information", json={"name": "Conditional"}, headers=headers).raise_for_status()
+
+def create_device(client, headers, device_id):
+    client.post("/api/v1/devices", json={"timestamp": "2024-01-01T00:00:00"}, headers=headers).raise_for_status()
+
+def create_record(client, headers, device_id):
+    client.post("/api/v1/records", json={"level": 110, "device_id": device_id}, headers=headers).raise_for_status()
+
+CASES = {
+    "devices": ("/api/v1/devices", create_device),
+    "contacts": ("/api/v1/contacts", create_contact),
+    "profile": ("/api/v1/users/get-information", update_profile),
+    "records": ("/api/v1/records", create_record),
+}
+
+@pytest.mark.parametrize("name", CASES)
+def test_not_modified_until_written(client, headers, device_id, name):
+    path, write = CASES[name]
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["last-modified"]
+
+    cached = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    write(client, headers, device_id)
+    changed = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert client.get(path, headers={**headers, "If-None-Match": changed.headers["etag"]}).status_code == 304
+
+def test_records_later_pages_have_no_validators(client, headers):
+    response = client.get("/api/v1/records", params={"skip": 1}, headers=headers)
+    assert response.status_code == 200
+    assert "etag" not in response.headers
@@ -0,0 +1,14 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.database import get_pool_options
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite+aiosqlite://", "sqlite:///glucoteam.db", "sqlite+aiosqlite:///glucoteam.db"])
+def test_pool_options_are_accepted_by_the_default_pool(url):
+    create = create_async_engine if "aiosqlite" in url else create_engine
+    create(url, **get_pool_options(url))
+
+def test_queue_pools_are_sized():
+    assert {"pool_size", "max_overflow", "pool_timeout"} <= set(get_pool_options("mysql+pymysql://user@host/db"))
+    assert "pool_size" not in get_pool_options("sqlite://")
@@ -0,0 +1,55 @@
+import time
+
+from sqlalchemy import select
+
+from app.db.database import SessionLocal
+from app.db.models.record import Record as RecordModel
+from app.db.types import new_id
+from app.schemas.job import DeletionTarget
+from app.services import deletion_jobs as deletion_jobs_module
+from tests.conftest import create_device
+
+def wait_for_job(client, headers, response) -> dict:
+    assert response.status_code == 202
+    for _ in range(500):
+        job = client.get(response.headers["location"], headers=headers).json()
+        if job["status"] not in ("pending", "running"):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job)
+
+def test_device_rejects_readings_as_soon_as_deletion_is_requested(client, headers, monkeypatch):
+    device_id = create_device(client, headers)
+    client.post("/api/v1/records", json={"level": 100, "device_id": device_id}, headers=headers).raise_for_status()
+
+    # A job that has not reached the device yet
+    async def not_started(db, target_id, rows):
+        return []
+    monkeypatch.setitem(deletion_jobs_module.DELETERS, DeletionTarget.DEVICE, not_started)
+    wait_for_job(client, headers, client.delete(f"/api/v1/devices/{device_id}", headers=headers))
+
+    assert client.post("/api/v1/records", json={"level": 100, "device_id": device_id}, headers=headers).status_code == 404
+    bulk = client.post("/api/v1/records/bulk", json=[{"level": 100, "device_id": device_id}], headers=headers).json()
+    assert bulk["accepted"] == 0
+
+def test_deletion_sweeps_readings_written_behind_the_chunked_pass(client, headers, monkeypatch):
+    device_id = create_device(client, headers)
+    client.post("/api/v1/records", json={"level": 100, "device_id": device_id}, headers=headers).raise_for_status()
+    user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+    straggler_id = new_id()
+    detach_device_blocks = deletion_jobs_module.detach_device_blocks
+
+    # A write accepted before the device was marked commits after records were detached
+    async def detach_with_straggler(db, user_id_, device_id_):
+        with SessionLocal() as other:
+            other.add(RecordModel(id=straggler_id, level=90, user_id=user_id, device_id=device_id))
+            other.commit()
+        return await detach_device_blocks(db, user_id_, device_id_)
+    monkeypatch.setattr(deletion_jobs_module, "detach_device_blocks", detach_with_straggler)
+
+    job = wait_for_job(client, headers, client.delete(f"/api/v1/devices/{device_id}", headers=headers))
+    assert job["status"] == "completed"
+    assert job["rows"]["records"] == 2
+    with SessionLocal() as db:
+        assert db.scalar(select(RecordModel.device_id).where(RecordModel.id == straggler_id)) is None
+        assert db.scalar(select(RecordModel.id).where(RecordModel.device_id == device_id)) is None
@@ -0,0 +1,89 @@
+import time
+import uuid
+
+import pytest
+from sqlalchemy import Column, MetaData, String, Table, create_engine, func, insert, select
+
+from app.db.database import Base
+from app.db.types import BinaryUUID, new_id, uuid7
+from app.services.id_migration import copy_table
+
+def test_uuid7_sets_version_and_variant_bits():
+    for _ in range(100):
+        value = uuid7()
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+        assert abs((value.int >> 80) - time.time_ns() // 1_000_000) < 1000
+
+def test_uuid7_orders_by_creation_time():
+    first = new_id()
+    time.sleep(0.002)
+    assert first < new_id()
+
+@pytest.fixture
+def ids_table():
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    table = Table("ids", metadata, Column("id", BinaryUUID, primary_key=True), Column("name", String(20)))
+    metadata.create_all(engine)
+    yield engine, table
+    engine.dispose()
+
+def test_binary_uuid_round_trips_on_sqlite(ids_table):
+    engine, table = ids_table
+    text_id, native_id = new_id(), uuid.uuid4()
+    with engine.begin() as connection:
+        connection.execute(insert(table), [{"id": text_id, "name": "text"}, {"id": native_id, "name": "native"}])
+    with engine.connect() as connection:
+        assert dict(connection.execute(select(table.c.name, table.c.id)).all()) == {"text": text_id, "native": str(native_id)}
+        assert connection.scalar(select(table.c.name).where(table.c.id == text_id.upper())) == "text"
+        # Stored as 16 raw bytes, not as text
+        assert set(connection.scalars(select(func.length(table.c.id)))) == {16}
+
+@pytest.mark.parametrize("malformed", ["not-a-uuid", "abc", "0" * 31, "0" * 34, ""])
+def test_malformed_ids_bind_as_null(ids_table, malformed):
+    engine, table = ids_table
+    with engine.begin() as connection:
+        connection.execute(insert(table), {"id": new_id(), "name": "row"})
+    assert BinaryUUID().process_bind_param(malformed, engine.dialect) is None
+    with engine.connect() as connection:
+        assert connection.execute(select(table).where(table.c.id == malformed)).all() == []
+
+def test_malformed_record_id_is_404(client, headers):
+    assert client.get("/api/v1/records/not-a-uuid", headers=headers).status_code == 404
+    assert client.delete("/api/v1/records/not-a-uuid", headers=headers).status_code == 404
+
+def char36_metadata() -> MetaData:
+    """The current schema with CHAR(36) ids, as databases created before BinaryUUID have it"""
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        for column in copy.columns:
+            if isinstance(column.type, BinaryUUID):
+                column.type = String(36)
+    return metadata
+
+def test_copy_table_converts_char36_ids(tmp_path):
+    source = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    target = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    char36_metadata().create_all(source)
+    Base.metadata.create_all(target)
+    user_id, record_ids = str(uuid.uuid4()), [str(uuid.uuid4()) for _ in range(5)]
+    with source.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO users (id, email, hashed_password) VALUES (?, ?, ?)", (user_id, "old@example.com", "hash"))
+        for i, record_id in enumerate(record_ids):
+            connection.exec_driver_sql("INSERT INTO records (id, level, timestamp, user_id) VALUES (?, ?, ?, ?)", (record_id, 100 + i, f"2024-07-01 08:0{i}:00.000000", user_id))
+
+    source_metadata = MetaData()
+    source_metadata.reflect(bind=source)
+    users, records = Base.metadata.tables["users"], Base.metadata.tables["records"]
+    assert copy_table(source, target, source_metadata.tables["users"], users) == 1
+    # Small chunks so more than one chunk is committed
+    assert copy_table(source, target, source_metadata.tables["records"], records, chunk_size=2) == 5
+
+    with target.connect() as connection:
+        assert connection.scalar(select(users.c.id)) == user_id
+        assert sorted(connection.execute(select(records.c.id, records.c.user_id, records.c.level)).all()) == sorted((record_id, user_id, 100 + i) for i, record_id in enumerate(record_ids))
+        assert set(connection.scalars(select(func.length(records.c.id)))) == {16}
+    source.dispose()
+    target.dispose()
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.services.ingestion import INGEST_MAX_LINE_BYTES
+from tests.conftest import create_device
+
+@pytest.fixture
+def device(client, headers) -> tuple[str, dict]:
+    device_id = create_device(client, headers)
+    response = client.post(f"/api/v1/devices/{device_id}/api-key", headers=headers)
+    response.raise_for_status()
+    return device_id, {"X-Device-Key": response.json()["api_key"]}
+
+def reading_line(level: int, padding: int = 0) -> bytes:
+    return json.dumps({"level": level, "description": "x" * padding}).encode() + b"\n"
+
+def test_ingest_accepts_readings(client, device):
+    _, device_headers = device
+    response = client.post("/api/v1/ingest/records", content=reading_line(100) + reading_line(110), headers=device_headers)
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 2
+
+def test_long_complete_line_in_one_chunk_is_rejected(client, device):
+    _, device_headers = device
+    body = reading_line(100) + reading_line(110, padding=INGEST_MAX_LINE_BYTES) + reading_line(120)
+    response = client.post("/api/v1/ingest/records", content=body, headers=device_headers)
+    assert response.status_code == 413
+
+def test_long_complete_line_in_one_websocket_message_closes(client, device):
+    _, device_headers = device
+    with client.websocket_connect("/api/v1/ingest/ws", headers=device_headers) as websocket:
+        websocket.send_bytes(reading_line(110, padding=INGEST_MAX_LINE_BYTES) + reading_line(120))
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_text()
+    assert closed.value.code == 1009
+
+def test_create_alert_requires_the_device_key(client, headers, device):
+    device_id, device_headers = device
+    body = {"device_id": device_id, "message": "check", "level": "high"}
+    assert client.post("/api/v1/alerts", json=body).status_code == 422
+    assert client.post("/api/v1/alerts", json=body, headers={"X-Device-Key": f"{device_id}.wrong"}).status_code == 401
+
+    other_device_id = create_device(client, headers)
+    assert client.post("/api/v1/alerts", json={**body, "device_id": other_device_id}, headers=device_headers).status_code == 403
+
+    response = client.post("/api/v1/alerts", json=body, headers=device_headers)
+    assert response.status_code == 201
+    assert response.json()["device_id"] == device_id
@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.db.types import new_id
+from app.services.retention import compact_records
+from tests.conftest import create_device, run_with_session, sign_up
+
+def all_pages(client, headers, path: str, limit: int) -> list[dict]:
+    """Follows X-Next-Cursor from the first page to the last"""
+    rows = []
+    params = {"limit": limit}
+    while True:
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200
+        rows.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return rows
+        params = {"limit": limit, "cursor": cursor}
+
+def newest_first(rows: list[dict]) -> list[dict]:
+    return sorted(rows, key=lambda row: (row["timestamp"], row["id"]), reverse=True)
+
+def test_cursor_round_trip():
+    timestamp, id = datetime(2024, 1, 2, 3, 4, 5, 678901), new_id()
+    assert decode_cursor(encode_cursor(timestamp, id)) == (timestamp, id)
+
+def opaque(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+@pytest.mark.parametrize("cursor", ["not a cursor", opaque({"a": 1}), opaque(["2024-01-01T00:00:00"]), opaque(["yesterday", new_id()]), opaque(["2024-01-01T00:00:00", "not-an-id"]), opaque(7)])
+def test_malformed_cursor_is_rejected(client, headers, device_id, cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+    for path in ("/api/v1/records", f"/api/v1/records/device/{device_id}", "/api/v1/alerts"):
+        assert client.get(path, params={"cursor": cursor}, headers=headers).status_code == 400
+
+def test_equal_timestamps_across_page_boundaries(client):
+    headers = sign_up(client)
+    device_id = create_device(client, headers)
+    same = datetime(2024, 6, 1, 12).isoformat()
+    readings = [{"level": 100 + i, "timestamp": same, "device_id": device_id} for i in range(7)]
+    readings += [{"level": 90, "timestamp": datetime(2024, 6, 1, 11, minute).isoformat(), "device_id": device_id} for minute in range(3)]
+    client.post("/api/v1/records/bulk", json=readings, headers=headers).raise_for_status()
+    expected = client.get("/api/v1/records", params={"limit": 100}, headers=headers).json()
+    assert expected == newest_first(expected)
+
+    for limit in (1, 2, 3, 4):
+        for path in ("/api/v1/records", f"/api/v1/records/device/{device_id}"):
+            assert all_pages(client, headers, path, limit) == expected
+
+def test_alert_cursor_pages(client):
+    headers = sign_up(client)
+    device_id = create_device(client, headers)
+    device_headers = {"X-Device-Key": client.post(f"/api/v1/devices/{device_id}/api-key", headers=headers).json()["api_key"]}
+    for level in ("low", "medium", "high", "critical", "high"):
+        client.post("/api/v1/alerts", json={"device_id": device_id, "level": level}, headers=device_headers).raise_for_status()
+    expected = client.get("/api/v1/alerts", params={"limit": 100}, headers=headers).json()
+    assert len(expected) == 5
+    assert all_pages(client, headers, "/api/v1/alerts", 2) == expected
+
+def test_cursor_pages_merge_compacted_readings(client):
+    headers = sign_up(client)
+    device_id = create_device(client, headers)
+    start = datetime(2023, 4, 1)
+    # Readings with a description stay raw, so pages mix raw rows and block readings;
+    # the first hour has several readings in the same second
+    readings = [
+        {
+            "level": 80 + i % 50,
+            "timestamp": (start + timedelta(minutes=(7 * i) if i >= 6 else 0)).isoformat(),
+            "description": "meal" if i % 5 == 0 else None,
+            "device_id": device_id if i % 4 else None,
+        }
+        for i in range(60)
+    ]
+    client.post("/api/v1/records/bulk", json=readings, headers=headers).raise_for_status()
+    before = client.get("/api/v1/records", params={"limit": 100}, headers=headers).json()
+
+    assert run_with_session(client, compact_records, datetime(2023, 5, 1)) > 0
+
+    after = client.get("/api/v1/records", params={"limit": 100}, headers=headers).json()
+    assert len({row["id"] for row in after}) == len(readings)
+    assert after == newest_first(after)
+    key = lambda row: (row["timestamp"], row["level"], row["device_id"], row["description"])
+    assert sorted(map(key, after)) == sorted(map(key, before))
+
+    for limit in (1, 3, 7, 50):
+        assert all_pages(client, headers, "/api/v1/records", limit) == after
+        offset_pages = [row for skip in range(0, len(readings), limit) for row in client.get("/api/v1/records", params={"limit": limit, "skip": skip}, headers=headers).json()]
+        assert offset_pages == after
+    device_rows = [row for row in after if row["device_id"] == device_id]
+    assert all_pages(client, headers, f"/api/v1/records/device/{device_id}", 4) == device_rows
@@ -0,0 +1,94 @@
+"""
+Query-count regression tests for the create and update endpoints.
+
+Every write endpoint must issue exactly one write statement against its own
+table and must not read anything back after writing (no refresh round trip).
+"""
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.db.database import engine, async_engine
+from tests.conftest import PASSWORD, wait_for_alert_engine
+
+WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE)\b(?:\s+INTO)?\s+(\w+)", re.IGNORECASE)
+
+@contextmanager
+def capture():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
+
+def assert_single_write(table: str, statements: list[str]):
+    writes = [(i, match.group(2).lower()) for i, match in ((i, WRITE.match(s)) for i, s in enumerate(statements)) if match]
+    own_writes = [i for i, written in writes if written == table]
+    assert len(own_writes) == 1, f"{len(own_writes)} writes to {table}: {statements}"
+    reads_after = [s for s in statements[own_writes[0] + 1:] if s.lstrip().upper().startswith("SELECT")]
+    assert not reads_after, f"{table} is read back after the write: {reads_after}"
+
+@pytest.fixture
+def quiet_device_id(client, headers) -> str:
+    """A device without readings, so a new one raises no alert while statements are captured"""
+    response = client.post("/api/v1/devices", json={"timestamp": "2024-01-01T00:00:00"}, headers=headers)
+    response.raise_for_status()
+    device_id = response.json()["id"]
+    # Warm the user and ownership caches so only the handler's own statements are counted
+    client.get(f"/api/v1/records/device/{device_id}", headers=headers).raise_for_status()
+    return device_id
+
+@pytest.fixture
+def device_headers(client, headers, quiet_device_id) -> dict:
+    response = client.post(f"/api/v1/devices/{quiet_device_id}/api-key", headers=headers)
+    response.raise_for_status()
+    device_headers = {"X-Device-Key": response.json()["api_key"]}
+    # Warm the device key cache
+    client.post("/api/v1/ingest/records", content=b"", headers=device_headers).raise_for_status()
+    return device_headers
+
+@pytest.fixture
+def contact_id(client, headers) -> str:
+    response = client.post("/api/v1/contacts", json={"email": "updated-contact@example.com", "name": "C", "phone": "555-0100"}, headers=headers)
+    response.raise_for_status()
+    return response.json()["id"]
+
+# (table, method, path, body, credentials); {device_id} in the path or body is filled in
+CASES = {
+    "POST /users/sign-up": ("users", "post", "/api/v1/users/sign-up", {"email": "count-check@example.com", "password": PASSWORD}, None),
+    "PUT /users/update-information": ("users", "put", "/api/v1/users/update-information", {"name": "Count"}, "user"),
+    "POST /devices": ("devices", "post", "/api/v1/devices", {"timestamp": "2024-01-01T00:00:00"}, "user"),
+    "PUT /devices/{id}": ("devices", "put", "/api/v1/devices/{device_id}", {"status": "inactive"}, "user"),
+    "POST /records": ("records", "post", "/api/v1/records", {"level": 120, "device_id": "{device_id}"}, "user"),
+    "POST /alerts": ("alerts", "post", "/api/v1/alerts", {"device_id": "{device_id}", "message": "check", "level": "high"}, "device"),
+    "PUT /alerts/settings": ("alert_settings", "put", "/api/v1/alerts/settings", {"high": 190}, "user"),
+    "POST /contacts": ("contacts", "post", "/api/v1/contacts", {"email": "contact@example.com", "name": "C", "phone": "555-0100"}, "user"),
+}
+
+@pytest.mark.parametrize("name", CASES)
+def test_single_write_without_read_back(client, headers, device_headers, quiet_device_id, name):
+    table, method, path, body, credentials = CASES[name]
+    request_headers = {"user": headers, "device": device_headers}.get(credentials)
+    body = {key: value.format(device_id=quiet_device_id) if isinstance(value, str) else value for key, value in body.items()}
+    # Alerts the engine writes for earlier readings must not be counted
+    wait_for_alert_engine()
+    with capture() as statements:
+        response = client.request(method, path.format(device_id=quiet_device_id), json=body, headers=request_headers)
+    response.raise_for_status()
+    assert_single_write(table, statements)
+
+def test_contact_update_single_write_without_read_back(client, headers, contact_id):
+    wait_for_alert_engine()
+    with capture() as statements:
+        client.put(f"/api/v1/contacts/{contact_id}", json={"phone": "555-0199"}, headers=headers).raise_for_status()
+    assert_single_write("contacts", statements)
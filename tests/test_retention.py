@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.db.database import SessionLocal
+from app.db.models.record import Record as RecordModel
+from app.db.models.rollup import DailyRecordRollup
+from app.services.retention import archive_records, retention_cutoff
+from app.services.rollups import rebuild_rollups
+from tests.conftest import assert_rollups_match, create_device, run_with_session, sign_up, stored_rollups
+
+def test_retention_cutoff_is_a_whole_day():
+    assert retention_cutoff(10) == (datetime.now() - timedelta(days=10)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def test_rebuild_keeps_archived_readings(client):
+    headers = sign_up(client)
+    user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+    device_id = create_device(client, headers)
+    start = datetime(2023, 5, 1)
+    readings = [
+        {"level": 60 + (i * 37) % 200, "timestamp": (start + timedelta(minutes=50 * i)).isoformat(), "device_id": device_id if i % 3 else None}
+        for i in range(3 * 24)
+    ]
+    client.post("/api/v1/records/bulk", json=readings, headers=headers).raise_for_status()
+    assert_rollups_match(user_id)
+
+    # Archiving with a cutoff in the middle of a day moves that whole day or none of it
+    archived = run_with_session(client, archive_records, start + timedelta(days=1, hours=13))
+    with SessionLocal() as db:
+        first_kept = db.scalar(select(RecordModel.timestamp).where(RecordModel.user_id == user_id).order_by(RecordModel.timestamp).limit(1))
+    assert archived > 0
+    assert first_kept >= start + timedelta(days=1)
+
+    # Deleting a record rebuilds its day; the whole user is rebuilt afterwards
+    record_id = client.get("/api/v1/records", params={"limit": 1}, headers=headers).json()[0]["id"]
+    assert client.delete(f"/api/v1/records/{record_id}", headers=headers).status_code == 204
+    assert_rollups_match(user_id)
+
+    async def rebuild(db):
+        await rebuild_rollups(db, user_id=user_id)
+        await db.commit()
+    run_with_session(client, rebuild)
+    assert_rollups_match(user_id)
+    assert sum(row["count"] for row in stored_rollups(user_id, DailyRecordRollup)) == len(readings) - 1
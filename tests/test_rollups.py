@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.conftest import assert_rollups_match, create_device, sign_up
+
+START = datetime(2024, 3, 10)
+END = START + timedelta(days=3)
+
+@pytest.fixture
+def account(client) -> tuple[str, dict, str, dict]:
+    """A fresh user with one device and that device's ingest key, so nothing else writes its rollups"""
+    headers = sign_up(client)
+    user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+    device_id = create_device(client, headers)
+    response = client.post(f"/api/v1/devices/{device_id}/api-key", headers=headers)
+    response.raise_for_status()
+    return user_id, headers, device_id, {"X-Device-Key": response.json()["api_key"]}
+
+def aggregate(client, headers: dict, bucket: str, raw: bool, device_id: str | None = None) -> list[dict]:
+    """Bucket statistics from the rollup tables, or from the raw records when a percentile is requested"""
+    params = {"bucket": bucket, "start": START.isoformat(), "end": END.isoformat()}
+    if raw:
+        params["percentiles"] = [50]
+    if device_id:
+        params["device_id"] = device_id
+    response = client.get("/api/v1/records/aggregate", params=params, headers=headers)
+    response.raise_for_status()
+    rows = response.json()
+    for row in rows:
+        row.pop("percentiles", None)
+        row["mean"] = pytest.approx(row["mean"])
+    return rows
+
+def assert_paths_agree(client, user_id: str, headers: dict, device_id: str):
+    assert_rollups_match(user_id)
+    for bucket in ("1h", "1d"):
+        for device_filter in (None, device_id):
+            from_rollups = aggregate(client, headers, bucket, raw=False, device_id=device_filter)
+            assert from_rollups
+            assert from_rollups == aggregate(client, headers, bucket, raw=True, device_id=device_filter)
+
+def test_rollups_match_raw_records(client, account):
+    user_id, headers, device_id, device_headers = account
+
+    # Single records, on and just before bucket boundaries
+    for timestamp, level, device in [
+        (START, 90, device_id),
+        (START + timedelta(minutes=59, seconds=59), 250, device_id),
+        (START + timedelta(hours=1), 40, None),
+        (START + timedelta(days=1) - timedelta(seconds=1), 180, None),
+    ]:
+        response = client.post("/api/v1/records", json={"level": level, "timestamp": timestamp.isoformat(), "device_id": device}, headers=headers)
+        assert response.status_code == 201
+
+    # A bulk upload that overlaps buckets the single records already opened
+    readings = [
+        {"level": 60 + (i * 41) % 220, "timestamp": (START + timedelta(minutes=17 * i)).isoformat(), "device_id": device_id if i % 4 else None}
+        for i in range(200)
+    ]
+    assert client.post("/api/v1/records/bulk", json=readings, headers=headers).json()["accepted"] == len(readings)
+
+    # Streamed ingest from the device
+    body = b"".join(
+        json.dumps({"level": 70 + i * 3, "timestamp": (START + timedelta(days=2, minutes=23 * i)).isoformat()}).encode() + b"\n"
+        for i in range(40)
+    )
+    assert client.post("/api/v1/ingest/records", content=body, headers=device_headers).json()["accepted"] == 40
+    assert_paths_agree(client, user_id, headers, device_id)
+
+    # Deleting the minimum and maximum of a bucket, then the only reading left in another
+    first_hour = client.get("/api/v1/records", params={"start": START.isoformat(), "end": (START + timedelta(hours=1)).isoformat()}, headers=headers).json()
+    for record in (min(first_hour, key=lambda r: r["level"]), max(first_hour, key=lambda r: r["level"])):
+        assert client.delete(f"/api/v1/records/{record['id']}", headers=headers).status_code == 204
+    assert_paths_agree(client, user_id, headers, device_id)
+
+    lone = client.post("/api/v1/records", json={"level": 123, "timestamp": (END - timedelta(minutes=1)).isoformat(), "device_id": device_id}, headers=headers).json()
+    assert_paths_agree(client, user_id, headers, device_id)
+    assert client.delete(f"/api/v1/records/{lone['id']}", headers=headers).status_code == 204
+    assert_paths_agree(client, user_id, headers, device_id)
+    assert all(row["bucket_start"] != (END - timedelta(hours=1)).isoformat() for row in aggregate(client, headers, "1h", raw=False))
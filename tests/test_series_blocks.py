@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from app.db.database import SessionLocal
+from app.db.models.record import Record as RecordModel
+from app.db.models.series_block import SeriesBlock
+from app.services.retention import compact_records
+from tests.conftest import create_device, run_with_session, sign_up
+
+def test_compaction_keeps_fractional_seconds_raw(client):
+    headers = sign_up(client)
+    user_id = client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+    device_id = create_device(client, headers)
+    start = datetime(2023, 2, 1)
+    timestamps = [start + timedelta(minutes=5 * i, microseconds=250000 if i % 4 == 0 else 0) for i in range(24)]
+    readings = [{"level": 100 + i, "timestamp": timestamp.isoformat(), "device_id": device_id} for i, timestamp in enumerate(timestamps)]
+    client.post("/api/v1/records/bulk", json=readings, headers=headers).raise_for_status()
+    before = client.get("/api/v1/records", params={"limit": 100}, headers=headers).json()
+
+    compacted = run_with_session(client, compact_records, datetime(2023, 3, 1))
+
+    with SessionLocal() as db:
+        raw = db.scalars(select(RecordModel.timestamp).where(RecordModel.user_id == user_id).order_by(RecordModel.timestamp)).all()
+        blocks = db.scalar(select(func.sum(SeriesBlock.count)).where(SeriesBlock.user_id == user_id))
+    assert compacted == blocks == 18
+    assert raw == [timestamp for timestamp in timestamps if timestamp.microsecond]
+
+    # Listings merge blocks with raw rows and keep every timestamp as written
+    after = client.get("/api/v1/records", params={"limit": 100}, headers=headers).json()
+    assert [(row["timestamp"], row["level"]) for row in after] == [(row["timestamp"], row["level"]) for row in before]
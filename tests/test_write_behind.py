@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.db.database import SessionLocal
+from app.db.models.record import Record as RecordModel
+from app.db.types import new_id
+from app.services.write_behind import WriteBehindBuffer, record_writer, submit_or_503
+
+@pytest.fixture
+def user_id(client, headers) -> str:
+    return client.get("/api/v1/users/get-information", headers=headers).json()["id"]
+
+def make_buffer(durability: str, max_queue: int = 100) -> WriteBehindBuffer:
+    # Long enough for every row of a test to land in one batch
+    buffer = WriteBehindBuffer("records", RecordModel, max_queue=max_queue, batch_size=100, flush_ms=200)
+    buffer.enabled = True
+    buffer.durability = durability
+    return buffer
+
+def make_rows(user_id: str, count: int) -> list[dict]:
+    return [{"id": new_id(), "level": 100 + i, "timestamp": datetime(2024, 7, 1, 8, i), "user_id": user_id, "device_id": None} for i in range(count)]
+
+def existing_row(user_id: str) -> dict:
+    """A row whose primary key is already taken"""
+    row = make_rows(user_id, 1)[0]
+    with SessionLocal() as db:
+        db.add(RecordModel(**row))
+        db.commit()
+    return {**row, "level": 1}
+
+def stored_ids(ids: list[str]) -> set[str]:
+    with SessionLocal() as db:
+        return set(db.scalars(select(RecordModel.id).where(RecordModel.id.in_(ids))))
+
+def submit_all(client, buffer: WriteBehindBuffer, rows: list[dict]) -> list:
+    """Starts the buffer, submits every row concurrently, stops it and returns each submit's outcome"""
+    async def run():
+        buffer.start()
+        try:
+            return await asyncio.gather(*(submit_or_503(buffer, row) for row in rows), return_exceptions=True)
+        finally:
+            await buffer.stop()
+    return client.portal.call(run)
+
+def test_flush_fails_only_the_rejected_row(client, user_id):
+    buffer = make_buffer("flush")
+    rows = make_rows(user_id, 9)
+    rows.insert(4, existing_row(user_id))
+
+    outcomes = submit_all(client, buffer, rows)
+
+    assert [outcome is None for outcome in outcomes] == [i != 4 for i in range(10)]
+    assert isinstance(outcomes[4], HTTPException) and outcomes[4].status_code == 409
+    assert stored_ids([row["id"] for row in rows if row["level"] != 1]) == {row["id"] for row in rows if row["level"] != 1}
+    assert buffer.stats()["flushes"] == 1
+    assert buffer.stats()["flushed_rows"] == 9
+    assert buffer.stats()["failed_rows"] == 1
+
+def test_enqueue_returns_before_the_flush(client, user_id):
+    buffer = make_buffer("enqueue")
+    rows = make_rows(user_id, 5)
+    rows.append(existing_row(user_id))
+
+    async def run():
+        buffer.start()
+        outcomes = [await submit_or_503(buffer, row) for row in rows]
+        # Accepted, but nothing is written until the batch flushes
+        assert stored_ids([row["id"] for row in rows[:5]]) == set()
+        await buffer.stop()
+        return outcomes
+    assert client.portal.call(run) == [None] * 6
+    assert stored_ids([row["id"] for row in rows[:5]]) == {row["id"] for row in rows[:5]}
+    assert buffer.failed_rows == 1
+
+def test_flush_errors_unrelated_to_the_rows_are_503(client, user_id):
+    buffer = make_buffer("flush")
+
+    async def unavailable(rows):
+        raise ConnectionError("database unreachable")
+    buffer.commit_rows = unavailable
+
+    outcomes = submit_all(client, buffer, make_rows(user_id, 3))
+    assert all(isinstance(outcome, HTTPException) and outcome.status_code == 503 for outcome in outcomes)
+    assert outcomes[0].headers["Retry-After"] == "1"
+    assert buffer.failed_rows == 3
+
+def test_full_queue_is_503(client, user_id):
+    buffer = make_buffer("enqueue", max_queue=2)
+
+    async def run():
+        buffer.start()
+        # Queued without yielding to the flush task, so the third row finds the queue full
+        buffer.queue.put_nowait((make_rows(user_id, 1)[0], None, None))
+        buffer.queue.put_nowait((make_rows(user_id, 1)[0], None, None))
+        try:
+            await submit_or_503(buffer, make_rows(user_id, 1)[0])
+        except HTTPException as e:
+            return e
+        finally:
+            await buffer.stop()
+    error = client.portal.call(run)
+    assert error.status_code == 503
+    assert buffer.rejected == 1
+
+def test_row_rejection_is_not_retried_as_a_batch(client, user_id):
+    buffer = make_buffer("flush")
+    rows = [existing_row(user_id), existing_row(user_id)]
+    outcomes = submit_all(client, buffer, rows)
+    assert [outcome.status_code for outcome in outcomes] == [409, 409]
+    assert buffer.flushes == 0
+
+@pytest.mark.parametrize("durability, expected_status", [("flush", 201), ("enqueue", 202)])
+def test_create_record_through_the_buffer(client, headers, device_id, monkeypatch, durability, expected_status):
+    monkeypatch.setattr(record_writer, "enabled", True)
+    monkeypatch.setattr(record_writer, "durability", durability)
+
+    async def start():
+        record_writer.start()
+    client.portal.call(start)
+    try:
+        response = client.post("/api/v1/records", json={"level": 120, "timestamp": "2024-07-02T08:00:00", "device_id": device_id}, headers=headers)
+    finally:
+        client.portal.call(record_writer.stop)
+    assert response.status_code == expected_status
+    # Committed by the time stop() returns, whichever mode accepted it
+    assert stored_ids([response.json()["id"]]) == {response.json()["id"]}